@@ -2,6 +2,8 @@
 ASGI config for ansd_suivi project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+The live stats feed (/api/stats/stream/) needs this entry point, e.g.
+``uvicorn ansd_suivi.asgi:application``.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
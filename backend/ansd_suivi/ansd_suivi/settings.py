@@ -140,6 +140,7 @@
 
 # DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 import os
+from importlib.util import find_spec
 from pathlib import Path
 from corsheaders.defaults import default_headers
 
@@ -164,12 +165,14 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'api.perf.PerfMiddleware',  # inactif sauf si API_PERF_ENABLED=True
+    'api.compression.CompressionMiddleware',  # gzip / brotli des réponses de l'API
+    'api.asgi.AsyncRoutingMiddleware',  # sous ASGI : vues asynchrones (api/async_views.py)
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.security.SecurityMiddleware',
-    'whitenoise.middleware.WhiteNoiseMiddleware',  # gestion fichiers statiques en prod
+    'api.asgi.StaticFilesMiddleware',  # WhiteNoise (fichiers statiques en prod), sans bloquer l'ASGI
     'django.contrib.sessions.middleware.SessionMiddleware',
-    'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
@@ -195,11 +198,118 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'ansd_suivi.wsgi.application'
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+# Base de données
+# DB_ENGINE: "sqlite" (défaut) ou "postgresql" (paquet psycopg requis,
+# psycopg[pool] pour DB_POOL=True)
+DB_ENGINE = os.getenv("DB_ENGINE", "sqlite")
+if DB_ENGINE == "postgresql":
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.getenv("DB_NAME", "ansd_suivi"),
+            'USER': os.getenv("DB_USER", "ansd_suivi"),
+            'PASSWORD': os.getenv("DB_PASSWORD", ""),
+            'HOST': os.getenv("DB_HOST", "localhost"),
+            'PORT': os.getenv("DB_PORT", "5432"),
+            # Connexions persistantes, vérifiées avant réutilisation
+            'CONN_MAX_AGE': int(os.getenv("DB_CONN_MAX_AGE", "60")),
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': {},
+        }
+    }
+    if os.getenv("DB_POOL", "False") == "True":
+        # Pool de connexions psycopg (incompatible avec les connexions persistantes)
+        DATABASES['default']['CONN_MAX_AGE'] = 0
+        DATABASES['default']['OPTIONS']['pool'] = {
+            'min_size': int(os.getenv("DB_POOL_MIN_SIZE", "2")),
+            'max_size': int(os.getenv("DB_POOL_MAX_SIZE", "10")),
+            'timeout': float(os.getenv("DB_POOL_TIMEOUT", "10")),
+        }
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.getenv("DB_NAME", BASE_DIR / 'db.sqlite3'),
+            'OPTIONS': {
+                # Attente du verrou d'écriture (secondes) au lieu de "database is locked"
+                'timeout': float(os.getenv("SQLITE_BUSY_TIMEOUT", "20")),
+                # Verrou d'écriture pris dès le début des transactions : pas d'échec
+                # lors du passage lecture -> écriture quand un import écrit en parallèle
+                'transaction_mode': 'IMMEDIATE',
+                # Appliqué à chaque connexion : WAL (lecteurs non bloqués par l'écrivain),
+                # fsync allégé (sûr en WAL), lectures par mmap
+                'init_command': (
+                    "PRAGMA journal_mode=WAL;"
+                    "PRAGMA synchronous=NORMAL;"
+                    f"PRAGMA mmap_size={int(os.getenv('SQLITE_MMAP_SIZE', str(256 * 1024 * 1024)))};"
+                    "PRAGMA cache_size=-20000;"
+                ),
+            },
+        }
+    }
+
+# Cache (réponses API versionnées, voir api/cache.py ; la version est en base)
+# CACHE_BACKEND: "locmem" (défaut, un cache par processus), "file" ou "redis"
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "locmem")
+if CACHE_BACKEND == "redis":
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.getenv("CACHE_LOCATION", "redis://127.0.0.1:6379/1"),
+        }
+    }
+elif CACHE_BACKEND == "file":
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': os.getenv("CACHE_LOCATION", os.path.join(BASE_DIR, 'cache')),
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'ansd-suivi',
+        }
     }
+# Durée de vie des réponses en cache (secondes) ; l'invalidation se fait par version
+API_CACHE_TIMEOUT = int(os.getenv("API_CACHE_TIMEOUT", "86400"))
+
+# Instrumentation des requêtes (api/perf.py) : Server-Timing, log "api.perf", /api/_perf/
+API_PERF_ENABLED = os.getenv("API_PERF_ENABLED", "False") == "True"
+API_PERF_BUFFER_SIZE = int(os.getenv("API_PERF_BUFFER_SIZE", "500"))
+API_PERF_DUPLICATE_THRESHOLD = int(os.getenv("API_PERF_DUPLICATE_THRESHOLD", "5"))
+
+# Flux SSE /api/stats/stream/ (api/stream.py) : relecture des compteurs au plus
+# tard toutes les N secondes (écritures d'autres processus), maintien de connexion
+STATS_STREAM_POLL_INTERVAL = float(os.getenv("STATS_STREAM_POLL_INTERVAL", "2"))
+STATS_STREAM_HEARTBEAT = float(os.getenv("STATS_STREAM_HEARTBEAT", "15"))
+
+# Compression des réponses de l'API (api/compression.py) : gzip, ou brotli si
+# le paquet est installé ; en dessous de API_COMPRESSION_MIN_SIZE octets, non compressé
+API_COMPRESSION_MIN_SIZE = int(os.getenv("API_COMPRESSION_MIN_SIZE", "1024"))
+API_BROTLI_QUALITY = int(os.getenv("API_BROTLI_QUALITY", "4"))
+
+# Imports en arrière-plan (api/imports.py) : fichiers envoyés à /api/imports/,
+# exécutant dans le processus web (sinon `manage.py run_import_jobs`), délai
+# sans avancement au-delà duquel un import "en cours" est considéré interrompu
+IMPORT_UPLOAD_DIR = os.getenv("IMPORT_UPLOAD_DIR", os.path.join(BASE_DIR, 'imports'))
+IMPORT_JOBS_IN_PROCESS = os.getenv("IMPORT_JOBS_IN_PROCESS", "True") == "True"
+IMPORT_JOBS_STALE_TIMEOUT = int(os.getenv("IMPORT_JOBS_STALE_TIMEOUT", "3600"))
+IMPORT_JOBS_POLL_INTERVAL = float(os.getenv("IMPORT_JOBS_POLL_INTERVAL", "5"))
+
+# Service ASGI (api/asgi.py) : vues asynchrones pour stats/global, stats/regions
+# et la liste des ménages (désactivées par défaut) ; threads des lectures SQL
+# lancées en parallèle
+API_ASYNC_VIEWS = os.getenv("API_ASYNC_VIEWS", "False") == "True"
+API_ASGI_URLCONF = 'ansd_suivi.urls_asgi'
+API_ASYNC_QUERY_THREADS = int(os.getenv("API_ASYNC_QUERY_THREADS", "8"))
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {'console': {'class': 'logging.StreamHandler'}},
+    'loggers': {'api.perf': {'handlers': ['console'], 'level': 'INFO', 'propagate': False}},
 }
 
 AUTH_PASSWORD_VALIDATORS = [
@@ -223,6 +333,12 @@ REST_FRAMEWORK = {
     'DEFAULT_FILTER_BACKENDS': ['django_filters.rest_framework.DjangoFilterBackend'],
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 10,
+    # Formats compacts facultatifs (api/renderers.py) : ?format=columnar, ?format=msgpack
+    'DEFAULT_RENDERER_CLASSES': [
+        'rest_framework.renderers.JSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+        'api.renderers.ColumnarJSONRenderer',
+    ] + (['api.renderers.MessagePackRenderer'] if find_spec('msgpack') else []),
 }
 
 CORS_ALLOWED_ORIGINS = os.getenv("CORS_ALLOWED_ORIGINS", "").split(",")
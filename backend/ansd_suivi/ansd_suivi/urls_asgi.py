@@ -0,0 +1,11 @@
+"""
+Configuration des URL sous ASGI (voir api/asgi.py) : les vues asynchrones de
+l'API d'abord, puis les mêmes routes que ansd_suivi/urls.py.
+"""
+from django.urls import include, path
+
+from .urls import urlpatterns as wsgi_urlpatterns
+
+urlpatterns = [
+    path('api/', include('api.urls_async')),
+] + wsgi_urlpatterns
@@ -1,12 +1,34 @@
 # api/admin.py
 from django.contrib import admin
-from .models import Region, Superviseur, Enqueteur, Menage
+from .models import (
+    Region, Departement, Commune, Grappe, Superviseur, Enqueteur, Menage, StatsCounter, DailyCounter, GeoCounter,
+    ImportJob,
+)
+from .search import filter_search
 
 @admin.register(Region)
 class RegionAdmin(admin.ModelAdmin):
     list_display = ('code_dr', 'nom_region')
     search_fields = ('nom_region', 'code_dr')
 
+@admin.register(Departement)
+class DepartementAdmin(admin.ModelAdmin):
+    list_display = ('code_departement', 'nom_departement', 'region')
+    list_filter = ('region',)
+    search_fields = ('code_departement', 'nom_departement')
+
+@admin.register(Commune)
+class CommuneAdmin(admin.ModelAdmin):
+    list_display = ('code_commune', 'nom_commune', 'departement')
+    search_fields = ('code_commune', 'nom_commune')
+    raw_id_fields = ('departement',)
+
+@admin.register(Grappe)
+class GrappeAdmin(admin.ModelAdmin):
+    list_display = ('code_grappe', 'commune')
+    search_fields = ('code_grappe',)
+    raw_id_fields = ('commune',)
+
 @admin.register(Superviseur)
 class SuperviseurAdmin(admin.ModelAdmin):
     list_display = ('id_superviseur',) # Ajoutez 'nom' si présent
@@ -24,12 +46,17 @@ class MenageAdmin(admin.ModelAdmin):
     list_filter = ('statut_menage', 'region', 'is_rural', 'tirage', 'enqueteur', 'superviseur_code')
     search_fields = ('idmng', 'nom_cm', 'enqueteur__nom_enqueteur')
     # raw_id_fields = ('region', 'enqueteur') # Utile si beaucoup de choix
+    raw_id_fields = ('departement', 'commune', 'grappe')
+
+    def get_search_results(self, request, queryset, search_term):
+        # Index plein texte (api/search.py) au lieu de icontains sur search_fields
+        return filter_search(queryset, search_term), False
     fieldsets = (
         (None, {
             'fields': ('idmng', 'nom_cm', 'taille_men', 'nbr_eligible')
         }),
         ('Localisation & Affectation', {
-            'fields': ('region', 'adresse', 'superviseur_code', 'enqueteur', 'cons_code', 'num_men_csv', 'is_rural')
+            'fields': ('region', 'departement', 'commune', 'grappe', 'adresse', 'superviseur_code', 'enqueteur', 'cons_code', 'num_men_csv', 'is_rural')
         }),
         ('Statut & Enquête', {
             'fields': ('statut_menage', 'tirage', 'date_enquete', 'heure_debut_enquete', 'heure_fin_enquete', 'hh_trimestre')
@@ -37,4 +64,29 @@ class MenageAdmin(admin.ModelAdmin):
         ('Contact & Observations', {
             'fields': ('telephone1', 'observations')
         }),
-    )
\ No newline at end of file
+    )
+
+@admin.register(StatsCounter)
+class StatsCounterAdmin(admin.ModelAdmin):
+    list_display = ('region', 'statut_menage', 'is_rural', 'tirage', 'count')
+    list_filter = ('region', 'statut_menage', 'is_rural', 'tirage')
+
+@admin.register(DailyCounter)
+class DailyCounterAdmin(admin.ModelAdmin):
+    list_display = ('date_enquete', 'region', 'enqueteur', 'statut_menage', 'count')
+    list_filter = ('region', 'statut_menage')
+    date_hierarchy = 'date_enquete'
+    raw_id_fields = ('enqueteur',)
+
+@admin.register(GeoCounter)
+class GeoCounterAdmin(admin.ModelAdmin):
+    list_display = ('niveau', 'code', 'parent', 'statut_menage', 'tirage', 'count')
+    list_filter = ('niveau', 'statut_menage', 'tirage')
+    search_fields = ('code', 'parent')
+
+@admin.register(ImportJob)
+class ImportJobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'statut', 'source', 'phase', 'cree_le', 'debut', 'fin', 'lignes_lues', 'lignes_ecrites')
+    list_filter = ('statut', 'source')
+    date_hierarchy = 'cree_le'
+    raw_id_fields = ('cree_par',)
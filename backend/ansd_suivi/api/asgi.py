@@ -0,0 +1,131 @@
+# api/asgi.py
+"""
+Service de l'API sous ASGI (ansd_suivi/asgi.py, ex: uvicorn).
+
+- `AsyncRoutingMiddleware` : sous ASGI et avec API_ASYNC_VIEWS=True, les URL
+  de API_ASGI_URLCONF (vues asynchrones de api/async_views.py) passent avant
+  les routes habituelles ; sous WSGI, rien ne change ;
+- `StaticFilesMiddleware` : WhiteNoise sans adaptation synchrone, sinon
+  Django ferait passer chaque requête (vue asynchrone comprise) par un thread ;
+- `gather_queries` : lectures ORM indépendantes lancées en même temps.
+
+Une vue asynchrone ne bloque pas de thread pendant qu'elle attend la base,
+mais l'ORM asynchrone de Django exécute toutes les requêtes SQL d'une même
+requête HTTP sur un seul thread, l'une après l'autre : `gather_queries`
+donne aux lectures suivantes un thread (et une connexion) d'un pool de
+API_ASYNC_QUERY_THREADS threads, s'il en reste un de libre.
+"""
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import close_old_connections, connection
+from whitenoise.middleware import WhiteNoiseMiddleware
+
+_executor_lock = threading.Lock()
+_executor = None
+_executor_slots = None
+
+
+def get_query_executor():
+    """Pool des lectures parallèles et sémaphore de ses threads libres."""
+    global _executor, _executor_slots
+    with _executor_lock:
+        if _executor is None:
+            threads = getattr(settings, 'API_ASYNC_QUERY_THREADS', 8)
+            _executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix='api-query')
+            _executor_slots = threading.BoundedSemaphore(threads)
+        return _executor, _executor_slots
+
+
+def _run_query(func, slots):
+    try:
+        return func()
+    finally:
+        # Comme en fin de requête HTTP : connexion fermée selon CONN_MAX_AGE
+        close_old_connections()
+        slots.release()
+
+
+def _run_in_order(funcs):
+    return [func() for func in funcs]
+
+
+async def gather_queries(*funcs):
+    """
+    Exécute des lectures ORM synchrones indépendantes (fonctions sans argument)
+    en même temps, chacune sur sa propre connexion ; retourne leurs résultats
+    dans l'ordre. La première reste sur la connexion de la requête, les autres
+    prennent un thread libre du pool ; pool occupé (forte charge), elles
+    suivent la première plutôt que d'attendre derrière les autres requêtes.
+    Dans une transaction, les autres connexions ne verraient pas les écritures
+    non validées : tout se fait alors sur la connexion courante.
+    """
+    # Connexion de la requête : celle du thread des appels sync_to_async
+    if len(funcs) < 2 or await sync_to_async(lambda: connection.in_atomic_block)():
+        return await sync_to_async(_run_in_order)(funcs)
+
+    executor, slots = get_query_executor()
+    pooled = []
+    for func in funcs[1:]:
+        if not slots.acquire(blocking=False):
+            break
+        pooled.append(func)
+    local = [funcs[0], *funcs[1 + len(pooled):]]
+    loop = asyncio.get_running_loop()
+    local_results, *pooled_results = await asyncio.gather(
+        sync_to_async(_run_in_order)(local),
+        *(loop.run_in_executor(executor, _run_query, func, slots) for func in pooled),
+    )
+    return [local_results[0], *pooled_results, *local_results[1:]]
+
+
+class AsyncRoutingMiddleware:
+    """Sous ASGI, résout les URL avec API_ASGI_URLCONF (si API_ASYNC_VIEWS=True)."""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'API_ASYNC_VIEWS', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.urlconf = getattr(settings, 'API_ASGI_URLCONF', 'ansd_suivi.urls_asgi')
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return self.get_response(request)
+
+    async def __acall__(self, request):
+        request.urlconf = self.urlconf
+        return await self.get_response(request)
+
+
+class StaticFilesMiddleware(WhiteNoiseMiddleware):
+    """WhiteNoiseMiddleware utilisable en mode asynchrone : seuls les fichiers statiques passent par un thread."""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response=None, settings=settings):
+        super().__init__(get_response, settings=settings)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return super().__call__(request)
+
+    async def __acall__(self, request):
+        if self.autorefresh:
+            static_file = await sync_to_async(self.find_file, thread_sensitive=False)(request.path_info)
+        else:
+            static_file = self.files.get(request.path_info)
+        if static_file is not None:
+            return await sync_to_async(self.serve, thread_sensitive=False)(static_file, request)
+        return await self.get_response(request)
@@ -0,0 +1,185 @@
+# api/async_views.py
+"""
+Variantes asynchrones des lectures les plus fréquentes du tableau de bord :
+/api/stats/global/, /api/stats/regions/ et la liste /api/menages/.
+
+Servies sous ASGI seulement (voir api/asgi.py) ; en WSGI, les vues DRF de
+api/views.py restent utilisées. DRF n'exécutant pas de vue asynchrone, ce
+sont des vues Django qui reprennent la négociation du format (JSON, colonnes,
+MessagePack), le cache versionné (mêmes entrées que @cache_api_response) et
+les réponses d'erreur de DRF. Les requêtes SQL passent par l'ORM asynchrone,
+et les lectures indépendantes partent en même temps (`gather_queries`).
+
+Le reste (écritures, OPTIONS, HTML navigable, pagination par curseur) est
+délégué à la vue DRF de la même URL (`fallback`), dont les classes
+d'authentification, de permission et de limitation de débit s'appliquent
+aussi aux lectures servies ici.
+"""
+from abc import ABCMeta, abstractmethod
+
+from asgiref.sync import sync_to_async
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework import status
+from rest_framework.exceptions import APIException, NotAcceptable, ParseError
+from rest_framework.negotiation import DefaultContentNegotiation
+from rest_framework.settings import api_settings
+
+from .cache import aget_data_version, get_cache, get_response_cache_key, get_timeout, set_validators
+from .pagination import apaginate_queryset
+from .serializers import MenageListSerializer
+from .stats import GROUP_BY_FIELDS, acompute_global_stats, acompute_grouped_stats
+from .views import MenageViewSet
+
+# Formats rendus ici ; les autres (HTML navigable) passent par la vue DRF
+ASYNC_FORMATS = ('json', 'columnar', 'msgpack')
+
+
+class AsyncAPIView(View, metaclass=ABCMeta):
+    """
+    Lecture GET/HEAD asynchrone : `get_data()`, à définir par chaque vue,
+    retourne les données de la réponse ou lève une APIException (réponse
+    d'erreur comme avec DRF).
+    """
+    fallback = None  # vue DRF synchrone de la même URL
+    cached = False  # réponses en cache comme avec @cache_api_response
+    negotiator = DefaultContentNegotiation()
+
+    @classmethod
+    def as_view(cls, **initkwargs):
+        # Comme APIView : la vue DRF de repli fait elle-même la vérification CSRF
+        return csrf_exempt(super().as_view(**initkwargs))
+
+    async def dispatch(self, request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD'):
+            return await self.call_fallback(request, *args, **kwargs)
+        return await super().dispatch(request, *args, **kwargs)
+
+    async def call_fallback(self, request, *args, **kwargs):
+        return await sync_to_async(self.fallback)(request, *args, **kwargs)
+
+    def use_fallback(self, request):
+        """Requêtes GET que seule la vue DRF sait traiter."""
+        return False
+
+    def get_fallback_view(self, request, args, kwargs):
+        """Instance de la vue DRF de repli, préparée comme par APIView.dispatch()."""
+        fallback = self.fallback
+        view = fallback.cls(**fallback.initkwargs)
+        actions = getattr(fallback, 'actions', None)
+        if actions is not None:
+            # Comme ViewSetMixin.as_view() : HEAD suit l'action de GET
+            view.action_map = {'head': actions.get('get'), **actions}
+        view.args, view.kwargs = args, kwargs
+        view.request = view.initialize_request(request, *args, **kwargs)
+        view.headers = view.default_response_headers
+        return view
+
+    def check_access(self, view):
+        """
+        Authentification, permissions et limites de débit de la vue DRF ;
+        retourne sa réponse d'erreur (rendue) en cas de refus, sinon None.
+        """
+        request = view.request
+        try:
+            view.initial(request, *view.args, **view.kwargs)
+        except Exception as exc:
+            response = view.finalize_response(request, view.handle_exception(exc), *view.args, **view.kwargs)
+            return response.render()
+        return None
+
+    async def get(self, request, *args, **kwargs):
+        view = self.get_fallback_view(request, args, kwargs)
+        drf_request = view.request
+        try:
+            renderer, media_type = self.negotiator.select_renderer(
+                drf_request, [renderer_class() for renderer_class in api_settings.DEFAULT_RENDERER_CLASSES],
+            )
+        except NotAcceptable:
+            renderer = None
+        if renderer is None or renderer.format not in ASYNC_FORMATS or self.use_fallback(drf_request):
+            return await self.call_fallback(request, *args, **kwargs)
+        # Contrôles synchrones (session, cache des limites de débit) : dans un thread
+        denied = await sync_to_async(self.check_access)(view)
+        if denied is not None:
+            return denied
+        if self.cached:
+            return await self.get_cached_response(drf_request, renderer, media_type)
+        return self.render(*await self.get_data_or_error(drf_request), renderer, media_type)
+
+    async def get_cached_response(self, request, renderer, media_type):
+        version, last_modified = await aget_data_version()
+        etag, key = get_response_cache_key(request, renderer.format, version)
+        not_modified = get_conditional_response(request._request, etag=etag, last_modified=last_modified)
+        if not_modified is not None:
+            return not_modified
+
+        cache = get_cache()
+        data = await cache.aget(key)
+        if data is None:
+            data, code = await self.get_data_or_error(request)
+            if code != status.HTTP_200_OK:
+                return self.render(data, code, renderer, media_type)
+            await cache.aset(key, data, get_timeout())
+        return set_validators(self.render(data, status.HTTP_200_OK, renderer, media_type), etag, last_modified)
+
+    async def get_data_or_error(self, request):
+        try:
+            return await self.get_data(request), status.HTTP_200_OK
+        except APIException as exc:
+            data = exc.detail if isinstance(exc.detail, (list, dict)) else {'detail': exc.detail}
+            return data, exc.status_code
+
+    @abstractmethod
+    async def get_data(self, request):
+        """Données de la réponse (sérialisables par les renderers de ASYNC_FORMATS)."""
+
+    def render(self, data, code, renderer, media_type):
+        content_type = renderer.media_type
+        if renderer.charset:
+            content_type = f"{content_type}; charset={renderer.charset}"
+        response = HttpResponse(renderer.render(data, media_type, {'view': self}), status=code, content_type=content_type)
+        patch_vary_headers(response, ['Accept'])
+        return response
+
+
+class AsyncGlobalStatsView(AsyncAPIView):
+    """Variante asynchrone de GlobalStatsAPIView."""
+    cached = True
+
+    async def get_data(self, request):
+        return await acompute_global_stats()
+
+
+class AsyncRegionStatsView(AsyncAPIView):
+    """Variante asynchrone de RegionStatsAPIView (compteurs et liste des DR lus en même temps)."""
+    cached = True
+
+    async def get_data(self, request):
+        group_by = request.query_params.get('group_by', 'region')
+        if group_by not in GROUP_BY_FIELDS:
+            raise ParseError(f"group_by doit être parmi: {', '.join(GROUP_BY_FIELDS)}")
+        return await acompute_grouped_stats(group_by)
+
+
+class AsyncMenageListView(AsyncAPIView):
+    """
+    Variante asynchrone de la liste de MenageViewSet : mêmes filtres, recherche,
+    `?fields=` / `?omit=` et pagination par numéro de page (total et page lus
+    en même temps) ; `?pagination=cursor` passe par la vue DRF.
+    """
+
+    def use_fallback(self, request):
+        return request.query_params.get('pagination') == 'cursor'
+
+    async def get_data(self, request):
+        viewset = MenageViewSet(action='list', request=request, format_kwarg=None, args=(), kwargs={})
+        fields = viewset.get_sparse_fields()
+        queryset = MenageListSerializer.values_queryset(viewset.filter_queryset(viewset.get_queryset()), fields)
+        pagination = viewset.paginator
+        rows = await apaginate_queryset(pagination, queryset, request)
+        if rows is None:
+            return MenageListSerializer.serialize_values([row async for row in queryset], fields)
+        return pagination.get_paginated_response(MenageListSerializer.serialize_values(rows, fields)).data
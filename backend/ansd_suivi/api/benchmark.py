@@ -0,0 +1,453 @@
+# api/benchmark.py
+"""
+Outils de mesure pour la commande `benchmark` : latences (percentiles),
+nombre de requêtes SQL et pic mémoire (tracemalloc) d'un appel.
+
+Les résultats sont des dicts sérialisables en JSON, pour comparer deux
+commits avec les mêmes données synthétiques (voir `generate_data`).
+"""
+import asyncio
+import gc
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager, nullcontext
+from io import BytesIO
+
+from django.conf import settings
+from django.core.handlers.asgi import ASGIHandler
+from django.core.handlers.wsgi import WSGIHandler
+from django.db import connection
+from django.db.backends.signals import connection_created
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from rest_framework.renderers import JSONRenderer
+
+from .cache import get_cache
+from .compression import brotli, compress_bytes
+from .export import EXPORT_RENDERER_CLASSES
+from .models import Menage
+from .perf import percentile
+from .renderers import ColumnarJSONRenderer, MessagePackRenderer, msgpack
+from .serializers import MenageListSerializer
+
+# (nom, URL) des scénarios mesurés par défaut
+DEFAULT_SCENARIOS = [
+    ('stats_global', '/api/stats/global/'),
+    ('stats_regions', '/api/stats/regions/'),
+    ('stats_enqueteurs', '/api/stats/regions/?group_by=enqueteur'),
+    ('stats_timeline', '/api/stats/timeline/'),
+    ('stats_classement_enqueteurs', '/api/stats/enqueteurs/?ordering=-taux_de_couverture'),
+    ('regions', '/api/regions/'),
+    ('menages_page_1', '/api/menages/'),
+    ('menages_page_100', '/api/menages/?page=100'),
+    ('menages_filtre_region_statut', '/api/menages/?region__code_dr=07&statut_menage=1'),
+    ('menages_filtre_enqueteur', '/api/menages/?enqueteur__login_enq=070001'),
+    ('menages_curseur', '/api/menages/?pagination=cursor&ordering=date_enquete'),
+]
+
+# Réponses dont on compare la taille et le temps d'encodage selon le format
+PAYLOAD_SCENARIOS = [
+    ('menages_page_100', '/api/menages/?page_size=100'),
+    ('menages_page_100_3_champs', '/api/menages/?page_size=100&fields=idmng,statut_menage,nom_cm'),
+    ('stats_global', '/api/stats/global/'),
+    ('stats_regions', '/api/stats/regions/'),
+    ('stats_enqueteurs', '/api/stats/regions/?group_by=enqueteur'),
+    ('stats_timeline', '/api/stats/timeline/'),
+    ('stats_tree', '/api/stats/tree/'),
+]
+EXPORT_URL = '/api/menages/export/'
+
+# Lectures sans cache API (liste des ménages) pour le test de concurrence :
+# chaque appel interroge la base pendant que l'import écrit.
+CONCURRENT_READ_URLS = [
+    '/api/menages/',
+    '/api/menages/?region__code_dr=07&statut_menage=1',
+    '/api/menages/?pagination=cursor&ordering=date_enquete',
+    '/api/menages/?search=diop',
+]
+
+# Test de charge WSGI / ASGI : URL servies par les vues asynchrones sous ASGI
+LOAD_TEST_SCENARIOS = [
+    ('stats_global', '/api/stats/global/'),
+    ('stats_regions', '/api/stats/regions/'),
+    ('stats_enqueteurs', '/api/stats/regions/?group_by=enqueteur'),
+    ('menages_page_10', '/api/menages/?page=10'),
+]
+LOAD_TEST_CACHE_ALIAS = 'benchmark-sans-cache'
+
+
+def summarize(durations):
+    """Résumé (en millisecondes) d'une liste de durées en secondes."""
+    values = sorted(d * 1000 for d in durations)
+    if not values:
+        return {'runs': 0}
+    return {
+        'runs': len(values),
+        'min_ms': round(values[0], 3),
+        'p50_ms': round(percentile(values, 50), 3),
+        'p95_ms': round(percentile(values, 95), 3),
+        'p99_ms': round(percentile(values, 99), 3),
+        'max_ms': round(values[-1], 3),
+        'mean_ms': round(sum(values) / len(values), 3),
+    }
+
+
+def peak_memory(func):
+    """Exécute `func` sous tracemalloc ; retourne (résultat, pic d'allocation en Ko)."""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        result = func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return result, round(peak / 1024, 1)
+
+
+def measure(func, repeat=20, warmup=1, before_each=None, memory=True):
+    """
+    Mesure `func` : `repeat` (>= 1) exécutions chronométrées (après `warmup` à vide),
+    nombre de requêtes SQL de la dernière exécution et pic mémoire (exécution
+    séparée, tracemalloc ralentissant le code mesuré).
+    """
+    for _ in range(warmup):
+        if before_each:
+            before_each()
+        func()
+
+    durations = []
+    for i in range(repeat):
+        if before_each:
+            before_each()
+        if i == repeat - 1:
+            with CaptureQueriesContext(connection) as queries:
+                start = time.perf_counter()
+                func()
+                durations.append(time.perf_counter() - start)
+        else:
+            start = time.perf_counter()
+            func()
+            durations.append(time.perf_counter() - start)
+
+    result = summarize(durations)
+    result['queries'] = len(queries)
+    if memory:
+        if before_each:
+            before_each()
+        _, result['peak_memory_kb'] = peak_memory(func)
+    return result
+
+
+def benchmark_endpoints(scenarios=DEFAULT_SCENARIOS, repeat=20, memory=True):
+    """
+    Mesure chaque URL deux fois : à froid (cache API vidé avant chaque appel)
+    et à chaud (réponses servies depuis le cache).
+    """
+    client = Client()
+    results = {}
+    for name, url in scenarios:
+        def call(url=url):
+            response = client.get(url)
+            if response.status_code != 200:
+                raise RuntimeError(f"{url} a répondu {response.status_code}")
+            return response
+
+        try:
+            results[name] = {
+                'url': url,
+                'cold': measure(call, repeat=repeat, before_each=get_cache().clear, memory=memory),
+                'warm': measure(call, repeat=repeat, memory=memory),
+            }
+        except RuntimeError as e:
+            # Ex: page inexistante sur un petit jeu de données
+            results[name] = {'url': url, 'error': str(e)}
+    return results
+
+
+def benchmark_list_serialization(sizes=(100, 10_000), repeat=10):
+    """
+    Compare, sur les N premiers ménages, la liste via MenageListSerializer
+    (instances + champs DRF) et la lecture rapide par .values().
+    Requête SQL comprise dans les deux cas.
+    """
+    queryset = Menage.objects.select_related('region', 'enqueteur__superviseur').order_by('idmng')
+    results = {}
+    for size in sizes:
+        def drf():
+            return MenageListSerializer(queryset[:size], many=True).data
+
+        def values():
+            return MenageListSerializer.serialize_values(MenageListSerializer.values_queryset(queryset)[:size])
+
+        slow = measure(drf, repeat=repeat, memory=False)
+        fast = measure(values, repeat=repeat, memory=False)
+        results[str(size)] = {
+            'rows': len(values()),
+            'serializer': slow,
+            'values': fast,
+            'speedup': round(slow['p50_ms'] / fast['p50_ms'], 2) if fast['p50_ms'] else None,
+        }
+    return results
+
+
+def _read_loop(urls, offset, stop):
+    """Boucle d'un lecteur (thread) : durées des réponses 200 et erreurs par type."""
+    client = Client()
+    durations = []
+    errors = Counter()
+    i = offset
+    try:
+        while not stop.is_set():
+            url = urls[i % len(urls)]
+            i += 1
+            start = time.perf_counter()
+            try:
+                response = client.get(url)
+            except Exception as e:  # ex: OperationalError "database is locked"
+                errors[f"{type(e).__name__}: {e}"[:120]] += 1
+                continue
+            if response.status_code != 200:
+                errors[f"HTTP {response.status_code}"] += 1
+                continue
+            durations.append(time.perf_counter() - start)
+    finally:
+        connection.close()
+    return durations, errors
+
+
+def benchmark_concurrent_reads(writer=None, readers=4, duration=5.0, urls=CONCURRENT_READ_URLS):
+    """
+    Débit de lecture avec `readers` threads qui appellent `urls` en boucle :
+    pendant `duration` secondes, ou pendant l'exécution de `writer()` (ex: un
+    import) dans le thread courant si fourni. Retourne le débit, les latences,
+    les erreurs des lecteurs et la durée de l'écriture.
+    """
+    stop = threading.Event()
+    result = {'readers': readers}
+    with ThreadPoolExecutor(readers) as pool:
+        futures = [pool.submit(_read_loop, urls, i, stop) for i in range(readers)]
+        start = time.perf_counter()
+        try:
+            if writer is None:
+                time.sleep(duration)
+            else:
+                try:
+                    writer()
+                except Exception as e:
+                    result['writer_error'] = f"{type(e).__name__}: {e}"
+                result['writer_s'] = round(time.perf_counter() - start, 3)
+        finally:
+            stop.set()
+        elapsed = time.perf_counter() - start
+        durations, errors = [], Counter()
+        for future in futures:
+            thread_durations, thread_errors = future.result()
+            durations.extend(thread_durations)
+            errors.update(thread_errors)
+    result.update({
+        'duration_s': round(elapsed, 3),
+        'requests': len(durations),
+        'requests_per_s': round(len(durations) / elapsed, 1) if elapsed else None,
+        'latency': summarize(durations),
+        'errors': dict(errors),
+    })
+    return result
+
+
+def payload_renderers():
+    """(format, renderer) comparés : JSON actuel, JSON en colonnes, MessagePack si installé."""
+    result = [('json', JSONRenderer()), ('columnar', ColumnarJSONRenderer())]
+    if msgpack is not None:
+        result.append(('msgpack', MessagePackRenderer()))
+    return result
+
+
+def compressed_sizes(body):
+    """Taille du corps et de ses versions compressées (gzip, brotli si installé)."""
+    sizes = {'bytes': len(body), 'gzip_bytes': len(compress_bytes(body, 'gzip'))}
+    if brotli is not None:
+        sizes['br_bytes'] = len(compress_bytes(body, 'br'))
+    return sizes
+
+
+def benchmark_payloads(scenarios=PAYLOAD_SCENARIOS, repeat=20, export_repeat=3):
+    """
+    Pour chaque URL : taille de la réponse (brute et compressée) et temps
+    d'encodage des mêmes données par chaque renderer ; pour l'export, taille
+    et durée du flux complet dans chaque format.
+    """
+    client = Client()
+    results = {}
+    for name, url in scenarios:
+        response = client.get(url)
+        if response.status_code != 200:
+            results[name] = {'url': url, 'error': f"{url} a répondu {response.status_code}"}
+            continue
+        formats = {}
+        for fmt, renderer in payload_renderers():
+            def render(renderer=renderer, data=response.data):
+                return renderer.render(data, renderer.media_type, {})
+
+            formats[fmt] = {**compressed_sizes(render()), 'encode': measure(render, repeat=repeat, memory=False)}
+            if fmt != 'json':
+                formats[fmt]['ratio_vs_json'] = round(formats[fmt]['bytes'] / formats['json']['bytes'], 3)
+        results[name] = {'url': url, 'formats': formats}
+
+    export = {}
+    for renderer_class in EXPORT_RENDERER_CLASSES:
+        fmt = renderer_class.format
+
+        def download(fmt=fmt):
+            return b''.join(client.get(EXPORT_URL, {'format': fmt}).streaming_content)
+
+        export[fmt] = {**compressed_sizes(download()), 'duration': measure(download, repeat=export_repeat, memory=False)}
+    results['export'] = {'url': EXPORT_URL, 'formats': export}
+    return results
+
+
+def wsgi_get(application, url):
+    """GET sur une application WSGI, comme un serveur à threads ; retourne le code HTTP."""
+    path, _, query = url.partition('?')
+    environ = {
+        'REQUEST_METHOD': 'GET', 'SCRIPT_NAME': '', 'PATH_INFO': path, 'QUERY_STRING': query,
+        'SERVER_NAME': 'testserver', 'SERVER_PORT': '80', 'SERVER_PROTOCOL': 'HTTP/1.1',
+        'REMOTE_ADDR': '127.0.0.1', 'HTTP_HOST': 'testserver',
+        'wsgi.version': (1, 0), 'wsgi.url_scheme': 'http', 'wsgi.input': BytesIO(), 'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True, 'wsgi.multiprocess': False, 'wsgi.run_once': False,
+    }
+    statuses = []
+    result = application(environ, lambda status, headers, exc_info=None: statuses.append(status))
+    try:
+        for _ in result:
+            pass
+    finally:
+        # Fin de requête (signal request_finished), comme le ferait le serveur
+        result.close()
+    return int(statuses[0].split()[0])
+
+
+async def asgi_get(application, url):
+    """GET sur une application ASGI, comme un serveur (uvicorn...) ; retourne le code HTTP."""
+    path, _, query = url.partition('?')
+    scope = {
+        'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET', 'scheme': 'http',
+        'path': path, 'raw_path': path.encode('utf-8'), 'query_string': query.encode('utf-8'), 'root_path': '',
+        'headers': [(b'host', b'testserver')], 'client': ('127.0.0.1', 0), 'server': ('testserver', 80),
+    }
+    done = asyncio.Event()
+    response = {}
+
+    async def receive():
+        if 'requested' not in response:
+            response['requested'] = True
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+        # Le client reste connecté jusqu'à la fin de la réponse
+        await done.wait()
+        return {'type': 'http.disconnect'}
+
+    async def send(message):
+        if message['type'] == 'http.response.start':
+            response['status'] = message['status']
+        elif message['type'] == 'http.response.body' and not message.get('more_body'):
+            done.set()
+
+    await application(scope, receive, send)
+    return response['status']
+
+
+@contextmanager
+def simulated_db_latency(delay):
+    """
+    Ajoute `delay` secondes d'attente (réseau) avant chaque requête SQL des
+    connexions ouvertes dans le bloc : simule une base distante (PostgreSQL)
+    avec la base locale du benchmark.
+    """
+    def wrapper(execute, sql, params, many, context):
+        time.sleep(delay)
+        return execute(sql, params, many, context)
+
+    def add_wrapper(sender, connection, **kwargs):
+        # Signal envoyé à chaque reconnexion du même DatabaseWrapper
+        if wrapper not in connection.execute_wrappers:
+            connection.execute_wrappers.append(wrapper)
+
+    connection_created.connect(add_wrapper, weak=False)
+    try:
+        yield
+    finally:
+        connection_created.disconnect(add_wrapper)
+
+
+async def _load(call, url, clients, duration):
+    """`clients` clients simultanés qui enchaînent `await call(url)` pendant `duration` secondes."""
+    stop_at = time.perf_counter() + duration
+    durations, errors = [], Counter()
+
+    async def client():
+        while time.perf_counter() < stop_at:
+            start = time.perf_counter()
+            try:
+                code = await call(url)
+            except Exception as e:
+                errors[f"{type(e).__name__}: {e}"[:120]] += 1
+                continue
+            if code != 200:
+                errors[f"HTTP {code}"] += 1
+                continue
+            durations.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(clients)))
+    elapsed = time.perf_counter() - start
+    return {
+        'duration_s': round(elapsed, 3),
+        'requests': len(durations),
+        'requests_per_s': round(len(durations) / elapsed, 1) if elapsed else None,
+        'latency': summarize(durations),
+        'errors': dict(errors),
+    }
+
+
+def benchmark_server_modes(
+    scenarios=LOAD_TEST_SCENARIOS, clients=500, duration=10.0, wsgi_threads=32, cache=False, db_latency_ms=0,
+):
+    """
+    Test de charge WSGI contre ASGI, dans ce processus : `clients` clients
+    simultanés appellent chaque URL en boucle pendant `duration` secondes,
+    servis par WSGIHandler sur `wsgi_threads` threads (serveur à threads type
+    gunicorn --threads), puis par ASGIHandler sur une boucle asyncio (type
+    uvicorn, vues asynchrones de api/async_views.py). Sans `cache`, le cache
+    API est remplacé par un DummyCache : chaque requête interroge la base.
+    Pas de réseau : seule la partie Django et base de données est mesurée ;
+    `db_latency_ms` ajoute une attente avant chaque requête SQL (base distante).
+    """
+    results = {
+        'clients': clients, 'duration_s': duration, 'wsgi_threads': wsgi_threads, 'cache': cache,
+        'db_latency_ms': db_latency_ms,
+    }
+    no_cache = override_settings(
+        CACHES={**settings.CACHES, LOAD_TEST_CACHE_ALIAS: {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}},
+        API_CACHE_ALIAS=LOAD_TEST_CACHE_ALIAS,
+    )
+    latency = simulated_db_latency(db_latency_ms / 1000) if db_latency_ms else nullcontext()
+    # Actif à la création des gestionnaires : AsyncRoutingMiddleware est instancié à ce moment-là
+    async_views = override_settings(API_ASYNC_VIEWS=True)
+    with nullcontext() if cache else no_cache, async_views, latency, ThreadPoolExecutor(wsgi_threads) as pool:
+        wsgi_application, asgi_application = WSGIHandler(), ASGIHandler()
+
+        async def load_wsgi(url):
+            loop = asyncio.get_running_loop()
+            return await _load(lambda u: loop.run_in_executor(pool, wsgi_get, wsgi_application, u), url, clients, duration)
+
+        for name, url in scenarios:
+            wsgi = asyncio.run(load_wsgi(url))
+            asgi = asyncio.run(_load(lambda u: asgi_get(asgi_application, u), url, clients, duration))
+            results[name] = {
+                'url': url, 'wsgi': wsgi, 'asgi': asgi,
+                'asgi_vs_wsgi_rps': round(asgi['requests_per_s'] / wsgi['requests_per_s'], 2) if wsgi['requests_per_s'] else None,
+            }
+    return results
@@ -0,0 +1,105 @@
+# api/bulk.py
+"""
+Mise à jour en masse des ménages (/api/menages/bulk/).
+
+Les mêmes modifications sont appliquées à un ensemble de ménages désignés par
+leurs identifiants ou par un filtre : lecture des lignes en une requête,
+UPDATE ensembliste par paquets, compteurs, index de recherche et cache mis à
+jour une seule fois pour tout le lot, le tout dans une transaction.
+"""
+from django.db import transaction
+from rest_framework.exceptions import ValidationError
+
+from .cache import bump_data_version
+from .counters import ROLLUP_FIELDS, CounterDeltas
+from .models import Menage
+from .search import index_menages
+from .stream import notify_stats_changed
+
+BULK_MAX_ROWS = 10000
+BULK_CHUNK_SIZE = 2000
+
+# Champs modifiables en masse (affectation, statut, suivi de l'enquête)
+BULK_UPDATE_FIELDS = (
+    'enqueteur', 'superviseur_code', 'statut_menage', 'tirage',
+    'date_enquete', 'heure_debut_enquete', 'heure_fin_enquete', 'observations',
+)
+
+RESULTAT_MODIFIE = 'modifie'
+RESULTAT_INCHANGE = 'inchange'
+RESULTAT_INTROUVABLE = 'introuvable'
+
+
+def to_columns(changes):
+    """{champ: valeur validée} -> {colonne: valeur} (instances de FK remplacées par leur clé)."""
+    columns = {}
+    for name, value in changes.items():
+        field = Menage._meta.get_field(name)
+        if field.is_relation:
+            value = value.pk if value is not None else None
+        columns[field.attname] = value
+    return columns
+
+
+def bulk_update_menages(queryset, changes, idmngs=None):
+    """
+    Applique `changes` (données validées de MenageBulkChangesSerializer) aux
+    ménages de `queryset`. Si `idmngs` est fourni, les identifiants absents
+    sont signalés comme introuvables.
+
+    Retourne la liste ordonnée des {"idmng", "resultat"}.
+    """
+    columns = to_columns(changes)
+    with transaction.atomic():
+        rows = list(
+            queryset.order_by('idmng').select_for_update()
+            .values('idmng', *dict.fromkeys(ROLLUP_FIELDS + tuple(columns)))[:BULK_MAX_ROWS + 1]
+        )
+        if len(rows) > BULK_MAX_ROWS:
+            raise ValidationError({'detail': f"Au plus {BULK_MAX_ROWS} ménages par requête."})
+
+        deltas = CounterDeltas()
+        modifies = []
+        for row in rows:
+            if all(row[column] == value for column, value in columns.items()):
+                continue
+            deltas.add(row, -1)
+            deltas.add({**row, **columns}, 1)
+            modifies.append(row['idmng'])
+
+        for start in range(0, len(modifies), BULK_CHUNK_SIZE):
+            Menage.objects.filter(idmng__in=modifies[start:start + BULK_CHUNK_SIZE]).update(**columns)
+        if modifies:
+            deltas.apply()
+            if 'enqueteur_id' in columns:
+                # Le nom de l'enquêteur fait partie du document de recherche
+                index_menages(modifies)
+
+    if modifies:
+        bump_data_version()
+        notify_stats_changed()
+
+    modifies = set(modifies)
+    resultats = {
+        row['idmng']: RESULTAT_MODIFIE if row['idmng'] in modifies else RESULTAT_INCHANGE
+        for row in rows
+    }
+    if idmngs is not None:
+        return [
+            {'idmng': idmng, 'resultat': resultats.get(idmng, RESULTAT_INTROUVABLE)}
+            for idmng in dict.fromkeys(idmngs)
+        ]
+    return [{'idmng': idmng, 'resultat': resultat} for idmng, resultat in resultats.items()]
+
+
+def summarize_bulk_results(resultats):
+    """Réponse de l'API : totaux par résultat, puis le détail par ménage."""
+    totaux = {RESULTAT_MODIFIE: 0, RESULTAT_INCHANGE: 0, RESULTAT_INTROUVABLE: 0}
+    for row in resultats:
+        totaux[row['resultat']] += 1
+    return {
+        'modifies': totaux[RESULTAT_MODIFIE],
+        'inchanges': totaux[RESULTAT_INCHANGE],
+        'introuvables': totaux[RESULTAT_INTROUVABLE],
+        'resultats': resultats,
+    }
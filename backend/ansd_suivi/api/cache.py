@@ -0,0 +1,191 @@
+# api/cache.py
+"""
+Cache des réponses API en lecture (statistiques, référentiels).
+
+Les clés sont versionnées par une "version des données" : toute écriture sur
+les ménages (signaux) ou la fin d'un import la change, ce qui rend les
+anciennes entrées inaccessibles. Entre deux changements, une réponse déjà
+calculée est servie sans la recalculer, et les clients qui renvoient l'ETag /
+Last-Modified reçoivent un 304.
+
+Avec un backend de cache partagé (redis, fichiers), la version est stockée
+dans le cache lui-même (clé `DATA_VERSION_KEY`), remplacée d'un seul `set`
+à la validation de la transaction : une réponse en cache est servie sans
+requête SQL. Avec un backend propre au processus (locmem, dummy), la version
+est lue en base (ligne unique `DataVersion`, changée dans la transaction de
+l'écriture) pour rester commune à tous les processus (workers gunicorn,
+`import_data`, `run_import_jobs`) ; seules les réponses sont alors calculées
+une fois par processus.
+"""
+import hashlib
+import threading
+import uuid
+from contextlib import contextmanager
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from rest_framework import status
+from rest_framework.response import Response
+
+from .models import DataVersion
+
+DATA_VERSION_KEY = 'api:data-version'
+
+_state = threading.local()
+
+
+def get_cache():
+    return caches[getattr(settings, 'API_CACHE_ALIAS', 'default')]
+
+
+def get_timeout():
+    return getattr(settings, 'API_CACHE_TIMEOUT', None)
+
+
+def version_in_cache(cache):
+    """La version peut-elle être stockée dans `cache` (backend partagé entre processus) ?"""
+    return not isinstance(cache, (LocMemCache, DummyCache))
+
+
+def new_data_version():
+    return uuid.uuid4().hex, int(timezone.now().timestamp())
+
+
+def bump_data_version():
+    """Invalide toutes les réponses en cache (nouvelle version des données)."""
+    if getattr(_state, 'suspended', False):
+        return
+    cache = get_cache()
+    if version_in_cache(cache):
+        # Publiée à la validation : avant, une réponse calculée sur les anciennes
+        # données serait mise en cache sous la nouvelle version
+        transaction.on_commit(lambda: cache.set(DATA_VERSION_KEY, new_data_version(), None))
+        return
+    values = {'version': uuid.uuid4().hex, 'modifie_le': timezone.now()}
+    if DataVersion.objects.filter(pk=DataVersion.PK).update(**values):
+        return
+    try:
+        with transaction.atomic():
+            DataVersion.objects.create(pk=DataVersion.PK, **values)
+    except IntegrityError:
+        # Ligne créée entre-temps par un autre processus
+        DataVersion.objects.filter(pk=DataVersion.PK).update(**values)
+
+
+@contextmanager
+def invalidation_suspended():
+    """Suspend l'invalidation unitaire (ex: import en masse, qui invalide une fois à la fin)."""
+    previous = getattr(_state, 'suspended', False)
+    _state.suspended = True
+    try:
+        yield
+    finally:
+        _state.suspended = previous
+
+
+def get_data_version():
+    """Retourne (version, timestamp de dernière modification), initialisés si absents."""
+    cache = get_cache()
+    if version_in_cache(cache):
+        value = cache.get(DATA_VERSION_KEY)
+        if value is None:
+            # Première lecture ou clé évincée : le premier processus à l'écrire l'emporte
+            value = new_data_version()
+            if not cache.add(DATA_VERSION_KEY, value, None):
+                value = cache.get(DATA_VERSION_KEY) or value
+        return value
+    row = DataVersion.objects.filter(pk=DataVersion.PK).values_list('version', 'modifie_le').first()
+    if row is None:
+        bump_data_version()
+        row = DataVersion.objects.filter(pk=DataVersion.PK).values_list('version', 'modifie_le').first()
+    if row is None:
+        # Invalidation suspendue avant toute écriture de la version
+        return '', int(timezone.now().timestamp())
+    return row[0], int(row[1].timestamp())
+
+
+def cached_for_data_version(name, compute):
+    """
+    Résultat de `compute()`, mis en cache sous `name` jusqu'au prochain
+    changement des données (ex: liste complète triée puis paginée par requête).
+    """
+    version, _ = get_data_version()
+    cache = get_cache()
+    key = f"api:data:{version}:{name}"
+    value = cache.get(key)
+    if value is None:
+        value = compute()
+        cache.set(key, value, get_timeout())
+    return value
+
+
+async def aget_data_version():
+    """Version asynchrone de `get_data_version`."""
+    cache = get_cache()
+    if version_in_cache(cache):
+        value = await cache.aget(DATA_VERSION_KEY)
+        if value is not None:
+            return value
+        return await sync_to_async(get_data_version)()
+    row = await DataVersion.objects.filter(pk=DataVersion.PK).values_list('version', 'modifie_le').afirst()
+    if row is not None:
+        return row[0], int(row[1].timestamp())
+    return await sync_to_async(get_data_version)()
+
+
+def get_response_cache_key(request, renderer_format, version):
+    """(ETag, clé de cache) d'une réponse : chemin complet et format de rendu, pour `version`."""
+    signature = hashlib.md5(
+        f"{request.get_full_path()}|{renderer_format}".encode('utf-8')
+    ).hexdigest()
+    return f'"{version}-{signature[:16]}"', f"api:response:{version}:{signature}"
+
+
+def set_validators(response, etag, last_modified):
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    # Le client peut garder la réponse mais doit la revalider (304 si inchangée)
+    response['Cache-Control'] = 'no-cache'
+    return response
+
+
+def cache_api_response(method):
+    """
+    Décorateur pour les méthodes GET des vues DRF (get, list...).
+
+    La réponse (données non rendues) est mise en cache sous une clé qui dépend
+    de la version des données, du chemin complet et du format de rendu.
+    Les vues asynchrones (api/async_views.py) partagent les mêmes entrées.
+    """
+    @wraps(method)
+    def wrapper(self, request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD'):
+            return method(self, request, *args, **kwargs)
+
+        version, last_modified = get_data_version()
+        renderer_format = getattr(getattr(request, 'accepted_renderer', None), 'format', '')
+        etag, key = get_response_cache_key(request, renderer_format, version)
+
+        not_modified = get_conditional_response(request._request, etag=etag, last_modified=last_modified)
+        if not_modified is not None:
+            return not_modified
+
+        cache = get_cache()
+        data = cache.get(key)
+        if data is None:
+            response = method(self, request, *args, **kwargs)
+            if response.status_code != status.HTTP_200_OK:
+                return response
+            cache.set(key, response.data, get_timeout())
+        else:
+            response = Response(data)
+        return set_validators(response, etag, last_modified)
+    return wrapper
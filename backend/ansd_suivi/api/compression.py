@@ -0,0 +1,140 @@
+# api/compression.py
+"""
+Compression négociée des réponses de l'API (WhiteNoise ne compresse que les
+fichiers statiques).
+
+Selon l'en-tête Accept-Encoding du client : brotli si le paquet `brotli` est
+installé (facultatif, `pip install brotli`), sinon gzip. Seules les réponses
+sous API_COMPRESSION_PATH_PREFIX d'au moins API_COMPRESSION_MIN_SIZE octets
+sont compressées : en dessous, le gain ne compense pas le coût CPU.
+
+Les exports en flux sont compressés morceau par morceau. Le flux SSE
+(text/event-stream) n'est jamais compressé : chaque message doit partir
+immédiatement.
+"""
+import re
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+from django.utils.deprecation import MiddlewareMixin
+from django.utils.text import compress_sequence, compress_string
+
+from .perf import perf_section
+
+try:
+    import brotli
+except ImportError:  # brotli facultatif : gzip seul
+    brotli = None
+
+# Types de contenu compressés (préfixes)
+COMPRESSIBLE_TYPES = (
+    'application/json', 'application/vnd.ansd', 'application/msgpack', 'application/x-ndjson',
+    'text/csv', 'text/html', 'text/plain',
+)
+
+_ACCEPT_ENCODING = re.compile(r'\s*([\w*-]+)\s*(?:;\s*q\s*=\s*([0-9.]+))?\s*')
+
+
+def get_min_size():
+    return getattr(settings, 'API_COMPRESSION_MIN_SIZE', 1024)
+
+
+def get_brotli_quality():
+    # 4 à 5 : bon compromis pour des réponses dynamiques (11 est réservé au statique)
+    return getattr(settings, 'API_BROTLI_QUALITY', 4)
+
+
+def available_encodings():
+    """Encodages proposés, par ordre de préférence du serveur."""
+    return ('br', 'gzip') if brotli is not None else ('gzip',)
+
+
+def choose_encoding(accept_encoding):
+    """Encodage à utiliser d'après l'en-tête Accept-Encoding, ou None."""
+    weights = {}
+    for part in accept_encoding.split(','):
+        match = _ACCEPT_ENCODING.fullmatch(part)
+        if not match:
+            continue
+        try:
+            weights[match[1].lower()] = float(match[2]) if match[2] else 1.0
+        except ValueError:
+            continue
+    candidates = [
+        (weights.get(encoding, weights.get('*', 0)), -rank, encoding)
+        for rank, encoding in enumerate(available_encodings())
+    ]
+    weight, _, encoding = max(candidates)
+    return encoding if weight > 0 else None
+
+
+def compress_bytes(data, encoding):
+    if encoding == 'br':
+        return brotli.compress(data, quality=get_brotli_quality())
+    return compress_string(data)
+
+
+def compress_stream(chunks, encoding):
+    """Compression en flux : chaque morceau est émis dès qu'il est compressé."""
+    if encoding == 'gzip':
+        yield from compress_sequence(chunks)
+        return
+    compressor = brotli.Compressor(quality=get_brotli_quality())
+    for chunk in chunks:
+        data = compressor.process(chunk) + compressor.flush()
+        if data:
+            yield data
+    yield compressor.finish()
+
+
+class CompressionMiddleware(MiddlewareMixin):
+    """
+    Compresse les réponses de l'API (voir le docstring du module). À placer
+    avant tout middleware qui lit ou modifie le corps des réponses.
+    """
+
+    def is_compressible(self, request, response):
+        prefix = getattr(settings, 'API_COMPRESSION_PATH_PREFIX', '/api/')
+        if not request.path.startswith(prefix) or response.has_header('Content-Encoding'):
+            return False
+        content_type = response.get('Content-Type', '').split(';')[0].strip()
+        if not content_type.startswith(COMPRESSIBLE_TYPES):
+            return False
+        if response.streaming:
+            return not response.is_async
+        return len(response.content) >= get_min_size()
+
+    async def __acall__(self, request):
+        # Sous ASGI, seules les réponses à compresser passent par un thread
+        response = await self.get_response(request)
+        if not self.is_compressible(request, response):
+            return response
+        return await sync_to_async(self.process_response, thread_sensitive=False)(request, response)
+
+    def process_response(self, request, response):
+        if not self.is_compressible(request, response):
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        encoding = choose_encoding(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        if encoding is None:
+            return response
+
+        if response.streaming:
+            response.streaming_content = compress_stream(response.streaming_content, encoding)
+            del response['Content-Length']
+        else:
+            with perf_section('compression'):
+                compressed = compress_bytes(response.content, encoding)
+            if len(compressed) >= len(response.content):
+                return response
+            response.content = compressed
+            response['Content-Length'] = str(len(compressed))
+
+        # Le corps n'est plus identique octet pour octet : ETag faible
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = 'W/' + etag
+        response['Content-Encoding'] = encoding
+        return response
@@ -0,0 +1,248 @@
+# api/counters.py
+"""
+Maintenance des tables de compteurs matérialisés (`StatsCounter`,
+`DailyCounter`, `GeoCounter`).
+
+Chaque table (ou, pour `GeoCounter`, chaque niveau géographique) est décrite
+par un `Rollup` : ses champs de regroupement portent le même nom que dans
+`Menage` (sauf correspondance `columns` explicite), ce qui permet d'appliquer
+les mêmes filtres aux ménages et aux compteurs. Les écritures unitaires sur `Menage` appliquent un
+delta (+1/-1) sur les lignes concernées ; les imports en masse appellent
+`rebuild_counters()` ou accumulent leurs deltas dans un `CounterDeltas`.
+"""
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+
+from django.db import IntegrityError, transaction
+from django.db.models import Case, Count, F, IntegerField, Q, Value, When
+
+from .models import Menage, StatsCounter, DailyCounter, GeoCounter
+
+# Lignes de compteurs mises à jour par requête dans `Rollup.apply_deltas`
+UPDATE_CHUNK_SIZE = 500
+
+COUNTER_FIELDS = ('region_id', 'statut_menage', 'is_rural', 'tirage')
+DAILY_FIELDS = ('date_enquete', 'region_id', 'enqueteur_id', 'statut_menage')
+
+_state = threading.local()
+
+
+class Rollup:
+    """Table de compteurs `model` : nombre de ménages par valeurs de `fields`."""
+
+    def __init__(self, model, fields, required=('region_id',), columns=None, scope=None):
+        self.model = model
+        self.fields = fields
+        # Colonnes de `model` alignées sur `fields` (mêmes noms par défaut), et
+        # valeurs fixes des lignes de ce rollup lorsque la table est partagée
+        self.columns = columns or fields
+        self.scope = scope or {}
+        # Champs obligatoires : un ménage dont l'un d'eux est vide n'est pas compté
+        self.required = [fields.index(field) for field in required]
+        self.condition = Q(**{f"{field}__isnull": False for field in required})
+
+    def __str__(self):
+        name = str(self.model._meta.verbose_name_plural)
+        return f"{name} ({self.scope['niveau']})" if 'niveau' in self.scope else name
+
+    def lookup(self, key):
+        """Filtre (colonnes du modèle) de la ligne de compteur `key`."""
+        return {**self.scope, **dict(zip(self.columns, key))}
+
+    def stored(self):
+        return self.model.objects.filter(**self.scope)
+
+    def key(self, menage):
+        """Clé du compteur d'un ménage (instance ou dict), ou None s'il n'est pas compté."""
+        if isinstance(menage, dict):
+            values = tuple(menage[field] for field in self.fields)
+        else:
+            values = tuple(getattr(menage, field) for field in self.fields)
+        if any(values[i] is None for i in self.required):
+            return None
+        return values
+
+    def apply_delta(self, key, delta):
+        """Ajoute `delta` au compteur identifié par `key`, en créant la ligne si besoin."""
+        if not delta or key is None:
+            return
+        lookup = self.lookup(key)
+        with transaction.atomic():
+            updated = self.model.objects.filter(**lookup).update(count=F('count') + delta)
+            if not updated and delta > 0:
+                try:
+                    with transaction.atomic():
+                        self.model.objects.create(count=delta, **lookup)
+                except IntegrityError:
+                    # Ligne créée entre-temps par une écriture concurrente
+                    self.model.objects.filter(**lookup).update(count=F('count') + delta)
+
+    def apply_deltas(self, deltas):
+        """
+        Applique {clé: delta} en quelques requêtes : lecture des lignes existantes,
+        mise à jour groupée (CASE sur la clé primaire) puis insertion des lignes
+        manquantes. Retourne le nombre de compteurs ajustés.
+        """
+        deltas = {key: delta for key, delta in deltas.items() if delta and key is not None}
+        if not deltas:
+            return 0
+        first = self.columns[0]
+        with transaction.atomic():
+            rows = self.stored().filter(**{f"{first}__in": {key[0] for key in deltas}}).values_list('pk', *self.columns)
+            existing = {tuple(row[1:]): row[0] for row in rows}
+            updates = [(existing[key], delta) for key, delta in deltas.items() if key in existing]
+            for start in range(0, len(updates), UPDATE_CHUNK_SIZE):
+                chunk = updates[start:start + UPDATE_CHUNK_SIZE]
+                self.model.objects.filter(pk__in=[pk for pk, _ in chunk]).update(count=F('count') + Case(
+                    *(When(pk=pk, then=Value(delta)) for pk, delta in chunk), output_field=IntegerField(),
+                ))
+            missing = {key: delta for key, delta in deltas.items() if key not in existing and delta > 0}
+            try:
+                with transaction.atomic():
+                    self.model.objects.bulk_create(
+                        [self.model(count=delta, **self.lookup(key)) for key, delta in missing.items()], batch_size=2000,
+                    )
+            except IntegrityError:
+                # Lignes créées entre-temps par une écriture concurrente
+                for key, delta in missing.items():
+                    self.apply_delta(key, delta)
+        return len(deltas)
+
+    def recount(self, queryset=None):
+        """Comptage complet depuis `Menage` (ou `queryset`) : {clé: count}."""
+        if queryset is None:
+            queryset = Menage.objects.all()
+        rows = queryset.filter(self.condition).values(*self.fields).annotate(count=Count('idmng')).order_by()
+        return {self.key(row): row['count'] for row in rows}
+
+    def current(self):
+        """Contenu actuel de la table : {clé: count} (compteurs non nuls)."""
+        rows = self.stored().filter(count__gt=0).values_list(*self.columns, 'count')
+        totals = defaultdict(int)
+        for row in rows:
+            totals[row[:-1]] += row[-1]
+        return dict(totals)
+
+    def rebuild(self, condition=None):
+        """
+        Reconstruit la table en une agrégation groupée. Avec `condition` (un Q
+        sur les champs de regroupement, lorsqu'ils portent le même nom dans la
+        table), seules les lignes correspondantes sont recalculées. Retourne le
+        nombre de lignes écrites.
+        """
+        condition = condition or Q()
+        counts = self.recount(Menage.objects.filter(condition))
+        with transaction.atomic():
+            self.stored().filter(condition).delete()
+            self.model.objects.bulk_create([
+                self.model(count=count, **self.lookup(key))
+                for key, count in counts.items()
+            ], batch_size=2000)
+        return len(counts)
+
+    def diff(self):
+        """Liste des (clé, recompté, stocké) qui diffèrent."""
+        expected = self.recount()
+        stored = self.current()
+        return [
+            (key, expected.get(key, 0), stored.get(key, 0))
+            for key in sorted(set(expected) | set(stored), key=str)
+            if expected.get(key, 0) != stored.get(key, 0)
+        ]
+
+
+def geo_rollup(niveau, field, parent_field=None):
+    """Compteurs `GeoCounter` d'un niveau : (code, parent, statut, tirage) depuis les champs de Menage."""
+    if parent_field is None:
+        return Rollup(
+            GeoCounter, (field, 'statut_menage', 'tirage'), required=(field,),
+            columns=('code', 'statut_menage', 'tirage'), scope={'niveau': niveau, 'parent': None},
+        )
+    return Rollup(
+        GeoCounter, (field, parent_field, 'statut_menage', 'tirage'), required=(field,),
+        columns=('code', 'parent', 'statut_menage', 'tirage'), scope={'niveau': niveau},
+    )
+
+
+STATS_COUNTERS = Rollup(StatsCounter, COUNTER_FIELDS)
+DAILY_COUNTERS = Rollup(DailyCounter, DAILY_FIELDS, required=('date_enquete', 'region_id'))
+GEO_COUNTERS = {
+    GeoCounter.NIVEAU_REGION: geo_rollup(GeoCounter.NIVEAU_REGION, 'region_id'),
+    GeoCounter.NIVEAU_DEPARTEMENT: geo_rollup(GeoCounter.NIVEAU_DEPARTEMENT, 'departement_id', 'region_id'),
+    GeoCounter.NIVEAU_COMMUNE: geo_rollup(GeoCounter.NIVEAU_COMMUNE, 'commune_id', 'departement_id'),
+    GeoCounter.NIVEAU_GRAPPE: geo_rollup(GeoCounter.NIVEAU_GRAPPE, 'grappe_id', 'commune_id'),
+}
+ROLLUPS = (STATS_COUNTERS, DAILY_COUNTERS, *GEO_COUNTERS.values())
+# Champs de Menage à lire pour calculer les clés de tous les compteurs
+ROLLUP_FIELDS = tuple(dict.fromkeys(field for rollup in ROLLUPS for field in rollup.fields))
+
+
+class CounterDeltas:
+    """Deltas accumulés pour toutes les tables de compteurs (ex: un lot d'import), appliqués en une fois."""
+
+    def __init__(self):
+        self.deltas = {rollup: defaultdict(int) for rollup in ROLLUPS}
+
+    def add(self, menage, delta):
+        """Compte `delta` fois le ménage `menage` (instance ou dict de champs)."""
+        for rollup, deltas in self.deltas.items():
+            key = rollup.key(menage)
+            if key is not None:
+                deltas[key] += delta
+
+    def remove_queryset(self, queryset):
+        """Décompte les ménages de `queryset` (avant leur suppression)."""
+        for rollup, deltas in self.deltas.items():
+            for key, count in rollup.recount(queryset).items():
+                deltas[key] -= count
+
+    def apply(self):
+        """Applique les deltas non nuls ; retourne le nombre de compteurs ajustés."""
+        return sum(rollup.apply_deltas(deltas) for rollup, deltas in self.deltas.items())
+
+
+def counter_key(menage):
+    """Clé (region_id, statut_menage, is_rural, tirage) d'un ménage ou d'un dict."""
+    return STATS_COUNTERS.key(menage)
+
+
+def counters_enabled():
+    return not getattr(_state, 'suspended', False)
+
+
+@contextmanager
+def counters_suspended():
+    """
+    Désactive la mise à jour incrémentale (ex: pendant un import en masse,
+    qui ajuste les compteurs lot par lot avec un `CounterDeltas`).
+    """
+    previous = getattr(_state, 'suspended', False)
+    _state.suspended = True
+    try:
+        yield
+    finally:
+        _state.suspended = previous
+
+
+def recount(queryset=None):
+    """Comptage complet des clés `StatsCounter` depuis `Menage` : {clé: count}."""
+    return STATS_COUNTERS.recount(queryset)
+
+
+def current_counters():
+    """Contenu actuel de `StatsCounter` : {clé: count} (compteurs non nuls)."""
+    return STATS_COUNTERS.current()
+
+
+def rebuild_counters():
+    """Reconstruit toutes les tables de compteurs ; retourne le nombre total de lignes."""
+    return sum(rollup.rebuild() for rollup in ROLLUPS)
+
+
+def diff_counters():
+    """
+    Compare toutes les tables de compteurs à un recomptage complet.
+    Retourne la liste des (rollup, clé, attendu, stocké) qui diffèrent.
+    """
+    return [(rollup, *ecart) for rollup in ROLLUPS for ecart in rollup.diff()]
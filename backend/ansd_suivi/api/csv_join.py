@@ -0,0 +1,163 @@
+# api/csv_join.py
+"""
+Outils de lecture en flux des fichiers CSV d'import.
+
+Les fichiers INFO_GEN et INFO_MEN_RECORD sont triés par `idmng` via un tri
+externe (lots triés en mémoire puis écrits sur disque, fusionnés avec
+heapq.merge), puis joints en un seul passage. La mémoire utilisée dépend de
+la taille des lots, pas de la taille des fichiers.
+"""
+import csv
+import heapq
+import os
+import pickle
+from collections import deque
+from itertools import chain, groupby, islice
+from operator import itemgetter
+
+DEFAULT_SORT_CHUNK_SIZE = 100_000
+
+
+def iter_csv_rows(path):
+    """Lignes d'un fichier CSV (dict), lues en flux. Lève ValueError si l'en-tête est absent."""
+    with open(path, 'r', encoding='utf-8-sig', errors='replace') as file:
+        reader = csv.DictReader(file, delimiter=',')
+        if not reader.fieldnames:
+            raise ValueError(f"Aucun en-tête trouvé dans {path}.")
+        yield from reader
+
+
+def _write_run(path, rows):
+    with open(path, 'wb') as f:
+        for row in rows:
+            pickle.dump(row, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def _read_run(path):
+    with open(path, 'rb') as f:
+        while True:
+            try:
+                yield pickle.load(f)
+            except EOFError:
+                return
+
+
+def write_sorted_runs(rows, key, tmpdir, chunk_size=DEFAULT_SORT_CHUNK_SIZE, prefix='run'):
+    """
+    Consomme `rows` par lots de `chunk_size` lignes, trie chaque lot selon `key`
+    et l'écrit sur disque dans `tmpdir`. Retourne la liste des fichiers écrits.
+    """
+    run_paths = []
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= chunk_size:
+            run_paths.append(_spill(chunk, key, tmpdir, prefix, len(run_paths)))
+            chunk = []
+    if chunk:
+        run_paths.append(_spill(chunk, key, tmpdir, prefix, len(run_paths)))
+    return run_paths
+
+
+def merge_runs(run_paths, key):
+    """Fusion paresseuse et stable de fichiers triés (ordre des fichiers conservé à clé égale)."""
+    return heapq.merge(*(_read_run(path) for path in run_paths), key=key)
+
+
+def external_sort(rows, key, tmpdir, chunk_size=DEFAULT_SORT_CHUNK_SIZE, prefix='run'):
+    """
+    Trie `rows` selon `key` avec au plus `chunk_size` lignes en mémoire.
+
+    L'entrée est consommée immédiatement (les lots triés sont écrits dans
+    `tmpdir`) ; la valeur de retour est un itérateur paresseux sur la fusion.
+    Le tri est stable : à clé égale, l'ordre d'origine est conservé.
+    """
+    rows = iter(rows)
+    first_chunk = list(islice(rows, chunk_size))
+    if len(first_chunk) < chunk_size:
+        # Tout tient dans un seul lot : pas besoin de passer par le disque
+        return iter(sorted(first_chunk, key=key))
+    return merge_runs(write_sorted_runs(chain(first_chunk, rows), key, tmpdir, chunk_size, prefix), key)
+
+
+def _spill(chunk, key, tmpdir, prefix, index):
+    chunk.sort(key=key)
+    path = os.path.join(tmpdir, f"{prefix}-{index:05d}.bin")
+    _write_run(path, chunk)
+    return path
+
+
+def read_header(path):
+    """Retourne (noms de colonnes, position en octets du début des données)."""
+    with open(path, 'rb') as f:
+        header_line = f.readline()
+        data_start = f.tell()
+    fieldnames = next(csv.reader([header_line.decode('utf-8-sig', errors='replace')]), None)
+    if not fieldnames:
+        raise ValueError(f"Aucun en-tête trouvé dans {path}.")
+    return fieldnames, data_start
+
+
+def split_byte_ranges(path, parts):
+    """
+    Découpe la partie données d'un CSV en au plus `parts` plages d'octets
+    alignées sur des fins de ligne. Suppose qu'aucun champ ne contient de
+    retour à la ligne (cas des exports CSPro/SurveyCTO utilisés ici).
+    Retourne (noms de colonnes, [(début, fin), ...]).
+    """
+    fieldnames, data_start = read_header(path)
+    size = os.path.getsize(path)
+    step = max(1, (size - data_start) // max(1, parts))
+    bounds = [data_start]
+    with open(path, 'rb') as f:
+        for i in range(1, parts):
+            f.seek(data_start + i * step)
+            f.readline()
+            position = f.tell()
+            if bounds[-1] < position < size:
+                bounds.append(position)
+    bounds.append(size)
+    return fieldnames, [(start, end) for start, end in zip(bounds, bounds[1:]) if start < end]
+
+
+def iter_csv_range(path, fieldnames, start, end):
+    """Lignes (dict) d'une plage d'octets [start, end) d'un CSV, avec les colonnes données."""
+    def lines():
+        with open(path, 'rb') as f:
+            f.seek(start)
+            while f.tell() < end:
+                line = f.readline()
+                if not line:
+                    break
+                yield line.decode('utf-8', errors='replace')
+    yield from csv.DictReader(lines(), fieldnames=fieldnames, delimiter=',')
+
+
+def merge_join(left, right, key=itemgetter('idmng')):
+    """
+    Jointure externe gauche de deux flux triés par `key`.
+
+    Produit (ligne_gauche, ligne_droite ou {}) pour chaque ligne de `left`.
+    Si plusieurs lignes de `right` partagent la même clé, la dernière gagne.
+    """
+    groups = ((group_key, deque(group, maxlen=1)[0]) for group_key, group in groupby(right, key=key))
+    current = next(groups, None)
+    for left_row in left:
+        left_key = key(left_row)
+        while current is not None and current[0] < left_key:
+            current = next(groups, None)
+        if current is not None and current[0] == left_key:
+            yield left_row, current[1]
+        else:
+            yield left_row, {}
+
+
+def iter_missing(reference, candidates):
+    """Valeurs de `reference` absentes de `candidates` (deux flux triés, sans doublon dans reference)."""
+    candidates = iter(candidates)
+    current = next(candidates, None)
+    for value in reference:
+        while current is not None and current < value:
+            current = next(candidates, None)
+        if current != value:
+            yield value
@@ -0,0 +1,170 @@
+# api/export.py
+"""
+Export en flux des ménages (CSV, NDJSON ou MessagePack) pour /api/menages/export/.
+
+Les lignes sont lues par `.values_list().iterator(chunk_size=...)` (curseur
+côté serveur quand la base le permet, aucun objet Menage instancié) et
+écrites par paquets dans une StreamingHttpResponse : la mémoire utilisée ne
+dépend pas du nombre de lignes exportées.
+"""
+import csv
+import json
+from operator import itemgetter
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import StreamingHttpResponse
+from rest_framework import renderers
+
+from .fieldsets import get_requested_fields
+from .models import STATUT_MENAGE_LABELS
+from .renderers import msgpack, msgpack_default, packb
+
+EXPORT_CHUNK_SIZE = 2000
+
+# (nom de colonne, champ ORM)
+EXPORT_COLUMNS = [
+    ('idmng', 'idmng'),
+    ('code_dr', 'region_id'),
+    ('region_nom', 'region__nom_region'),
+    ('superviseur_code', 'superviseur_code'),
+    ('login_enq', 'enqueteur_id'),
+    ('enqueteur_nom', 'enqueteur__nom_enqueteur'),
+    ('hh_trimestre', 'hh_trimestre'),
+    ('cons_code', 'cons_code'),
+    ('num_men_csv', 'num_men_csv'),
+    ('nom_cc', 'nom_cc'),
+    ('nom_cm', 'nom_cm'),
+    ('statut_menage', 'statut_menage'),
+    ('statut_menage_display', None),  # calculé depuis statut_menage
+    ('tirage', 'tirage'),
+    ('adresse', 'adresse'),
+    ('telephone1', 'telephone1'),
+    ('taille_men', 'taille_men'),
+    ('nbr_eligible', 'nbr_eligible'),
+    ('date_enquete', 'date_enquete'),
+    ('heure_debut_enquete', 'heure_debut_enquete'),
+    ('heure_fin_enquete', 'heure_fin_enquete'),
+    ('observations', 'observations'),
+    ('is_rural', 'is_rural'),
+]
+EXPORT_COLUMN_NAMES = [name for name, _ in EXPORT_COLUMNS]
+
+
+def get_export_columns(params):
+    """Colonnes retenues par `?fields=` / `?omit=` (toutes par défaut)."""
+    names = get_requested_fields(params, EXPORT_COLUMN_NAMES, EXPORT_COLUMN_NAMES)
+    if names is None:
+        return EXPORT_COLUMNS
+    return [column for column in EXPORT_COLUMNS if column[0] in names]
+
+
+class ExportRenderer(renderers.BaseRenderer):
+    """
+    Le contenu des exports est produit par la vue (StreamingHttpResponse) ;
+    ces renderers servent à la négociation (`?format=` ou en-tête Accept) et
+    au rendu des erreurs.
+    """
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return json.dumps(data, ensure_ascii=False).encode('utf-8')
+
+
+class CSVExportRenderer(ExportRenderer):
+    media_type = 'text/csv'
+    format = 'csv'
+
+
+class NDJSONExportRenderer(ExportRenderer):
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+
+
+class MessagePackExportRenderer(ExportRenderer):
+    media_type = 'application/msgpack'
+    format = 'msgpack'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return packb(data)
+
+
+# MessagePack seulement si le paquet facultatif est installé
+EXPORT_RENDERER_CLASSES = [CSVExportRenderer, NDJSONExportRenderer] + ([MessagePackExportRenderer] if msgpack else [])
+
+
+class _Echo:
+    """Pseudo-fichier : csv.writer.writerow retourne directement la ligne formatée."""
+    def write(self, value):
+        return value
+
+
+def iter_export_rows(queryset, chunk_size=EXPORT_CHUNK_SIZE, columns=EXPORT_COLUMNS):
+    """Tuples dans l'ordre de `columns`, lus en flux (seules leurs colonnes sont lues)."""
+    # Le libellé du statut est calculé depuis statut_menage, lu une seule fois
+    paths = [field or 'statut_menage' for _, field in columns]
+    fields = list(dict.fromkeys(paths))
+    if fields == paths:
+        pick = tuple
+    elif len(paths) == 1:
+        pick = lambda row: (row[0],)
+    else:
+        pick = itemgetter(*[fields.index(path) for path in paths])
+    names = [name for name, _ in columns]
+    label_index = names.index('statut_menage_display') if 'statut_menage_display' in names else None
+    for row in queryset.values_list(*fields).iterator(chunk_size=chunk_size):
+        row = pick(row)
+        if label_index is not None:
+            row = row[:label_index] + (STATUT_MENAGE_LABELS.get(row[label_index], ''),) + row[label_index + 1:]
+        yield row
+
+
+def _chunked(lines, size, empty=''):
+    buffer = []
+    for line in lines:
+        buffer.append(line)
+        if len(buffer) >= size:
+            yield empty.join(buffer)
+            buffer = []
+    if buffer:
+        yield empty.join(buffer)
+
+
+def iter_csv(queryset, chunk_size=EXPORT_CHUNK_SIZE, columns=EXPORT_COLUMNS):
+    writer = csv.writer(_Echo())
+    yield '\ufeff'  # BOM : ouverture correcte des accents dans Excel
+    yield writer.writerow([name for name, _ in columns])
+    rows = iter_export_rows(queryset, chunk_size, columns)
+    yield from _chunked((writer.writerow(row) for row in rows), chunk_size)
+
+
+def iter_ndjson(queryset, chunk_size=EXPORT_CHUNK_SIZE, columns=EXPORT_COLUMNS):
+    names = [name for name, _ in columns]
+    encoder = DjangoJSONEncoder(ensure_ascii=False)
+    rows = iter_export_rows(queryset, chunk_size, columns)
+    yield from _chunked((encoder.encode(dict(zip(names, row))) + '\n' for row in rows), chunk_size)
+
+
+def iter_msgpack(queryset, chunk_size=EXPORT_CHUNK_SIZE, columns=EXPORT_COLUMNS):
+    """Suite d'objets MessagePack : la liste des noms de colonnes, puis une liste de valeurs par ménage."""
+    packer = msgpack.Packer(default=msgpack_default, use_bin_type=True)
+    yield packer.pack([name for name, _ in columns])
+    rows = iter_export_rows(queryset, chunk_size, columns)
+    yield from _chunked((packer.pack(row) for row in rows), chunk_size, b'')
+
+
+def stream_export(queryset, output='csv', columns=EXPORT_COLUMNS):
+    """StreamingHttpResponse (pièce jointe) pour `queryset` au format `output` (csv, ndjson ou msgpack)."""
+    if output == 'csv':
+        response = StreamingHttpResponse(
+            iter_csv(queryset, columns=columns), content_type='text/csv; charset=utf-8'
+        )
+    elif output == 'msgpack':
+        response = StreamingHttpResponse(iter_msgpack(queryset, columns=columns), content_type='application/msgpack')
+    else:
+        response = StreamingHttpResponse(
+            iter_ndjson(queryset, columns=columns), content_type='application/x-ndjson; charset=utf-8'
+        )
+    response['Content-Disposition'] = f'attachment; filename="menages.{output}"'
+    return response
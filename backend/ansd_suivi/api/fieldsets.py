@@ -0,0 +1,47 @@
+# api/fieldsets.py
+"""
+Sélection des champs renvoyés par les endpoints des ménages.
+
+- `?fields=idmng,statut_menage,nom_cm` : uniquement ces champs ;
+- `?omit=adresse,observations` : la représentation par défaut sans ces champs.
+
+Les vues ne lisent alors en base que les colonnes (et jointures) nécessaires
+aux champs retenus : `.values()` pour la liste et l'export, `.only()` pour le
+détail (voir MenageViewSet).
+"""
+from rest_framework.exceptions import ValidationError
+
+FIELDS_PARAM = 'fields'
+OMIT_PARAM = 'omit'
+
+
+def parse_field_list(value):
+    return [name.strip() for name in value.split(',') if name.strip()]
+
+
+def get_requested_fields(params, available, default):
+    """
+    Champs à renvoyer, dans l'ordre de `available`, d'après `?fields=` (parmi
+    `available`) ou `?omit=` (retirés de `default`) ; None si aucun des deux
+    paramètres n'est fourni. ValidationError si un champ est inconnu.
+    """
+    fields, omit = params.get(FIELDS_PARAM), params.get(OMIT_PARAM)
+    if fields is None and omit is None:
+        return None
+    if fields is not None and omit is not None:
+        raise ValidationError({'detail': f"{FIELDS_PARAM} et {OMIT_PARAM} ne peuvent pas être combinés."})
+
+    param = FIELDS_PARAM if fields is not None else OMIT_PARAM
+    names = set(parse_field_list(fields if fields is not None else omit))
+    inconnus = names - set(available)
+    if inconnus:
+        raise ValidationError({
+            param: f"Champs inconnus: {', '.join(sorted(inconnus))}. Valeurs possibles: {', '.join(available)}."
+        })
+    if fields is not None:
+        selected = [name for name in available if name in names]
+    else:
+        selected = [name for name in available if name in default and name not in names]
+    if not selected:
+        raise ValidationError({param: "Au moins un champ doit être renvoyé."})
+    return selected
@@ -0,0 +1,65 @@
+# api/geo.py
+"""
+Hiérarchie géographique DR → département → commune → grappe.
+
+Les fichiers source ne donnent que le code grappe long (colonne `dr` de
+INFO_MEN_RECORD ou `cp_grappe` de INFO_GEN) ; les niveaux intermédiaires en
+sont des préfixes de longueur fixe, selon la codification ANSD :
+région (2 chiffres) + département (1) + arrondissement (1) + commune (2) + ...
+"""
+from .models import Commune, Departement, GeoCounter, Grappe, Region
+
+REGION_CODE_LENGTH = 2
+DEPARTEMENT_CODE_LENGTH = 3
+COMMUNE_CODE_LENGTH = 6
+
+# Niveau -> (modèle, champ nom, niveau parent, champ FK vers le parent), du plus large au plus fin
+GEO_LEVELS = {
+    GeoCounter.NIVEAU_REGION: (Region, 'nom_region', None, None),
+    GeoCounter.NIVEAU_DEPARTEMENT: (Departement, 'nom_departement', GeoCounter.NIVEAU_REGION, 'region'),
+    GeoCounter.NIVEAU_COMMUNE: (Commune, 'nom_commune', GeoCounter.NIVEAU_DEPARTEMENT, 'departement'),
+    GeoCounter.NIVEAU_GRAPPE: (Grappe, None, GeoCounter.NIVEAU_COMMUNE, 'commune'),
+}
+GEO_LEVEL_NAMES = list(GEO_LEVELS)
+
+
+def child_level(niveau):
+    """Niveau immédiatement inférieur (None pour la grappe) ; niveau None = national."""
+    index = GEO_LEVEL_NAMES.index(niveau) + 1 if niveau else 0
+    return GEO_LEVEL_NAMES[index] if index < len(GEO_LEVEL_NAMES) else None
+
+
+def parse_grappe_code(code_long, region_id):
+    """
+    Codes (departement_id, commune_id, grappe_id) tirés du code grappe long, ou
+    (None, None, None) s'il est absent, non numérique ou d'une autre région.
+    """
+    code = (code_long or '').strip("'\" ")
+    if not code.isdigit() or len(code) <= COMMUNE_CODE_LENGTH or code[:REGION_CODE_LENGTH] != region_id:
+        return None, None, None
+    return code[:DEPARTEMENT_CODE_LENGTH], code[:COMMUNE_CODE_LENGTH], code
+
+
+def ensure_geo_nodes(rows):
+    """
+    Crée les départements, communes et grappes référencés par `rows` (dicts de
+    champs Menage) s'ils n'existent pas encore : trois INSERT par appel.
+    """
+    departements, communes, grappes = {}, {}, {}
+    for row in rows:
+        if row.get('grappe_id'):
+            departements[row['departement_id']] = row['region_id']
+            communes[row['commune_id']] = row['departement_id']
+            grappes[row['grappe_id']] = row['commune_id']
+    Departement.objects.bulk_create(
+        [Departement(code_departement=code, region_id=parent) for code, parent in departements.items()],
+        ignore_conflicts=True,
+    )
+    Commune.objects.bulk_create(
+        [Commune(code_commune=code, departement_id=parent) for code, parent in communes.items()],
+        ignore_conflicts=True,
+    )
+    Grappe.objects.bulk_create(
+        [Grappe(code_grappe=code, commune_id=parent) for code, parent in grappes.items()],
+        ignore_conflicts=True,
+    )
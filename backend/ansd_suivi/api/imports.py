@@ -0,0 +1,265 @@
+# api/imports.py
+"""
+File d'attente des imports CSV, stockée en base (table ImportJob), sans
+courtier externe.
+
+- POST /api/imports/ enregistre les deux fichiers sous IMPORT_UPLOAD_DIR et
+  crée un import "en attente" ;
+- un exécutant les traite un par un, du plus ancien au plus récent : thread
+  du processus web (IMPORT_JOBS_IN_PROCESS=True, défaut) ou processus séparé
+  (`manage.py run_import_jobs`) ;
+- l'import lui-même est la commande `import_data`, qui publie son avancement
+  (étape, ménages lus / écrits, débit, erreurs) sur la ligne ImportJob.
+
+Verrou : passer un import "en cours" viole la contrainte unique
+`un_seul_import_en_cours` si un autre l'est déjà, quel que soit le processus
+(y compris `manage.py import_data` lancé à la main). Un import dont
+l'avancement n'a pas bougé depuis IMPORT_JOBS_STALE_TIMEOUT secondes est
+marqué en échec pour libérer le verrou, sauf si son processus (machine et
+PID enregistrés au démarrage) tourne encore sur cette machine. Les étapes
+longues sans ligne écrite (tri, suppression des absents) signalent leur
+activité à intervalles réguliers.
+"""
+import logging
+import os
+import shutil
+import socket
+import threading
+import time
+import uuid
+from datetime import timedelta
+from io import StringIO
+
+from django.conf import settings
+from django.core.management import call_command
+from django.db import IntegrityError, connection, transaction
+from django.utils import timezone
+
+from .models import ImportJob
+
+logger = logging.getLogger(__name__)
+
+# Intervalle minimal (s) entre deux écritures de l'avancement en base
+PROGRESS_INTERVAL = 1.0
+MAX_ERREURS = 50
+
+_worker_lock = threading.Lock()
+_worker_thread = None
+
+
+class ImportAlreadyRunning(Exception):
+    """Un autre import est déjà en cours."""
+
+
+def get_upload_dir():
+    return getattr(settings, 'IMPORT_UPLOAD_DIR', os.path.join(settings.BASE_DIR, 'imports'))
+
+
+def get_stale_timeout():
+    return getattr(settings, 'IMPORT_JOBS_STALE_TIMEOUT', 3600)
+
+
+def get_poll_interval():
+    return getattr(settings, 'IMPORT_JOBS_POLL_INTERVAL', 5.0)
+
+
+def save_upload(directory, name, uploaded):
+    """Copie un fichier envoyé (en mémoire ou temporaire) sous `directory` ; retourne son chemin."""
+    path = os.path.join(directory, name)
+    with open(path, 'wb') as f:
+        for chunk in uploaded.chunks():
+            f.write(chunk)
+    return path
+
+
+def create_job(info_gen, info_men_record, incremental=False, delete_missing=False, user=None):
+    """Enregistre les fichiers envoyés et crée l'import en attente ; l'exécutant démarre après le commit."""
+    directory = os.path.join(get_upload_dir(), uuid.uuid4().hex)
+    os.makedirs(directory)
+    job = ImportJob.objects.create(
+        info_gen_path=save_upload(directory, 'INFO_GEN.CSV', info_gen),
+        info_men_record_path=save_upload(directory, 'INFO_MEN_RECORD.CSV', info_men_record),
+        incremental=incremental, delete_missing=delete_missing and incremental,
+        cree_par=user if user is not None and user.is_authenticated else None,
+    )
+    if getattr(settings, 'IMPORT_JOBS_IN_PROCESS', True):
+        transaction.on_commit(start_worker)
+    return job
+
+
+def process_alive(hote, pid):
+    """
+    Vrai si `pid` est un processus vivant de cette machine. Un processus d'une
+    autre machine ne peut pas être vérifié : seul le délai d'inactivité compte.
+    """
+    if not pid or hote != socket.gethostname() or os.name != 'posix':
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        # Processus existant, appartenant à un autre utilisateur
+        return True
+    return True
+
+
+def recover_stale_jobs():
+    """Marque en échec les imports "en cours" sans avancement récent dont le processus a disparu."""
+    limite = timezone.now() - timedelta(seconds=get_stale_timeout())
+    stale = ImportJob.objects.filter(statut=ImportJob.STATUT_EN_COURS, mis_a_jour__lt=limite)
+    morts = [pk for pk, hote, pid in stale.values_list('pk', 'hote', 'pid') if not process_alive(hote, pid)]
+    if not morts:
+        return 0
+    return stale.filter(pk__in=morts).update(
+        statut=ImportJob.STATUT_ECHEC, fin=timezone.now(), phase='interrompu',
+    )
+
+
+def start_job(job):
+    """
+    Passe `job` en cours : prend le verrou d'import ou lève ImportAlreadyRunning.
+    Retourne False si l'import n'était plus en attente (pris par un autre exécutant).
+    """
+    recover_stale_jobs()
+    now = timezone.now()
+    hote, pid = socket.gethostname(), os.getpid()
+    try:
+        with transaction.atomic():
+            updated = ImportJob.objects.filter(pk=job.pk, statut=ImportJob.STATUT_EN_ATTENTE).update(
+                statut=ImportJob.STATUT_EN_COURS, debut=now, mis_a_jour=now, hote=hote, pid=pid,
+            )
+    except IntegrityError:
+        en_cours = ImportJob.objects.filter(statut=ImportJob.STATUT_EN_COURS).values_list('pk', flat=True).first()
+        raise ImportAlreadyRunning(f"Un import est déjà en cours (import #{en_cours}).")
+    if updated:
+        job.statut, job.debut, job.mis_a_jour = ImportJob.STATUT_EN_COURS, now, now
+        job.hote, job.pid = hote, pid
+    return bool(updated)
+
+
+class ImportProgress:
+    """
+    Avancement d'un import en cours, écrit sur sa ligne ImportJob (au plus
+    toutes les PROGRESS_INTERVAL secondes, hors changement d'étape et erreurs).
+    """
+
+    def __init__(self, job):
+        self.job = job
+        self._saved_at = 0.0
+
+    def phase(self, name):
+        self.job.phase = name
+        self.save()
+
+    def update(self, lignes_lues, lignes_ecrites, lignes_par_seconde):
+        job = self.job
+        job.lignes_lues, job.lignes_ecrites = lignes_lues, lignes_ecrites
+        job.lignes_par_seconde = round(lignes_par_seconde, 1)
+        if time.monotonic() - self._saved_at >= PROGRESS_INTERVAL:
+            self.save()
+
+    def heartbeat(self):
+        """Signale que l'import avance (mis_a_jour), au plus toutes les PROGRESS_INTERVAL secondes."""
+        if time.monotonic() - self._saved_at >= PROGRESS_INTERVAL:
+            self.save()
+
+    def beating(self, iterable):
+        """Parcourt `iterable` en signalant l'activité de l'import au fil des éléments."""
+        for item in iterable:
+            self.heartbeat()
+            yield item
+
+    def error(self, message):
+        if len(self.job.erreurs) < MAX_ERREURS:
+            self.job.erreurs.append(message)
+        self.save()
+
+    def save(self, **fields):
+        job = self.job
+        job.mis_a_jour = timezone.now()
+        ImportJob.objects.filter(pk=job.pk).update(
+            phase=job.phase, lignes_lues=job.lignes_lues, lignes_ecrites=job.lignes_ecrites,
+            lignes_par_seconde=job.lignes_par_seconde, erreurs=job.erreurs, mis_a_jour=job.mis_a_jour, **fields,
+        )
+        self._saved_at = time.monotonic()
+
+    def finish(self, resultat):
+        """Fin de l'import (libère le verrou) : terminé, ou en échec si des erreurs ont été signalées."""
+        job = self.job
+        job.statut = ImportJob.STATUT_ECHEC if job.erreurs else ImportJob.STATUT_TERMINE
+        if job.statut == ImportJob.STATUT_TERMINE:
+            job.phase = ''
+        job.resultat, job.fin = resultat, timezone.now()
+        self.save(statut=job.statut, resultat=job.resultat, fin=job.fin)
+
+
+def run_job(job):
+    """Exécute un import en attente (verrou pris ici) ; ImportAlreadyRunning si un autre est en cours."""
+    from .management.commands.import_data import Command as ImportCommand
+
+    if not start_job(job):
+        return job
+    command = ImportCommand(stdout=StringIO(), stderr=StringIO())
+    command.job = job
+    try:
+        call_command(
+            command, info_gen=job.info_gen_path, info_men_record=job.info_men_record_path,
+            incremental=job.incremental, delete_missing=job.delete_missing,
+        )
+    except Exception:
+        # Déjà enregistré sur le job par la commande ; l'exécutant continue
+        logger.exception("Import #%s en échec", job.pk)
+    job.refresh_from_db()
+    if job.statut == ImportJob.STATUT_TERMINE and job.source == ImportJob.SOURCE_API:
+        shutil.rmtree(os.path.dirname(job.info_gen_path), ignore_errors=True)
+    return job
+
+
+def run_next_job():
+    """Exécute le plus ancien import en attente ; None s'il n'y en a pas."""
+    job = ImportJob.objects.filter(statut=ImportJob.STATUT_EN_ATTENTE).order_by('cree_le', 'pk').first()
+    if job is None:
+        return None
+    return run_job(job)
+
+
+def run_pending_jobs(stop=None):
+    """
+    Traite les imports en attente jusqu'à épuisement de la file (ou `stop`
+    positionné) ; si un autre processus tient le verrou, attend qu'il le libère.
+    """
+    while stop is None or not stop.is_set():
+        try:
+            if run_next_job() is None:
+                return
+        except ImportAlreadyRunning:
+            time.sleep(get_poll_interval())
+
+
+def _worker_main():
+    global _worker_thread
+    try:
+        while True:
+            run_pending_jobs()
+            with _worker_lock:
+                # Un import créé pendant la dernière exécution est repris ici
+                if not ImportJob.objects.filter(statut=ImportJob.STATUT_EN_ATTENTE).exists():
+                    _worker_thread = None
+                    return
+    except Exception:
+        logger.exception("Exécutant des imports arrêté")
+        with _worker_lock:
+            _worker_thread = None
+    finally:
+        connection.close()
+
+
+def start_worker():
+    """Démarre le thread exécutant de ce processus, s'il ne tourne pas déjà."""
+    global _worker_thread
+    with _worker_lock:
+        if _worker_thread is not None and _worker_thread.is_alive():
+            return
+        _worker_thread = threading.Thread(target=_worker_main, name='import-jobs', daemon=True)
+        _worker_thread.start()
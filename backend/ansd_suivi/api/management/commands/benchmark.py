@@ -0,0 +1,154 @@
+# api/management/commands/benchmark.py
+"""
+Benchmark reproductible de l'API : génère des données synthétiques, les
+importe dans une base de test jetable puis mesure les principaux endpoints.
+
+Exemple :
+    python manage.py benchmark --menages 100k --output bench-100k.json
+
+Le résultat (JSON) contient, pour l'import et chaque endpoint, les
+percentiles de latence, le nombre de requêtes SQL et le pic mémoire, la
+taille et le temps d'encodage des réponses par format (`payloads` : JSON,
+JSON en colonnes, MessagePack ; brutes et compressées), le débit de
+lecture de plusieurs threads seuls et pendant un import (`concurrency`), puis
+un test de charge WSGI contre ASGI (`server_modes` : requêtes/s et p99 avec
+--load-clients clients simultanés, base locale ou distante simulée avec
+--load-db-latency).
+La base configurée n'est jamais modifiée : tout se passe dans la base de test
+(nommée comme pour `manage.py test` ; avec SQLite, un fichier temporaire afin
+que les threads partagent la base avec les mêmes verrous qu'en production).
+"""
+import io
+import json
+import os
+import platform
+import resource
+import subprocess
+import tempfile
+import time
+
+import django
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import (
+    setup_databases, setup_test_environment, teardown_databases, teardown_test_environment,
+)
+
+from api.benchmark import (
+    benchmark_concurrent_reads, benchmark_endpoints, benchmark_list_serialization, benchmark_payloads,
+    benchmark_server_modes, peak_memory,
+)
+from api.management.commands.generate_data import parse_taille
+from api.models import Menage
+
+
+def get_git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=settings.BASE_DIR,
+            capture_output=True, text=True, timeout=5,
+        ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = "Mesure l'import et les endpoints de l'API sur des données synthétiques (résultat JSON)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--menages', default='10k', help="Taille du jeu de données: 10k, 100k, 1m, 10m ou un entier (défaut: 10k).")
+        parser.add_argument('--csv-dir', help="Utilise les INFO_GEN.CSV / INFO_MEN_RECORD.CSV de ce dossier au lieu de générer des données.")
+        parser.add_argument('--repeat', type=int, default=20, help="Nombre d'appels mesurés par endpoint (défaut: 20).")
+        parser.add_argument('--workers', type=int, default=1, help="Option --workers transmise à import_data.")
+        parser.add_argument('--no-memory', action='store_true', help="Ne mesure pas le pic mémoire (évite les exécutions sous tracemalloc).")
+        parser.add_argument('--readers', type=int, default=4, help="Threads de lecture du test de concurrence (0 pour l'ignorer, défaut: 4).")
+        parser.add_argument('--read-duration', type=float, default=5.0, help="Durée (s) des lectures sans import du test de concurrence (défaut: 5).")
+        parser.add_argument('--load-clients', type=int, default=500, help="Clients simultanés du test de charge WSGI / ASGI (0 pour l'ignorer, défaut: 500).")
+        parser.add_argument('--load-duration', type=float, default=10.0, help="Durée (s) du test de charge par URL et par mode (défaut: 10).")
+        parser.add_argument('--wsgi-threads', type=int, default=32, help="Threads du serveur WSGI simulé (défaut: 32).")
+        parser.add_argument('--load-db-latency', type=float, default=0, help="Attente (ms) ajoutée à chaque requête SQL du test de charge, pour simuler une base distante (défaut: 0).")
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--output', help="Fichier JSON de sortie (défaut: sortie standard).")
+
+    def handle(self, *args, **options):
+        if options['repeat'] < 1:
+            raise CommandError("--repeat doit être >= 1.")
+        memory = not options['no_memory']
+
+        with tempfile.TemporaryDirectory(prefix='benchmark-') as tmpdir:
+            if connection.vendor == 'sqlite':
+                connection.settings_dict['TEST']['NAME'] = os.path.join(tmpdir, 'benchmark.sqlite3')
+            setup_test_environment()
+            old_config = setup_databases(verbosity=0, interactive=False)
+            try:
+                csv_dir = options['csv_dir']
+                generation = None
+                if not csv_dir:
+                    csv_dir = tmpdir
+                    start = time.perf_counter()
+                    call_command(
+                        'generate_data', menages=str(parse_taille(options['menages'])),
+                        output_dir=csv_dir, seed=options['seed'], stdout=io.StringIO(),
+                    )
+                    generation = round(time.perf_counter() - start, 3)
+                results = {
+                    'commit': get_git_commit(),
+                    'python': platform.python_version(),
+                    'django': django.get_version(),
+                    'database': connection.vendor,
+                    'generation_s': generation,
+                    'import': self.benchmark_import(csv_dir, options['workers'], memory),
+                    'endpoints': benchmark_endpoints(repeat=options['repeat'], memory=memory),
+                    'list_serialization': benchmark_list_serialization(repeat=options['repeat']),
+                    'payloads': benchmark_payloads(repeat=options['repeat']),
+                }
+                if options['readers'] > 0:
+                    results['concurrency'] = {
+                        'reads_only': benchmark_concurrent_reads(readers=options['readers'], duration=options['read_duration']),
+                        'reads_during_import': benchmark_concurrent_reads(
+                            writer=lambda: self.run_import(csv_dir, options['workers']), readers=options['readers'],
+                        ),
+                    }
+                if options['load_clients'] > 0:
+                    results['server_modes'] = benchmark_server_modes(
+                        clients=options['load_clients'], duration=options['load_duration'],
+                        wsgi_threads=options['wsgi_threads'], db_latency_ms=options['load_db_latency'],
+                    )
+                results['max_rss_kb'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            finally:
+                teardown_databases(old_config, verbosity=0)
+                teardown_test_environment()
+
+        output = json.dumps(results, indent=2, ensure_ascii=False)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as f:
+                f.write(output + '\n')
+            self.stdout.write(self.style.SUCCESS(f"Résultats écrits dans {options['output']}"))
+        else:
+            self.stdout.write(output)
+
+    def run_import(self, csv_dir, workers):
+        call_command(
+            'import_data', info_gen=f"{csv_dir}/INFO_GEN.CSV",
+            info_men_record=f"{csv_dir}/INFO_MEN_RECORD.CSV", workers=workers, stdout=io.StringIO(),
+        )
+
+    def benchmark_import(self, csv_dir, workers, memory):
+        """Import complet chronométré, puis (si demandé) un second sous tracemalloc pour le pic mémoire."""
+        def run_import():
+            self.run_import(csv_dir, workers)
+
+        start = time.perf_counter()
+        run_import()
+        duration = time.perf_counter() - start
+        menages = Menage.objects.count()
+        result = {
+            'menages': menages,
+            'duration_s': round(duration, 3),
+            'menages_per_s': round(menages / duration, 1) if duration else None,
+        }
+        if memory:
+            _, result['peak_memory_kb'] = peak_memory(run_import)
+        return result
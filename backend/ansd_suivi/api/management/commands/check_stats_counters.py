@@ -0,0 +1,29 @@
+# api/management/commands/check_stats_counters.py
+from django.core.management.base import BaseCommand, CommandError
+
+from api.counters import diff_counters, rebuild_counters
+
+
+class Command(BaseCommand):
+    help = 'Vérifie que les compteurs (StatsCounter, DailyCounter, GeoCounter) correspondent à un recomptage complet des ménages.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fix', action='store_true', help='Reconstruit les compteurs en cas d\'écart.')
+
+    def handle(self, *args, **options):
+        ecarts = diff_counters()
+        if not ecarts:
+            self.stdout.write(self.style.SUCCESS('Compteurs cohérents avec la table des ménages.'))
+            return
+
+        for rollup, key, attendu, stocke in ecarts:
+            description = ' / '.join(f"{field}={value}" for field, value in zip(rollup.fields, key))
+            self.stdout.write(self.style.WARNING(
+                f"  {rollup} {description}: recompté={attendu}, stocké={stocke}"
+            ))
+
+        if options['fix']:
+            nb = rebuild_counters()
+            self.stdout.write(self.style.SUCCESS(f'Compteurs reconstruits ({nb} lignes).'))
+            return
+        raise CommandError(f'{len(ecarts)} compteur(s) incohérent(s). Relancez avec --fix pour reconstruire.')
@@ -0,0 +1,204 @@
+# api/management/commands/generate_data.py
+"""
+Génère des fichiers INFO_GEN.CSV / INFO_MEN_RECORD.CSV synthétiques (ou insère
+directement les ménages en base) pour les tests de charge et les benchmarks.
+
+Les fichiers ont les mêmes colonnes que les exports réels et sont écrits en
+flux : la mémoire utilisée ne dépend pas du nombre de ménages.
+"""
+import csv
+import datetime
+import os
+import random
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from api.management.commands.import_data import REGIONS_MAPPING, build_menage_fields
+from api.geo import ensure_geo_nodes
+from api.models import Region, Superviseur, Enqueteur, Menage, Departement
+from api.counters import counters_suspended, rebuild_counters
+from api.cache import bump_data_version, invalidation_suspended
+from api.search import indexing_suspended, rebuild_search_index
+from api.stream import notify_stats_changed
+
+TAILLES = {'10k': 10_000, '100k': 100_000, '1m': 1_000_000, '10m': 10_000_000}
+
+# Répartitions par défaut (libellés tels qu'ils apparaissent dans INFO_MEN_RECORD)
+DEFAULT_STATUTS = "COMPLET=0.45,PARTIEL=0.08,Affecté=0.25,Non affecté=0.1,REFUS=0.05,N'existe plus=0.03,Déménagé=0.04"
+DEFAULT_TIRAGES = "Tiré=0.7,Remplaçant=0.1,Copté=0.2"
+
+INFO_GEN_COLUMNS = [
+    'idmng', 'cp_trimestre', 'cp_superviseur', 'cp_grappe', 'cp_cons', 'cp_men', 'taille_men',
+    'nbr_eligible', 'consentement', 'date_enq_timestamp', 'date_enq_human', 'heur_debut', 'heur_fin',
+    'nom_de_l_enqueteur', 'login_enq',
+]
+INFO_MEN_RECORD_COLUMNS = [
+    'idmng', 'hh_trimestre', 'superviseur', 'dr', 'cons', 'num_men', 'statut', 'tirage',
+    'ech_adresse', 'nb_eligible', 'completude_menage',
+]
+STATUTS_COLLECTES = {'COMPLET', 'PARTIEL'}
+PRENOMS = ['AWA', 'MODOU', 'FATOU', 'MAMADOU', 'AISSATOU', 'IBRAHIMA', 'NDÈYE', 'OUSMANE', 'MARIÈME', 'CHEIKH']
+NOMS = ['NDIAYE', 'DIOP', 'FALL', 'SARR', 'GAYE', 'DIALLO', 'BA', 'SECK', 'FAYE', 'CISSÉ']
+
+
+def parse_distribution(value):
+    """"A=0.5,B=0.5" -> ([A, B], [0.5, 0.5])."""
+    labels, weights = [], []
+    for part in value.split(','):
+        label, _, weight = part.rpartition('=')
+        if not label:
+            raise CommandError(f"Répartition invalide: {part!r} (format attendu: libellé=poids)")
+        labels.append(label.strip())
+        weights.append(float(weight))
+    if sum(weights) <= 0:
+        raise CommandError(f"Répartition invalide: {value!r}")
+    return labels, weights
+
+
+def parse_taille(value):
+    value = value.lower()
+    if value in TAILLES:
+        return TAILLES[value]
+    try:
+        return int(value.replace('_', ''))
+    except ValueError:
+        raise CommandError(f"Taille invalide: {value!r} (ex: 10k, 100k, 1m, 10m ou un entier)")
+
+
+def iter_synthetic_rows(nb_menages, statuts, tirages, seed=42, enqueteurs_par_dr=50, menages_par_grappe=12):
+    """
+    Génère (ligne INFO_GEN, ligne INFO_MEN_RECORD) pour `nb_menages` ménages
+    répartis uniformément sur les 14 DR. Les codes grappe suivent la
+    codification DR (2) + département (1) + arrondissement (1) + commune (2)
+    + numéro (6), avec 3 départements, 2 arrondissements et 12 communes par DR.
+    """
+    rng = random.Random(seed)
+    codes_dr = list(REGIONS_MAPPING)
+    statut_labels, statut_weights = statuts
+    tirage_labels, tirage_weights = tirages
+    debut_collecte = datetime.date(2025, 3, 1)
+
+    for n in range(nb_menages):
+        dr = codes_dr[n % len(codes_dr)]
+        g = n // (menages_par_grappe * len(codes_dr))
+        grappe = f"{dr}{1 + g % 3}{1 + (g // 3) % 2}{1 + (g // 6) % 12:02d}{g:06d}"
+        cons = f"{rng.randrange(1, 200):05d}"
+        idmng = f"{grappe}{cons}{n % 100:02d}"
+        num_enq = rng.randrange(enqueteurs_par_dr)
+        superviseur = f"SP{dr}{num_enq // 10:02d}"
+        login = f"{dr}{num_enq:04d}"
+        statut = rng.choices(statut_labels, statut_weights)[0]
+        tirage = rng.choices(tirage_labels, tirage_weights)[0]
+
+        date_enq = heure_debut = heure_fin = ''
+        if statut in STATUTS_COLLECTES:
+            date_enq = (debut_collecte + datetime.timedelta(days=rng.randrange(60))).isoformat()
+            debut = datetime.datetime(2025, 1, 1, rng.randrange(8, 17), rng.randrange(60))
+            heure_debut = debut.strftime('%H:%M:%S')
+            heure_fin = (debut + datetime.timedelta(minutes=rng.randrange(20, 120))).strftime('%H:%M:%S')
+
+        taille = rng.randrange(1, 15)
+        row_gen = {
+            'idmng': idmng, 'cp_trimestre': '2025T1', 'cp_superviseur': superviseur, 'cp_grappe': grappe,
+            'cp_cons': cons, 'cp_men': f"{n % 100:02d}", 'taille_men': taille, 'nbr_eligible': rng.randrange(0, taille + 1),
+            'consentement': "L'enquêté accepte d'être interviewé", 'date_enq_timestamp': '', 'date_enq_human': date_enq,
+            'heur_debut': heure_debut, 'heur_fin': heure_fin,
+            'nom_de_l_enqueteur': f"ENQUETEUR {login}", 'login_enq': login,
+        }
+        row_men = {
+            'idmng': idmng, 'hh_trimestre': '2025T1', 'superviseur': superviseur, 'dr': grappe, 'cons': cons,
+            'num_men': f"{n % 100:02d}", 'statut': statut, 'tirage': tirage,
+            'ech_adresse': f"{rng.choice(PRENOMS)} {rng.choice(NOMS)}, QUARTIER {rng.randrange(1, 40)}",
+            'nb_eligible': '', 'completude_menage': '',
+        }
+        yield row_gen, row_men
+
+
+class Command(BaseCommand):
+    help = 'Génère des données synthétiques (fichiers CSV ou insertion directe) pour les tests de charge.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--menages', default='10k', help="Nombre de ménages: 10k, 100k, 1m, 10m ou un entier (défaut: 10k).")
+        parser.add_argument('--output-dir', default='.', help="Dossier de sortie des CSV (défaut: dossier courant).")
+        parser.add_argument('--database', action='store_true', help="Insère directement les ménages en base au lieu d'écrire les CSV (remplace les données existantes).")
+        parser.add_argument('--statuts', default=DEFAULT_STATUTS, help="Répartition des statuts, ex: \"COMPLET=0.5,REFUS=0.5\".")
+        parser.add_argument('--tirages', default=DEFAULT_TIRAGES, help="Répartition des tirages, ex: \"Tiré=0.8,Copté=0.2\".")
+        parser.add_argument('--enqueteurs-par-dr', type=int, default=50)
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        nb_menages = parse_taille(options['menages'])
+        rows = iter_synthetic_rows(
+            nb_menages, parse_distribution(options['statuts']), parse_distribution(options['tirages']),
+            seed=options['seed'], enqueteurs_par_dr=max(1, options['enqueteurs_par_dr']),
+        )
+        start = time.monotonic()
+        if options['database']:
+            with counters_suspended(), invalidation_suspended(), indexing_suspended():
+                self.write_database(rows, max(1, options['batch_size']))
+            rebuild_counters()
+            rebuild_search_index()
+            bump_data_version()
+            notify_stats_changed()
+        else:
+            self.write_csv(rows, options['output_dir'])
+        self.stdout.write(self.style.SUCCESS(f"{nb_menages} ménages générés en {time.monotonic() - start:.1f}s."))
+
+    def write_csv(self, rows, output_dir):
+        os.makedirs(output_dir, exist_ok=True)
+        path_gen = os.path.join(output_dir, 'INFO_GEN.CSV')
+        path_men = os.path.join(output_dir, 'INFO_MEN_RECORD.CSV')
+        with open(path_gen, 'w', newline='', encoding='utf-8') as f_gen, \
+                open(path_men, 'w', newline='', encoding='utf-8') as f_men:
+            writer_gen = csv.DictWriter(f_gen, fieldnames=INFO_GEN_COLUMNS)
+            writer_men = csv.DictWriter(f_men, fieldnames=INFO_MEN_RECORD_COLUMNS)
+            writer_gen.writeheader()
+            writer_men.writeheader()
+            for row_gen, row_men in rows:
+                writer_gen.writerow(row_gen)
+                writer_men.writerow(row_men)
+        self.stdout.write(f"Fichiers écrits: {path_gen}, {path_men}")
+
+    def write_database(self, rows, batch_size):
+        """
+        Insertion directe, sans passer par les CSV (mêmes règles de normalisation
+        que import_data). Compteurs et cache sont mis à jour une fois, par l'appelant.
+        """
+        with transaction.atomic():
+            Menage.objects.all().delete()
+            Departement.objects.all().delete()
+            Enqueteur.objects.all().delete()
+            Superviseur.objects.all().delete()
+            Region.objects.all().delete()
+            Region.objects.bulk_create([Region(code_dr=code, nom_region=nom) for code, nom in REGIONS_MAPPING.items()])
+
+        superviseurs, enqueteurs, batch = set(), {}, []
+
+        def flush():
+            with transaction.atomic():
+                Superviseur.objects.bulk_create(
+                    [Superviseur(id_superviseur=s) for s in superviseurs], ignore_conflicts=True
+                )
+                Enqueteur.objects.bulk_create(
+                    [Enqueteur(login_enq=login, nom_enqueteur=nom, superviseur_id=sup) for login, (nom, sup) in enqueteurs.items()],
+                    ignore_conflicts=True,
+                )
+                ensure_geo_nodes(batch)
+                Menage.objects.bulk_create([Menage(**fields) for fields in batch], batch_size=batch_size)
+
+        for row_gen, row_men in rows:
+            superviseurs.add(row_gen['cp_superviseur'])
+            enqueteurs.setdefault(row_gen['login_enq'], (row_gen['nom_de_l_enqueteur'], row_gen['cp_superviseur']))
+            data_men_rec = {
+                'dr_code_long': row_men['dr'], 'statut_textuel_men_record': row_men['statut'],
+                'tirage_men_record': row_men['tirage'], 'ech_adresse': row_men['ech_adresse'],
+            }
+            fields = build_menage_fields({k: str(v) for k, v in row_gen.items()}, data_men_rec, enqueteurs)
+            batch.append(fields)
+            if len(batch) >= batch_size:
+                flush()
+                batch = []
+        flush()
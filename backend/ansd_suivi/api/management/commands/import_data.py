@@ -1,9 +1,27 @@
 # api/management/commands/import_data.py
-import csv
-from django.core.management.base import BaseCommand
-from api.models import Region, Superviseur, Enqueteur, Menage
+import hashlib
+import json
+import multiprocessing
+import os
+import tempfile
+import time
+from contextlib import contextmanager
+from itertools import chain, islice
+from operator import itemgetter
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from api.models import Region, Superviseur, Enqueteur, Menage, Departement, Commune, Grappe, DailyCounter, ImportJob
+from api.geo import ensure_geo_nodes, parse_grappe_code
+from api.csv_join import (
+    DEFAULT_SORT_CHUNK_SIZE, external_sort, iter_csv_range, iter_csv_rows, iter_missing,
+    merge_join, merge_runs, split_byte_ranges, write_sorted_runs,
+)
+from api.cache import bump_data_version, invalidation_suspended
+from api.counters import CounterDeltas, counters_suspended, ROLLUP_FIELDS
+from api.search import index_menages, indexing_suspended, remove_from_index
+from api.imports import PROGRESS_INTERVAL, ImportAlreadyRunning, ImportProgress, start_job
+from api.stream import notify_stats_changed
 from django.utils.dateparse import parse_date, parse_time
-import traceback
 
 REGIONS_MAPPING = {
     "01": "DAKAR", "02": "ZIGUINCHOR", "03": "DIOURBEL", "04": "SAINT-LOUIS",
@@ -11,6 +29,17 @@ REGIONS_MAPPING = {
     "09": "FATICK", "10": "KOLDA", "11": "MATAM", "12": "KAFFRINE",
     "13": "KEDOUGOU", "14": "SEDHIOU",
 }
+REGIONS_URBAINES = {"DAKAR", "THIES"}
+
+DEFAULT_BATCH_SIZE = 2000
+
+# Champs mis à jour lors d'un upsert (tout sauf la clé primaire)
+MENAGE_UPDATE_FIELDS = [
+    'region', 'departement', 'commune', 'grappe', 'superviseur_code', 'enqueteur', 'hh_trimestre', 'cons_code', 'num_men_csv',
+    'nom_cc', 'nom_cm', 'statut_menage', 'tirage', 'adresse', 'telephone1', 'taille_men',
+    'nbr_eligible', 'date_enquete', 'heure_debut_enquete', 'heure_fin_enquete',
+    'observations', 'is_rural', 'source_hash',
+]
 
 def get_menage_statut_code(statut_textuel_csv):
     if not statut_textuel_csv: return Menage.STATUT_AFFECTE
@@ -23,194 +52,502 @@ def get_menage_statut_code(statut_textuel_csv):
     elif statut_textuel_csv == "NON AFFECTÉ" or statut_textuel_csv == "NON AFFECTE": return Menage.STATUT_NON_AFFECTE
     return Menage.STATUT_AFFECTE
 
+def get_dr_code(dr_code_long_men_rec, dr_code_gen_grappe):
+    """Code DR sur 2 chiffres à partir du code DR long (INFO_MEN_RECORD) ou du code grappe (INFO_GEN)."""
+    dr_code_final_brut = None
+    if dr_code_long_men_rec and len(dr_code_long_men_rec) >= 2:
+        dr_code_final_brut = dr_code_long_men_rec[:2]
+    elif dr_code_gen_grappe and len(dr_code_gen_grappe) >= 2:
+        dr_code_final_brut = dr_code_gen_grappe[:2]
+    if not dr_code_final_brut:
+        return None
+    cleaned_code = dr_code_final_brut.strip("'\" ")
+    if len(cleaned_code) == 1 and cleaned_code.isdigit():
+        return f"0{cleaned_code}"
+    elif len(cleaned_code) == 2 and cleaned_code.isdigit():
+        return cleaned_code
+    return None
+
+def get_tirage(valeur_tirage_csv):
+    # CORRECTION POUR TIRÉ ET REMPLAÇANT
+    valeur_tirage_csv = (valeur_tirage_csv or '').strip().lower()
+    if 'remplaçant' in valeur_tirage_csv or 'tiré' in valeur_tirage_csv:
+        return 1
+    return 0
+
+def compute_source_hash(fields):
+    """Empreinte SHA-1 stable des champs normalisés d'un ménage."""
+    payload = json.dumps(fields, sort_keys=True, default=str, ensure_ascii=False)
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+def build_menage_fields(row_gen, data_men_rec, enqueteurs_logins):
+    """
+    Normalise une ligne INFO_GEN (jointe à sa ligne INFO_MEN_RECORD) en un dict
+    de champs `Menage` prêt à insérer. Retourne None si la ligne est rejetée.
+    Les clés étrangères sont données par identifiant (region_id, enqueteur_id).
+    """
+    idmng = row_gen.get('idmng', '').strip()
+    if not idmng:
+        return None
+
+    code_long = data_men_rec.get('dr_code_long', '').strip()
+    code_grappe = row_gen.get('cp_grappe', '').strip()
+    dr_code_final = get_dr_code(code_long, code_grappe)
+    nom_region = REGIONS_MAPPING.get(dr_code_final)
+    if not nom_region:
+        return None
+    departement_id, commune_id, grappe_id = parse_grappe_code(code_long or code_grappe, dr_code_final)
+
+    login_enq_gen = row_gen.get('login_enq', '').strip()
+    owner_id_men_rec = data_men_rec.get('owner_id_men_record', '')
+    if login_enq_gen in enqueteurs_logins:
+        enqueteur_id = login_enq_gen
+    elif owner_id_men_rec in enqueteurs_logins:
+        enqueteur_id = owner_id_men_rec
+    else:
+        enqueteur_id = None
+
+    superviseur_code_final = row_gen.get('cp_superviseur', '').strip()
+    if not superviseur_code_final: superviseur_code_final = data_men_rec.get('superviseur_code_men_rec', '')
+
+    heure_debut_str_brute = (row_gen.get('heur_debut', '') or row_gen.get('heur_debistatut', '')).strip()
+    heure_fin_str_brute = row_gen.get('heur_fin', '').strip()
+
+    fields = {
+        'idmng': idmng,
+        'region_id': dr_code_final, 'superviseur_code': superviseur_code_final, 'enqueteur_id': enqueteur_id,
+        'departement_id': departement_id, 'commune_id': commune_id, 'grappe_id': grappe_id,
+        'hh_trimestre': (row_gen.get('cp_trimestre', '') or data_men_rec.get('hh_trimestre', '')).strip(),
+        'cons_code': (row_gen.get('cp_cons', '') or data_men_rec.get('cons_code', '')).strip(),
+        'num_men_csv': (row_gen.get('cp_men', '') or data_men_rec.get('num_men_csv', '')).strip(),
+        'nom_cc': (row_gen.get('cp_nom_cc', '') or data_men_rec.get('nom_cc_men_record', '')).strip(),
+        'nom_cm': (row_gen.get('nom_cm', '') or data_men_rec.get('nom_cm_men_record', '')).strip(),
+        'statut_menage': get_menage_statut_code(data_men_rec.get('statut_textuel_men_record')),
+        'tirage': get_tirage(data_men_rec.get('tirage_men_record')),
+        'adresse': (data_men_rec.get('ech_adresse', '') or row_gen.get('adresse', '') or row_gen.get('con_rost', '')).strip(),
+        'telephone1': (data_men_rec.get('ech_telephone', '') or row_gen.get('num_tel1', '')).strip(),
+        'taille_men': int(row_gen.get('taille_men', '0').strip() or '0'),
+        'nbr_eligible': int(row_gen.get('nbr_eligible', '0').strip() or '0'),
+        'date_enquete': parse_date(row_gen.get('date_enq_human', '').strip()),
+        'heure_debut_enquete': parse_time(heure_debut_str_brute) if heure_debut_str_brute else None,
+        'heure_fin_enquete': parse_time(heure_fin_str_brute) if heure_fin_str_brute else None,
+        'observations': row_gen.get('obs', '').strip(),
+        'is_rural': nom_region.upper() not in REGIONS_URBAINES,
+    }
+    fields['source_hash'] = compute_source_hash(fields)
+    return fields
+
+
+def prepare_info_gen_rows(rows, superviseurs, enqueteurs):
+    """Lignes INFO_GEN avec idmng nettoyé ; enregistre enquêteurs et superviseurs au passage."""
+    for row in rows:
+        id_superviseur_gen = (row.get('cp_superviseur') or '').strip()
+        if id_superviseur_gen:
+            superviseurs.setdefault(id_superviseur_gen, None)
+
+        login_enq = (row.get('login_enq') or '').strip()
+        nom_enqueteur = (row.get('nom_de_l_enqueteur') or '').strip()
+        if login_enq and nom_enqueteur:
+            enqueteurs.setdefault(login_enq, (nom_enqueteur, id_superviseur_gen or None))
+
+        row['idmng'] = (row.get('idmng') or '').strip()
+        if row['idmng']:
+            yield row
+
+def prepare_men_record_rows(rows, superviseurs, enqueteurs):
+    """Lignes INFO_MEN_RECORD réduites aux champs utiles ; enregistre enquêteurs et superviseurs."""
+    for row in rows:
+        idmng = row.get('idmng', '').strip()
+        if not idmng: continue
+        id_superviseur_men = row.get('superviseur', '').strip()
+        if id_superviseur_men:
+            superviseurs.setdefault(id_superviseur_men, None)
+        owner_id_men_record = row.get('owner_id', '').strip()
+        owner_name_men_record = row.get('owner_name', '').strip()
+        if owner_id_men_record:
+            enqueteurs.setdefault(
+                owner_id_men_record,
+                (owner_name_men_record or owner_id_men_record, id_superviseur_men or None)
+            )
+        yield {
+            'idmng': idmng,
+            'hh_trimestre': row.get('hh_trimestre', '').strip(),
+            'superviseur_code_men_rec': id_superviseur_men,
+            'dr_code_long': row.get('dr', '').strip(),
+            'cons_code': row.get('cons', '').strip(),
+            'num_men_csv': row.get('num_men', '').strip(),
+            'nom_cc_men_record': row.get('nom_cc', '').strip(),
+            'nom_cm_men_record': row.get('nom_du_cm', '').strip(),
+            'statut_textuel_men_record': row.get('statut', '').strip(),
+            'tirage_men_record': row.get('tirage', '').strip(), # Enlever la valeur par défaut '0'
+            'ech_adresse': row.get('ech_adresse', '').strip(),
+            'ech_telephone': row.get('ech_numero_telephone', '').strip(),
+            'owner_id_men_record': owner_id_men_record,
+        }
+
+PREPARE_ROWS = {
+    'info_gen': prepare_info_gen_rows,
+    'info_men_record': prepare_men_record_rows,
+}
+
+# --- Fonctions exécutées dans les processus du pool (--workers) ---
+
+def sort_byte_range(task):
+    """
+    Lit, prépare et trie par idmng une plage d'octets d'un fichier source.
+    Retourne (fichiers triés écrits, superviseurs vus, enquêteurs vus).
+    """
+    kind, path, fieldnames, start, end, tmpdir, chunk_size, index = task
+    superviseurs, enqueteurs = {}, {}
+    rows = PREPARE_ROWS[kind](iter_csv_range(path, fieldnames, start, end), superviseurs, enqueteurs)
+    run_paths = write_sorted_runs(rows, itemgetter('idmng'), tmpdir, chunk_size, prefix=f"{kind}-{index:03d}")
+    return run_paths, superviseurs, enqueteurs
+
+_worker_enqueteurs = None
+
+def init_normalize_worker(enqueteurs_logins):
+    global _worker_enqueteurs
+    _worker_enqueteurs = enqueteurs_logins
+
+def normalize_pairs(pairs):
+    """Normalise un lot de (ligne INFO_GEN, ligne INFO_MEN_RECORD) ; None pour les lignes rejetées."""
+    return [(row_gen['idmng'], build_menage_fields(row_gen, data_men_rec, _worker_enqueteurs)) for row_gen, data_men_rec in pairs]
+
+def batched(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+def get_mp_context():
+    # "fork" évite de réinitialiser Django dans chaque processus (serveurs Linux)
+    if 'fork' in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context('fork')
+    return multiprocessing.get_context()
+
+
 class Command(BaseCommand):
-    help = 'Supprime les anciennes données et importe les nouvelles depuis les fichiers CSV.'
+    help = (
+        'Recharge les données depuis les fichiers CSV : tous les ménages sont réécrits, '
+        'puis ceux absents des fichiers supprimés. '
+        'Avec --incremental, seuls les ménages nouveaux ou modifiés sont écrits.'
+    )
+    # Import suivi (api/imports.py) déjà démarré par l'exécutant ; sinon créé par handle()
+    job = None
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+            help=f"Nombre de ménages insérés par transaction (défaut: {DEFAULT_BATCH_SIZE})."
+        )
+        parser.add_argument(
+            '--incremental', action='store_true',
+            help="Ne supprime rien : insère/met à jour uniquement les ménages nouveaux ou modifiés."
+        )
+        parser.add_argument(
+            '--delete-missing', action='store_true',
+            help="Avec --incremental, supprime les ménages absents des fichiers source."
+        )
+        parser.add_argument(
+            '--sort-chunk-size', type=int, default=DEFAULT_SORT_CHUNK_SIZE,
+            help=f"Lignes gardées en mémoire par lot du tri externe (défaut: {DEFAULT_SORT_CHUNK_SIZE})."
+        )
+        parser.add_argument(
+            '--workers', type=int, default=1,
+            help="Nombre de processus pour la lecture, le tri et la normalisation des CSV (défaut: 1)."
+        )
+        parser.add_argument('--info-gen', default='INFO_GEN.CSV', help="Chemin du fichier INFO_GEN.")
+        parser.add_argument('--info-men-record', default='INFO_MEN_RECORD.CSV', help="Chemin du fichier INFO_MEN_RECORD.")
 
     def handle(self, *args, **options):
-        self.stdout.write(self.style.WARNING("Début de l'opération d'importation et de rafraîchissement des données..."))
+        self.batch_size = max(1, options['batch_size'])
+        self.path_info_gen = options['info_gen']
+        self.path_info_men_record = options['info_men_record']
+        self.sort_chunk_size = max(1, options['sort_chunk_size'])
+        self.workers = max(1, options['workers'])
+        self.incremental = options['incremental']
+        self.delete_missing = options['delete_missing'] and self.incremental
+        self.counters_adjusted = 0
+        self.stats = dict.fromkeys(['crees', 'modifies', 'inchanges', 'supprimes'], 0)
 
-        self.stdout.write(self.style.WARNING("Suppression des anciennes données..."))
+        if self.job is None:
+            # Lancé à la main : même verrou et même suivi que les imports de l'API
+            self.job = ImportJob.objects.create(
+                source=ImportJob.SOURCE_COMMANDE, info_gen_path=os.path.abspath(self.path_info_gen),
+                info_men_record_path=os.path.abspath(self.path_info_men_record),
+                incremental=self.incremental, delete_missing=self.delete_missing,
+            )
+            try:
+                start_job(self.job)
+            except ImportAlreadyRunning as e:
+                self.job.delete()
+                raise CommandError(str(e))
+        self.progress = ImportProgress(self.job)
         try:
-            Menage.objects.all().delete()
-            Enqueteur.objects.all().delete()
-            Superviseur.objects.all().delete()
-            Region.objects.all().delete()
-            self.stdout.write(self.style.SUCCESS("  Anciennes données (Ménages, Enquêteurs, Superviseurs, Régions) supprimées."))
+            self.run_import()
         except Exception as e:
-            self.stderr.write(self.style.ERROR(f"Erreur lors de la suppression des anciennes données: {e}"))
-            traceback.print_exc()
-            return
-        self.stdout.write(self.style.SUCCESS("Suppression terminée."))
+            self.progress.error(f"{type(e).__name__}: {e}")
+            raise
+        finally:
+            self.progress.finish(self.stats)
 
-        for code, nom in REGIONS_MAPPING.items():
-            Region.objects.get_or_create(code_dr=code, defaults={'nom_region': nom})
-        self.stdout.write(self.style.SUCCESS('Régions importées/mises à jour.'))
+    def run_import(self):
+        with counters_suspended(), invalidation_suspended(), indexing_suspended():
+            self.import_data()
+        # Compteurs déjà ajustés lot par lot, dans la transaction de chaque écriture
+        self.stdout.write(self.style.SUCCESS(f'{self.counters_adjusted} compteurs statistiques ajustés.'))
+        # Une seule invalidation du cache API (et un seul message du flux SSE) pour tout l'import
+        bump_data_version()
+        notify_stats_changed()
 
-        path_info_gen = 'INFO_GEN.CSV'
-        path_info_men_record = 'INFO_MEN_RECORD.CSV'
-        superviseurs_crees_par_id = {}
-        enqueteurs_crees_par_login = {}
+    def import_data(self):
+        self.stdout.write(self.style.WARNING("Début de l'opération d'importation et de rafraîchissement des données..."))
+        if self.incremental:
+            self.stdout.write(self.style.WARNING("Mode incrémental : les données existantes sont conservées."))
 
-        self.stdout.write(f"--- Lecture de {path_info_gen} pour Enquêteurs/Superviseurs ---")
-        try:
-            with open(path_info_gen, 'r', encoding='utf-8-sig', errors='replace') as file:
-                reader = csv.DictReader(file, delimiter=',')
-                if not reader.fieldnames:
-                    self.stderr.write(self.style.ERROR(f"Aucun en-tête trouvé dans {path_info_gen}."))
-                    return
-                # self.stdout.write(f"En-têtes INFO_GEN: {reader.fieldnames}")
-
-                for row in reader:
-                    id_superviseur_gen = row.get('cp_superviseur', '').strip()
-                    if id_superviseur_gen and id_superviseur_gen not in superviseurs_crees_par_id:
-                        sup_obj, _ = Superviseur.objects.get_or_create(id_superviseur=id_superviseur_gen)
-                        superviseurs_crees_par_id[id_superviseur_gen] = sup_obj
-
-                    login_enq = row.get('login_enq', '').strip()
-                    nom_enqueteur = row.get('nom_de_l_enqueteur', '').strip()
-                    if login_enq and nom_enqueteur:
-                        superviseur_obj = superviseurs_crees_par_id.get(id_superviseur_gen)
-                        enq_obj, _ = Enqueteur.objects.get_or_create(
-                            login_enq=login_enq,
-                            defaults={'nom_enqueteur': nom_enqueteur, 'superviseur': superviseur_obj}
-                        )
-                        enqueteurs_crees_par_login[login_enq] = enq_obj
-        except Exception as e:
-            self.stderr.write(self.style.ERROR(f"Erreur lecture {path_info_gen} (Enq/Sup): {e}"))
-            traceback.print_exc(); return
-        self.stdout.write(self.style.SUCCESS(f'{len(enqueteurs_crees_par_login)} Enquêteurs traités.'))
-        self.stdout.write(self.style.SUCCESS(f'{len(superviseurs_crees_par_id)} Superviseurs traités.'))
+        # Tables de correspondance en mémoire, construites une seule fois :
+        # id superviseur -> None, login enquêteur -> (nom, id superviseur).
+        # Leur taille dépend du personnel de terrain, pas du nombre de ménages.
+        superviseurs = {}
+        enqueteurs = {}
 
-        menages_data_from_men_record = {}
-        self.stdout.write(f"--- Lecture de {path_info_men_record} pour données Ménages ---")
-        try:
-            with open(path_info_men_record, 'r', encoding='utf-8-sig', errors='replace') as file:
-                reader = csv.DictReader(file, delimiter=',')
-                if not reader.fieldnames:
-                    self.stderr.write(self.style.ERROR(f"Aucun en-tête trouvé dans {path_info_men_record}."))
+        with tempfile.TemporaryDirectory(prefix='import_data_') as tmpdir:
+            self.tmpdir = tmpdir
+            # Chaque fichier source est lu une seule fois, en entier, avant toute
+            # écriture en base : le tri externe par idmng relève au passage les
+            # enquêteurs et superviseurs. Un fichier absent ou illisible laisse
+            # la base intacte.
+            sources = [('info_gen', self.path_info_gen, "(Enq/Sup)"), ('info_men_record', self.path_info_men_record, "(Ménages)")]
+            tries = {}
+            self.progress.phase('lecture')
+            for kind, path, contexte in sources:
+                self.stdout.write(f"--- Lecture et tri de {path} ({self.workers} processus) ---")
+                try:
+                    tries[kind] = self.sort_source(kind, path, superviseurs, enqueteurs)
+                except Exception as e:
+                    self.report_error(f"Erreur lecture {path} {contexte}: {e}")
                     return
-                # self.stdout.write(f"En-têtes INFO_MEN_RECORD: {reader.fieldnames}")
-                for row in reader:
-                    idmng = row.get('idmng', '').strip()
-                    if not idmng: continue
-                    id_superviseur_men = row.get('superviseur', '').strip()
-                    if id_superviseur_men and id_superviseur_men not in superviseurs_crees_par_id:
-                        sup_obj, _ = Superviseur.objects.get_or_create(id_superviseur=id_superviseur_men)
-                        superviseurs_crees_par_id[id_superviseur_men] = sup_obj
-                    owner_id_men_record = row.get('owner_id', '').strip()
-                    owner_name_men_record = row.get('owner_name', '').strip()
-                    if owner_id_men_record and owner_id_men_record not in enqueteurs_crees_par_login:
-                        superviseur_pour_owner = superviseurs_crees_par_id.get(id_superviseur_men)
-                        enq_obj, _ = Enqueteur.objects.get_or_create(
-                            login_enq=owner_id_men_record,
-                            defaults={'nom_enqueteur': owner_name_men_record or owner_id_men_record, 'superviseur': superviseur_pour_owner }
-                        )
-                        enqueteurs_crees_par_login[owner_id_men_record] = enq_obj
-                    menages_data_from_men_record[idmng] = {
-                        'hh_trimestre': row.get('hh_trimestre', '').strip(),
-                        'superviseur_code_men_rec': id_superviseur_men,
-                        'dr_code_long': row.get('dr', '').strip(),
-                        'cons_code': row.get('cons', '').strip(),
-                        'num_men_csv': row.get('num_men', '').strip(),
-                        'nom_cc_men_record': row.get('nom_cc', '').strip(),
-                        'nom_cm_men_record': row.get('nom_du_cm', '').strip(),
-                        'statut_textuel_men_record': row.get('statut', '').strip(),
-                        'tirage_men_record': row.get('tirage', '').strip(), # Enlever la valeur par défaut '0'
-                        'ech_adresse': row.get('ech_adresse', '').strip(),
-                        'ech_telephone': row.get('ech_numero_telephone', '').strip(),
-                        'owner_id_men_record': owner_id_men_record,
-                    }
-        except Exception as e:
-            self.stderr.write(self.style.ERROR(f"Erreur lecture {path_info_men_record} (Ménages): {e}"))
-            traceback.print_exc(); return
-        self.stdout.write(self.style.SUCCESS(f'{len(menages_data_from_men_record)} entrées ménages depuis INFO_MEN_RECORD.'))
 
-        count_created = 0
-        idmngs_deja_importes = set()
-        self.stdout.write(f"--- Importation des Ménages (source principale INFO_GEN) ---")
-        try:
-            with open(path_info_gen, 'r', encoding='utf-8-sig', errors='replace') as file:
-                reader = csv.DictReader(file, delimiter=',')
-                if not reader.fieldnames:
-                    self.stderr.write(self.style.ERROR(f"Aucun en-tête trouvé dans {path_info_gen} pour import final."))
-                    return
+            # Identifiants importés, écrits dans l'ordre trié pour --delete-missing
+            path_ids_importes = os.path.join(tmpdir, 'ids_importes.txt')
+            self.idmng_en_cours = None
+            try:
+                self.write_data(tries, superviseurs, enqueteurs, path_ids_importes)
+            except Exception as e:
+                self.report_error(f"Erreur importation ménages: {e} (ligne idmng: {self.idmng_en_cours or 'inconnu'})")
+                return
 
-                for i, row_gen in enumerate(reader):
-                    idmng = row_gen.get('idmng', '').strip()
-                    if not idmng: continue
-                    if idmng in idmngs_deja_importes: continue
-                    
-                    data_men_rec = menages_data_from_men_record.get(idmng, {})
-
-                    dr_code_long_men_rec = data_men_rec.get('dr_code_long', '').strip()
-                    dr_code_gen_grappe = row_gen.get('cp_grappe', '').strip()
-                    dr_code_final_brut = None
-
-                    if dr_code_long_men_rec and len(dr_code_long_men_rec) >= 2:
-                        dr_code_final_brut = dr_code_long_men_rec[:2]
-                    elif dr_code_gen_grappe and len(dr_code_gen_grappe) >= 2:
-                        dr_code_final_brut = dr_code_gen_grappe[:2]
-                    
-                    dr_code_final = None
-                    if dr_code_final_brut:
-                        cleaned_code = dr_code_final_brut.strip("'\" ")
-                        if len(cleaned_code) == 1 and cleaned_code.isdigit():
-                            dr_code_final = f"0{cleaned_code}"
-                        elif len(cleaned_code) == 2 and cleaned_code.isdigit():
-                            dr_code_final = cleaned_code
-                        else: continue
-                    if not dr_code_final: continue
-                    region_obj = Region.objects.filter(code_dr=dr_code_final).first()
-                    if not region_obj: continue
-
-                    login_enq_gen = row_gen.get('login_enq', '').strip()
-                    owner_id_men_rec = data_men_rec.get('owner_id_men_record', '')
-                    enqueteur_obj = enqueteurs_crees_par_login.get(login_enq_gen) or enqueteurs_crees_par_login.get(owner_id_men_rec)
-                    
-                    statut_menage_code = get_menage_statut_code(data_men_rec.get('statut_textuel_men_record'))
-                    
-                    # CORRECTION POUR TIRÉ ET REMPLAÇANT
-                    valeur_tirage_csv = data_men_rec.get('tirage_men_record', '').strip().lower()
-                    tirage_val = 0
-                    if 'remplaçant' in valeur_tirage_csv or 'tiré' in valeur_tirage_csv:
-                        tirage_val = 1
-                    
-                    superviseur_code_final = row_gen.get('cp_superviseur', '').strip()
-                    if not superviseur_code_final: superviseur_code_final = data_men_rec.get('superviseur_code_men_rec', '')
-                    
-                    date_enquete_val = parse_date(row_gen.get('date_enq_human', '').strip())
-                    heure_debut_str_brute = (row_gen.get('heur_debut', '') or row_gen.get('heur_debistatut', '')).strip()
-                    heure_fin_str_brute = row_gen.get('heur_fin', '').strip()
-                    heure_debut_val = parse_time(heure_debut_str_brute) if heure_debut_str_brute else None
-                    heure_fin_val = parse_time(heure_fin_str_brute) if heure_fin_str_brute else None
-                    
-                    is_rural_val = region_obj.nom_region.upper() not in ["DAKAR", "THIES"] 
-
-                    menage_defaults = {
-                        'region': region_obj, 'superviseur_code': superviseur_code_final, 'enqueteur': enqueteur_obj,
-                        'hh_trimestre': (row_gen.get('cp_trimestre', '') or data_men_rec.get('hh_trimestre', '')).strip(),
-                        'cons_code': (row_gen.get('cp_cons', '') or data_men_rec.get('cons_code', '')).strip(),
-                        'num_men_csv': (row_gen.get('cp_men', '') or data_men_rec.get('num_men_csv', '')).strip(),
-                        'nom_cc': (row_gen.get('cp_nom_cc', '') or data_men_rec.get('nom_cc_men_record', '')).strip(),
-                        'nom_cm': (row_gen.get('nom_cm', '') or data_men_rec.get('nom_cm_men_record', '')).strip(),
-                        'statut_menage': statut_menage_code, 'tirage': tirage_val,
-                        'adresse': (data_men_rec.get('ech_adresse', '') or row_gen.get('adresse', '') or row_gen.get('con_rost', '')).strip(),
-                        'telephone1': (data_men_rec.get('ech_telephone', '') or row_gen.get('num_tel1', '')).strip(),
-                        'taille_men': int(row_gen.get('taille_men', '0').strip() or '0'),
-                        'nbr_eligible': int(row_gen.get('nbr_eligible', '0').strip() or '0'),
-                        'date_enquete': date_enquete_val, 'heure_debut_enquete': heure_debut_val,
-                        'heure_fin_enquete': heure_fin_val, 'observations': row_gen.get('obs', '').strip(),
-                        'is_rural': is_rural_val
-                    }
-                    Menage.objects.create(idmng=idmng, **menage_defaults)
-                    idmngs_deja_importes.add(idmng)
-                    count_created += 1
-        except FileNotFoundError:
-            self.stderr.write(self.style.ERROR(f"Fichier {path_info_gen} non trouvé."))
-            return
-        except Exception as e:
-            self.stderr.write(self.style.ERROR(f"Erreur importation ménages: {e} (ligne idmng: {idmng if 'idmng' in locals() else 'inconnu'})"))
-            traceback.print_exc()
+            # Rechargement complet : les données absentes des fichiers ne sont
+            # supprimées qu'une fois tous les ménages réécrits, si bien que le
+            # tableau de bord n'est jamais vide pendant l'import
+            if self.delete_missing or not self.incremental:
+                self.delete_missing_menages(path_ids_importes)
+            if not self.incremental:
+                self.prune_reference_data(superviseurs, enqueteurs)
+
+        self.stdout.write(self.style.SUCCESS(f"{self.stats['crees']} ménages créés."))
+        self.stdout.write(self.style.SUCCESS(
+            f"{self.stats['modifies']} ménages modifiés, {self.stats['inchanges']} inchangés, "
+            f"{self.stats['supprimes']} supprimés."
+        ))
+        self.stdout.write(self.style.SUCCESS('Importation et rafraîchissement terminés.'))
+
+    def write_data(self, tries, superviseurs, enqueteurs, path_ids_importes):
+        """Régions, personnel de terrain puis ménages (jointure triée des deux fichiers), par lots."""
+        Region.objects.bulk_create(
+            [Region(code_dr=code, nom_region=nom) for code, nom in REGIONS_MAPPING.items()],
+            update_conflicts=True, unique_fields=['code_dr'], update_fields=['nom_region'],
+        )
+        self.stdout.write(self.style.SUCCESS('Régions importées/mises à jour.'))
+
+        # Enquêteurs renommés : le document de recherche de leurs ménages change
+        enqueteurs_renommes = []
+        if self.incremental:
+            enqueteurs_renommes = [
+                login for login, nom in Enqueteur.objects.values_list('login_enq', 'nom_enqueteur')
+                if login in enqueteurs and enqueteurs[login][0] != nom
+            ]
+        with transaction.atomic():
+            Superviseur.objects.bulk_create(
+                [Superviseur(id_superviseur=id_sup) for id_sup in superviseurs],
+                batch_size=self.batch_size, ignore_conflicts=True,
+            )
+            Enqueteur.objects.bulk_create(
+                [
+                    Enqueteur(login_enq=login, nom_enqueteur=nom, superviseur_id=id_sup if id_sup in superviseurs else None)
+                    for login, (nom, id_sup) in enqueteurs.items()
+                ],
+                batch_size=self.batch_size, update_conflicts=True,
+                unique_fields=['login_enq'], update_fields=['nom_enqueteur', 'superviseur'],
+            )
+        if enqueteurs_renommes:
+            index_menages(Menage.objects.filter(enqueteur_id__in=enqueteurs_renommes).values_list('idmng', flat=True))
+        self.stdout.write(self.style.SUCCESS(f'{len(enqueteurs)} Enquêteurs traités.'))
+        self.stdout.write(self.style.SUCCESS(f'{len(superviseurs)} Superviseurs traités.'))
+
+        count_read = 0
+        batch = []
+        start = time.monotonic()
+        self.stdout.write(f"--- Importation des Ménages (source principale INFO_GEN, jointure triée) ---")
+        self.progress.phase('ecriture')
+        with open(path_ids_importes, 'w', encoding='utf-8') as ids_importes, \
+                self.normalized_rows(merge_join(tries['info_gen'], tries['info_men_record']), enqueteurs) as rows:
+            for idmng, fields in rows:
+                # Le flux est trié : les doublons sont consécutifs
+                if idmng == self.idmng_en_cours: continue
+                if fields is None: continue
+                batch.append(fields)
+                self.idmng_en_cours = idmng
+                ids_importes.write(idmng + '\n')
+
+                if len(batch) >= self.batch_size:
+                    count_read += self.write_batch(batch)
+                    batch = []
+                    self.report_progress(count_read, start)
+            count_read += self.write_batch(batch)
+        self.report_progress(count_read, start)
+
+    def prune_reference_data(self, superviseurs, enqueteurs):
+        """
+        Rechargement complet : supprime le personnel absent des fichiers et les
+        départements, communes et grappes qui n'ont plus de ménage.
+        """
+        self.progress.phase('suppression_references')
+        with transaction.atomic():
+            absents = Enqueteur.objects.exclude(login_enq__in=list(enqueteurs)).filter(menages_collectes__isnull=True)
+            # Compteurs journaliers à zéro de ces enquêteurs (sinon rattachés à "aucun enquêteur")
+            DailyCounter.objects.filter(enqueteur__in=absents).delete()
+            nb_enqueteurs, _ = absents.delete()
+            nb_superviseurs, _ = Superviseur.objects.exclude(id_superviseur__in=list(superviseurs)).delete()
+            for model in (Grappe, Commune, Departement):
+                model.objects.filter(menages__isnull=True).delete()
+        self.stdout.write(self.style.SUCCESS(
+            f"  {nb_enqueteurs} enquêteurs et {nb_superviseurs} superviseurs absents des fichiers supprimés."
+        ))
+
+    def sort_source(self, kind, path, superviseurs, enqueteurs):
+        """
+        Trie un fichier source par idmng. Avec --workers > 1, le fichier est
+        découpé en plages d'octets lues et triées en parallèle ; les tables
+        enquêteurs/superviseurs sont fusionnées dans l'ordre des plages.
+        """
+        if self.workers <= 1:
+            rows = PREPARE_ROWS[kind](self.progress.beating(iter_csv_rows(path)), superviseurs, enqueteurs)
+            return external_sort(rows, itemgetter('idmng'), self.tmpdir, self.sort_chunk_size, prefix=kind)
+
+        fieldnames, ranges = split_byte_ranges(path, self.workers)
+        tasks = [
+            (kind, path, fieldnames, start, end, self.tmpdir, self.sort_chunk_size, index)
+            for index, (start, end) in enumerate(ranges)
+        ]
+        run_paths = []
+        with get_mp_context().Pool(self.workers) as pool:
+            result = pool.map_async(sort_byte_range, tasks)
+            while not result.ready():
+                result.wait(PROGRESS_INTERVAL)
+                self.progress.heartbeat()
+            for paths, sups, enqs in result.get():
+                run_paths.extend(paths)
+                for id_sup in sups:
+                    superviseurs.setdefault(id_sup, None)
+                for login, value in enqs.items():
+                    enqueteurs.setdefault(login, value)
+        return merge_runs(run_paths, itemgetter('idmng'))
+
+    @contextmanager
+    def normalized_rows(self, pairs, enqueteurs):
+        """
+        (idmng, champs normalisés ou None) pour chaque paire jointe, dans l'ordre.
+        Avec --workers > 1, la normalisation est répartie par lots sur un pool
+        de processus ; l'écriture en base reste dans le processus principal.
+        """
+        if self.workers <= 1:
+            yield ((row_gen['idmng'], build_menage_fields(row_gen, data_men_rec, enqueteurs)) for row_gen, data_men_rec in pairs)
             return
-        self.stdout.write(self.style.SUCCESS(f'{count_created} ménages créés.'))
-        self.stdout.write(self.style.SUCCESS('Importation et rafraîchissement terminés.'))
\ No newline at end of file
+        logins = set(enqueteurs)
+        with get_mp_context().Pool(self.workers, initializer=init_normalize_worker, initargs=(logins,)) as pool:
+            yield chain.from_iterable(pool.imap(normalize_pairs, batched(pairs, self.batch_size)))
+
+    def write_batch(self, batch):
+        """
+        Écrit un lot de ménages (liste de dicts de champs) dans une transaction
+        unique, avec l'index de recherche et les compteurs qu'il modifie.
+        """
+        if not batch:
+            return 0
+
+        # Ménages déjà en base : leurs compteurs sont décomptés avant réécriture ; en
+        # mode incrémental, ceux dont l'empreinte n'a pas changé ne sont pas réécrits
+        existing = {
+            row['idmng']: row
+            for row in Menage.objects.filter(idmng__in=[fields['idmng'] for fields in batch])
+            .values('idmng', 'source_hash', *ROLLUP_FIELDS)
+        }
+        deltas = CounterDeltas()
+        to_write = []
+        for fields in batch:
+            previous = existing.get(fields['idmng'])
+            if previous is None:
+                self.stats['crees'] += 1
+            elif self.incremental and previous['source_hash'] == fields['source_hash']:
+                self.stats['inchanges'] += 1
+                continue
+            else:
+                self.stats['modifies'] += 1
+                deltas.add(previous, -1)
+            deltas.add(fields, 1)
+            to_write.append(Menage(**fields))
+        written = {menage.idmng for menage in to_write}
+
+        if to_write:
+            with transaction.atomic():
+                ensure_geo_nodes(fields for fields in batch if fields['idmng'] in written)
+                Menage.objects.bulk_create(
+                    to_write, batch_size=self.batch_size, update_conflicts=True,
+                    unique_fields=['idmng'], update_fields=MENAGE_UPDATE_FIELDS,
+                )
+                index_menages([menage.idmng for menage in to_write])
+                # Compteurs ajustés avec le lot : un échec plus loin ne les désynchronise pas
+                self.counters_adjusted += deltas.apply()
+        return len(batch)
+
+    def delete_missing_menages(self, path_ids_importes):
+        """
+        Supprime, par lots, les ménages en base absents des fichiers importés.
+        Les identifiants en base sont triés par tri externe puis comparés au
+        fichier trié des identifiants importés, sans les charger en mémoire.
+        """
+        self.stdout.write(f"--- Suppression des ménages absents des fichiers source ---")
+        self.progress.phase('suppression_absents')
+        ids_en_base = external_sort(
+            self.progress.beating(Menage.objects.values_list('idmng', flat=True).iterator(chunk_size=self.batch_size)),
+            None, self.tmpdir, self.sort_chunk_size, prefix='ids_en_base',
+        )
+        with open(path_ids_importes, 'r', encoding='utf-8') as ids_importes:
+            ids_absents = iter_missing(ids_en_base, (line.rstrip('\n') for line in ids_importes))
+            while True:
+                ids = list(islice(ids_absents, self.batch_size))
+                if not ids:
+                    break
+                chunk = Menage.objects.filter(idmng__in=ids)
+                with transaction.atomic():
+                    deltas = CounterDeltas()
+                    deltas.remove_queryset(chunk)
+                    chunk.delete()
+                    remove_from_index(ids)
+                    self.counters_adjusted += deltas.apply()
+                self.stats['supprimes'] += len(ids)
+                self.progress.heartbeat()
+
+    def report_progress(self, count, start):
+        elapsed = time.monotonic() - start
+        rate = count / elapsed if elapsed > 0 else 0
+        self.stdout.write(f"  {count} ménages traités en {elapsed:.1f}s ({rate:.0f} lignes/s)")
+        self.progress.update(count, self.stats['crees'] + self.stats['modifies'], rate)
+
+    def report_error(self, message):
+        """Erreur affichée et enregistrée sur l'import suivi (qui finira en échec)."""
+        self.stderr.write(self.style.ERROR(message))
+        self.progress.error(message)
@@ -0,0 +1,34 @@
+# api/management/commands/run_import_jobs.py
+import time
+
+from django.core.management.base import BaseCommand
+
+from api.imports import ImportAlreadyRunning, get_poll_interval, run_next_job
+
+
+class Command(BaseCommand):
+    help = (
+        "Exécute les imports en attente (POST /api/imports/) dans ce processus. "
+        "À utiliser avec IMPORT_JOBS_IN_PROCESS=False, hors du processus web."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help="Vide la file puis s'arrête au lieu de surveiller les nouveaux imports.")
+        parser.add_argument('--interval', type=float, help="Attente (s) entre deux consultations de la file (défaut: IMPORT_JOBS_POLL_INTERVAL).")
+
+    def handle(self, *args, **options):
+        interval = options['interval'] or get_poll_interval()
+        while True:
+            try:
+                job = run_next_job()
+            except ImportAlreadyRunning as e:
+                self.stdout.write(self.style.WARNING(f"{e} Nouvel essai dans {interval:g}s."))
+                time.sleep(interval)
+                continue
+            if job is not None:
+                style = self.style.SUCCESS if job.statut == job.STATUT_TERMINE else self.style.ERROR
+                self.stdout.write(style(f"Import #{job.pk} : {job.get_statut_display()} {job.resultat or ''}"))
+                continue
+            if options['once']:
+                return
+            time.sleep(interval)
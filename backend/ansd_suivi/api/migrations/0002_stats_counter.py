@@ -0,0 +1,44 @@
+# Generated by Django 5.2.1 on 2026-10-18 10:45
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def build_counters(apps, schema_editor):
+    """Initialise les compteurs à partir des ménages déjà importés."""
+    Menage = apps.get_model('api', 'Menage')
+    StatsCounter = apps.get_model('api', 'StatsCounter')
+    rows = (
+        Menage.objects.values('region_id', 'statut_menage', 'is_rural', 'tirage')
+        .annotate(count=Count('idmng'))
+        .order_by()
+    )
+    StatsCounter.objects.bulk_create([StatsCounter(**row) for row in rows])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StatsCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('statut_menage', models.IntegerField(choices=[(1, 'NON AFFECTE'), (2, 'AFFECTE'), (3, 'PARTIEL'), (4, 'COMPLET'), (7, "N'existe plus"), (8, 'Déménagé'), (9, 'Refus')], verbose_name='Statut du Ménage')),
+                ('is_rural', models.BooleanField(default=False, verbose_name='Milieu Rural')),
+                ('tirage', models.IntegerField(blank=True, null=True, verbose_name='Tirage (1 si attendu)')),
+                ('count', models.PositiveIntegerField(default=0, verbose_name='Nombre de ménages')),
+                ('region', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stats_counters', to='api.region', verbose_name='Région (DR)')),
+            ],
+            options={
+                'verbose_name': 'Compteur statistique',
+                'verbose_name_plural': 'Compteurs statistiques',
+                'constraints': [models.UniqueConstraint(fields=('region', 'statut_menage', 'is_rural', 'tirage'), name='unique_stats_counter')],
+            },
+        ),
+        migrations.RunPython(build_counters, migrations.RunPython.noop),
+    ]
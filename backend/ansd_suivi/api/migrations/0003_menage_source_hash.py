@@ -0,0 +1,18 @@
+# Generated by Django 5.2.1 on 2026-10-18 10:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0002_stats_counter'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='menage',
+            name='source_hash',
+            field=models.CharField(blank=True, editable=False, max_length=40, null=True, verbose_name='Empreinte source'),
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.2.1 on 2026-10-18 10:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0003_menage_source_hash'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='menage',
+            index=models.Index(fields=['region', 'statut_menage', 'idmng'], name='menage_region_statut_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='menage',
+            index=models.Index(fields=['statut_menage', 'idmng'], name='menage_statut_idmng_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='menage',
+            index=models.Index(fields=['tirage', 'is_rural'], name='menage_tirage_rural_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='menage',
+            index=models.Index(fields=['enqueteur', 'date_enquete'], name='menage_enq_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='menage',
+            index=models.Index(fields=['superviseur_code', 'idmng'], name='menage_sup_code_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='menage',
+            index=models.Index(fields=['date_enquete', 'idmng'], name='menage_date_idmng_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='menage',
+            index=models.Index(condition=models.Q(('tirage', 1)), fields=['region', 'is_rural'], name='menage_attendu_idx'),
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 5.2.1 on 2026-10-18 11:06
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def build_daily_counters(apps, schema_editor):
+    """Initialise les compteurs journaliers à partir des ménages déjà importés."""
+    Menage = apps.get_model('api', 'Menage')
+    DailyCounter = apps.get_model('api', 'DailyCounter')
+    rows = (
+        Menage.objects.filter(date_enquete__isnull=False)
+        .values('date_enquete', 'region_id', 'enqueteur_id', 'statut_menage')
+        .annotate(count=Count('idmng'))
+        .order_by()
+    )
+    DailyCounter.objects.bulk_create([DailyCounter(**row) for row in rows], batch_size=2000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0004_menage_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date_enquete', models.DateField(verbose_name="Date de l'enquête")),
+                ('statut_menage', models.IntegerField(choices=[(1, 'NON AFFECTE'), (2, 'AFFECTE'), (3, 'PARTIEL'), (4, 'COMPLET'), (7, "N'existe plus"), (8, 'Déménagé'), (9, 'Refus')], verbose_name='Statut du Ménage')),
+                ('count', models.PositiveIntegerField(default=0, verbose_name='Nombre de ménages')),
+                ('enqueteur', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='daily_counters', to='api.enqueteur', verbose_name='Enquêteur')),
+                ('region', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_counters', to='api.region', verbose_name='Région (DR)')),
+            ],
+            options={
+                'verbose_name': 'Compteur journalier',
+                'verbose_name_plural': 'Compteurs journaliers',
+                'indexes': [models.Index(fields=['date_enquete', 'region'], name='daily_counter_date_idx')],
+                'constraints': [models.UniqueConstraint(fields=('date_enquete', 'region', 'enqueteur', 'statut_menage'), name='unique_daily_counter')],
+            },
+        ),
+        migrations.RunPython(build_daily_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,68 @@
+# Generated by Django 5.2.1 on 2026-10-18 14:20
+
+import re
+import unicodedata
+
+from django.db import migrations
+
+
+def normalize(text):
+    decomposed = unicodedata.normalize('NFKD', text or '')
+    return ''.join(c for c in decomposed if not unicodedata.combining(c)).lower()
+
+
+def build_document(idmng, nom_cm, adresse, telephone, nom_enqueteur):
+    # Copie figée de api.search.build_document (une migration n'importe pas le code applicatif)
+    telephone = telephone or ''
+    parts = [idmng, nom_cm, adresse, telephone, re.sub(r'\D', '', telephone), nom_enqueteur]
+    return normalize(' '.join(part for part in parts if part))
+
+
+def table_name(vendor):
+    return 'api_menage_fts' if vendor == 'sqlite' else 'api_menage_search'
+
+
+def create_search_index(apps, schema_editor):
+    """Crée l'index de recherche adapté à la base, puis indexe les ménages existants."""
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        schema_editor.execute(
+            "CREATE VIRTUAL TABLE api_menage_fts USING fts5("
+            "idmng UNINDEXED, document, tokenize='unicode61 remove_diacritics 2')"
+        )
+    else:
+        schema_editor.execute(
+            "CREATE TABLE api_menage_search (idmng varchar(50) PRIMARY KEY, document text NOT NULL)"
+        )
+        if vendor == 'postgresql':
+            schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+            schema_editor.execute(
+                "CREATE INDEX api_menage_search_trgm ON api_menage_search USING gin (document gin_trgm_ops)"
+            )
+
+    Menage = apps.get_model('api', 'Menage')
+    rows = Menage.objects.values_list('idmng', 'nom_cm', 'adresse', 'telephone1', 'enqueteur__nom_enqueteur')
+    batch = []
+    with schema_editor.connection.cursor() as cursor:
+        for row in rows.order_by().iterator(chunk_size=2000):
+            batch.append((row[0], build_document(*row)))
+            if len(batch) >= 2000:
+                cursor.executemany(f"INSERT INTO {table_name(vendor)} (idmng, document) VALUES (%s, %s)", batch)
+                batch = []
+        if batch:
+            cursor.executemany(f"INSERT INTO {table_name(vendor)} (idmng, document) VALUES (%s, %s)", batch)
+
+
+def drop_search_index(apps, schema_editor):
+    schema_editor.execute(f"DROP TABLE IF EXISTS {table_name(schema_editor.connection.vendor)}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0005_daily_counter'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,86 @@
+# Generated by Django 5.2.1 on 2026-10-18 11:20
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0006_menage_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Commune',
+            fields=[
+                ('code_commune', models.CharField(max_length=20, primary_key=True, serialize=False, verbose_name='Code Commune')),
+                ('nom_commune', models.CharField(blank=True, max_length=100, null=True, verbose_name='Nom de la Commune')),
+            ],
+            options={
+                'verbose_name': 'Commune',
+                'verbose_name_plural': 'Communes',
+            },
+        ),
+        migrations.AddField(
+            model_name='menage',
+            name='commune',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='menages', to='api.commune', verbose_name='Commune'),
+        ),
+        migrations.CreateModel(
+            name='Departement',
+            fields=[
+                ('code_departement', models.CharField(max_length=10, primary_key=True, serialize=False, verbose_name='Code Département')),
+                ('nom_departement', models.CharField(blank=True, max_length=100, null=True, verbose_name='Nom du Département')),
+                ('region', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='departements', to='api.region', verbose_name='Région (DR)')),
+            ],
+            options={
+                'verbose_name': 'Département',
+                'verbose_name_plural': 'Départements',
+            },
+        ),
+        migrations.AddField(
+            model_name='commune',
+            name='departement',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='communes', to='api.departement', verbose_name='Département'),
+        ),
+        migrations.AddField(
+            model_name='menage',
+            name='departement',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='menages', to='api.departement', verbose_name='Département'),
+        ),
+        migrations.CreateModel(
+            name='GeoCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('niveau', models.CharField(choices=[('region', 'Région (DR)'), ('departement', 'Département'), ('commune', 'Commune'), ('grappe', 'Grappe')], max_length=12, verbose_name='Niveau')),
+                ('code', models.CharField(max_length=50, verbose_name='Code du nœud')),
+                ('parent', models.CharField(blank=True, max_length=50, null=True, verbose_name='Code du parent')),
+                ('statut_menage', models.IntegerField(choices=[(1, 'NON AFFECTE'), (2, 'AFFECTE'), (3, 'PARTIEL'), (4, 'COMPLET'), (7, "N'existe plus"), (8, 'Déménagé'), (9, 'Refus')], verbose_name='Statut du Ménage')),
+                ('tirage', models.IntegerField(blank=True, null=True, verbose_name='Tirage (1 si attendu)')),
+                ('count', models.PositiveIntegerField(default=0, verbose_name='Nombre de ménages')),
+            ],
+            options={
+                'verbose_name': 'Compteur géographique',
+                'verbose_name_plural': 'Compteurs géographiques',
+                'indexes': [models.Index(fields=['niveau', 'parent'], name='geo_counter_parent_idx')],
+                'constraints': [models.UniqueConstraint(fields=('niveau', 'code', 'statut_menage', 'tirage'), name='unique_geo_counter')],
+            },
+        ),
+        migrations.CreateModel(
+            name='Grappe',
+            fields=[
+                ('code_grappe', models.CharField(max_length=50, primary_key=True, serialize=False, verbose_name='Code Grappe')),
+                ('commune', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='grappes', to='api.commune', verbose_name='Commune')),
+            ],
+            options={
+                'verbose_name': 'Grappe',
+                'verbose_name_plural': 'Grappes',
+            },
+        ),
+        migrations.AddField(
+            model_name='menage',
+            name='grappe',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='menages', to='api.grappe', verbose_name='Grappe'),
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 5.2.1 on 2026-10-18 11:30
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_geo_hierarchy'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImportJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('statut', models.CharField(choices=[('en_attente', 'En attente'), ('en_cours', 'En cours'), ('termine', 'Terminé'), ('echec', 'Échec')], default='en_attente', max_length=12, verbose_name='Statut')),
+                ('source', models.CharField(choices=[('api', 'Fichiers envoyés à /api/imports/'), ('commande', 'manage.py import_data')], default='api', max_length=10, verbose_name='Origine')),
+                ('info_gen_path', models.CharField(max_length=500, verbose_name='Fichier INFO_GEN')),
+                ('info_men_record_path', models.CharField(max_length=500, verbose_name='Fichier INFO_MEN_RECORD')),
+                ('incremental', models.BooleanField(default=False, verbose_name='Import incrémental')),
+                ('delete_missing', models.BooleanField(default=False, verbose_name='Suppression des ménages absents')),
+                ('cree_le', models.DateTimeField(auto_now_add=True, verbose_name='Créé le')),
+                ('debut', models.DateTimeField(blank=True, null=True, verbose_name='Début')),
+                ('fin', models.DateTimeField(blank=True, null=True, verbose_name='Fin')),
+                ('mis_a_jour', models.DateTimeField(blank=True, null=True, verbose_name='Dernier avancement')),
+                ('phase', models.CharField(blank=True, max_length=30, verbose_name='Étape en cours')),
+                ('lignes_lues', models.PositiveIntegerField(default=0, verbose_name='Ménages lus')),
+                ('lignes_ecrites', models.PositiveIntegerField(default=0, verbose_name='Ménages écrits')),
+                ('lignes_par_seconde', models.FloatField(default=0, verbose_name='Débit (lignes/s)')),
+                ('erreurs', models.JSONField(blank=True, default=list, verbose_name='Erreurs')),
+                ('resultat', models.JSONField(blank=True, default=dict, verbose_name='Résultat')),
+                ('cree_par', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='imports', to=settings.AUTH_USER_MODEL, verbose_name='Créé par')),
+            ],
+            options={
+                'verbose_name': 'Import',
+                'verbose_name_plural': 'Imports',
+                'ordering': ['-cree_le', '-pk'],
+                'indexes': [models.Index(fields=['statut', 'cree_le'], name='import_job_statut_idx')],
+                'constraints': [models.UniqueConstraint(condition=models.Q(('statut', 'en_cours')), fields=('statut',), name='un_seul_import_en_cours')],
+            },
+        ),
+    ]
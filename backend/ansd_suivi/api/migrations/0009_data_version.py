@@ -0,0 +1,25 @@
+# Generated by Django 5.2.1 on 2026-10-18 12:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0008_import_job'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DataVersion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.CharField(max_length=32, verbose_name='Version')),
+                ('modifie_le', models.DateTimeField(verbose_name='Dernière modification')),
+            ],
+            options={
+                'verbose_name': 'Version des données',
+                'verbose_name_plural': 'Version des données',
+            },
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.2.1 on 2026-10-18 15:05
+
+from django.db import migrations
+
+
+def add_fts_rowids(apps, schema_editor):
+    """
+    SQLite : rowid de api_menage_fts = identifiant entier du ménage dans
+    api_menage_fts_ids, pour retirer un document par rowid au lieu de
+    parcourir toute la table virtuelle (idmng y est UNINDEXED).
+    """
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(
+        "CREATE TABLE api_menage_fts_ids (id integer PRIMARY KEY, idmng varchar(50) NOT NULL UNIQUE)"
+    )
+    schema_editor.execute("INSERT OR IGNORE INTO api_menage_fts_ids (idmng) SELECT idmng FROM api_menage_fts")
+    schema_editor.execute("CREATE TEMP TABLE api_menage_fts_docs AS SELECT idmng, document FROM api_menage_fts")
+    schema_editor.execute("DELETE FROM api_menage_fts")
+    schema_editor.execute(
+        "INSERT INTO api_menage_fts (rowid, idmng, document) "
+        "SELECT i.id, d.idmng, MAX(d.document) FROM api_menage_fts_docs d "
+        "JOIN api_menage_fts_ids i ON i.idmng = d.idmng GROUP BY i.id, d.idmng"
+    )
+    schema_editor.execute("DROP TABLE api_menage_fts_docs")
+
+
+def drop_fts_rowids(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute("DROP TABLE IF EXISTS api_menage_fts_ids")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0009_data_version'),
+    ]
+
+    operations = [
+        migrations.RunPython(add_fts_rowids, drop_fts_rowids),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.1 on 2026-10-18 12:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0010_menage_search_rowid'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='importjob',
+            name='hote',
+            field=models.CharField(blank=True, max_length=255, verbose_name="Machine d'exécution"),
+        ),
+        migrations.AddField(
+            model_name='importjob',
+            name='pid',
+            field=models.PositiveIntegerField(blank=True, null=True, verbose_name="Processus d'exécution"),
+        ),
+    ]
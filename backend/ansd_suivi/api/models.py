@@ -1,3 +1,4 @@
+from django.conf import settings
 from django.db import models
 
 class Region(models.Model):
@@ -11,6 +12,43 @@ class Region(models.Model):
         verbose_name = "Région (DR)"
         verbose_name_plural = "Régions (DR)"
 
+class Departement(models.Model):
+    code_departement = models.CharField(max_length=10, primary_key=True, verbose_name="Code Département")
+    nom_departement = models.CharField(max_length=100, null=True, blank=True, verbose_name="Nom du Département")
+    region = models.ForeignKey(Region, on_delete=models.CASCADE, related_name='departements', verbose_name="Région (DR)")
+
+    def __str__(self):
+        return f"{self.nom_departement or 'Département'} ({self.code_departement})"
+
+    class Meta:
+        verbose_name = "Département"
+        verbose_name_plural = "Départements"
+
+
+class Commune(models.Model):
+    code_commune = models.CharField(max_length=20, primary_key=True, verbose_name="Code Commune")
+    nom_commune = models.CharField(max_length=100, null=True, blank=True, verbose_name="Nom de la Commune")
+    departement = models.ForeignKey(Departement, on_delete=models.CASCADE, related_name='communes', verbose_name="Département")
+
+    def __str__(self):
+        return f"{self.nom_commune or 'Commune'} ({self.code_commune})"
+
+    class Meta:
+        verbose_name = "Commune"
+        verbose_name_plural = "Communes"
+
+
+class Grappe(models.Model):
+    code_grappe = models.CharField(max_length=50, primary_key=True, verbose_name="Code Grappe")
+    commune = models.ForeignKey(Commune, on_delete=models.CASCADE, related_name='grappes', verbose_name="Commune")
+
+    def __str__(self):
+        return self.code_grappe
+
+    class Meta:
+        verbose_name = "Grappe"
+        verbose_name_plural = "Grappes"
+
 class Superviseur(models.Model):
     id_superviseur = models.CharField(max_length=20, primary_key=True, verbose_name="ID Superviseur")
     # Ajoutez d'autres champs si nécessaire (nom, contact, etc.)
@@ -65,6 +103,10 @@ class Menage(models.Model):
     region = models.ForeignKey(Region, on_delete=models.PROTECT, related_name='menages', verbose_name="Région (DR)")
     superviseur_code = models.CharField(max_length=20, null=True, blank=True, verbose_name="Code Superviseur (du CSV)") # Peut devenir FK à Superviseur plus tard
     enqueteur = models.ForeignKey(Enqueteur, on_delete=models.SET_NULL, null=True, blank=True, related_name='menages_collectes', verbose_name="Enquêteur")
+    # Découpage fin, tiré du code grappe long (voir api/geo.py)
+    departement = models.ForeignKey(Departement, on_delete=models.SET_NULL, null=True, blank=True, related_name='menages', verbose_name="Département")
+    commune = models.ForeignKey(Commune, on_delete=models.SET_NULL, null=True, blank=True, related_name='menages', verbose_name="Commune")
+    grappe = models.ForeignKey(Grappe, on_delete=models.SET_NULL, null=True, blank=True, related_name='menages', verbose_name="Grappe")
 
     # Informations du ménage
     hh_trimestre = models.CharField(max_length=50, null=True, blank=True, verbose_name="HH Trimestre")
@@ -100,9 +142,206 @@ class Menage(models.Model):
     # Ceux-ci pourraient être dans un modèle séparé `MembreMenage` si nécessaire pour plus de détails.
     # Pour l'instant, nous nous concentrons sur le statut global du ménage.
 
+    # Empreinte de la ligne source normalisée (import incrémental)
+    source_hash = models.CharField(max_length=40, null=True, blank=True, editable=False, verbose_name="Empreinte source")
+
     def __str__(self):
         return f"Ménage {self.idmng} - {self.get_statut_menage_display()}"
 
     class Meta:
         verbose_name = "Ménage"
-        verbose_name_plural = "Ménages"
\ No newline at end of file
+        verbose_name_plural = "Ménages"
+        # Index alignés sur les filtres de MenageViewSet et des vues de statistiques
+        indexes = [
+            models.Index(fields=['region', 'statut_menage', 'idmng'], name='menage_region_statut_idx'),
+            models.Index(fields=['statut_menage', 'idmng'], name='menage_statut_idmng_idx'),
+            models.Index(fields=['tirage', 'is_rural'], name='menage_tirage_rural_idx'),
+            models.Index(fields=['enqueteur', 'date_enquete'], name='menage_enq_date_idx'),
+            models.Index(fields=['superviseur_code', 'idmng'], name='menage_sup_code_idx'),
+            models.Index(fields=['date_enquete', 'idmng'], name='menage_date_idmng_idx'),
+            # Index partiel : ménages attendus (tirage=1), agrégés par région/milieu
+            models.Index(
+                fields=['region', 'is_rural'], name='menage_attendu_idx',
+                condition=models.Q(tirage=1),
+            ),
+        ]
+
+# Libellés des statuts, pour les lectures rapides par .values() (liste, export)
+STATUT_MENAGE_LABELS = dict(Menage.STATUT_MENAGE_CHOICES)
+
+
+class StatsCounter(models.Model):
+    """
+    Compteur matérialisé du nombre de ménages par (région, statut, milieu, tirage).
+    Maintenu incrémentalement à chaque écriture sur `Menage` (voir api/signals.py)
+    et lot par lot par `import_data`.
+    """
+    region = models.ForeignKey(Region, on_delete=models.CASCADE, related_name='stats_counters', verbose_name="Région (DR)")
+    statut_menage = models.IntegerField(choices=Menage.STATUT_MENAGE_CHOICES, verbose_name="Statut du Ménage")
+    is_rural = models.BooleanField(default=False, verbose_name="Milieu Rural")
+    tirage = models.IntegerField(null=True, blank=True, verbose_name="Tirage (1 si attendu)")
+    count = models.PositiveIntegerField(default=0, verbose_name="Nombre de ménages")
+
+    def __str__(self):
+        return f"{self.region_id} / {self.get_statut_menage_display()} / rural={self.is_rural} / tirage={self.tirage}: {self.count}"
+
+    class Meta:
+        verbose_name = "Compteur statistique"
+        verbose_name_plural = "Compteurs statistiques"
+        constraints = [
+            models.UniqueConstraint(fields=['region', 'statut_menage', 'is_rural', 'tirage'], name='unique_stats_counter'),
+        ]
+
+
+class DailyCounter(models.Model):
+    """
+    Nombre de ménages par (date d'enquête, région, enquêteur, statut), pour les
+    séries temporelles de /api/stats/timeline/. Seuls les ménages ayant une
+    date d'enquête sont comptés. Maintenu comme `StatsCounter` (api/counters.py).
+    """
+    date_enquete = models.DateField(verbose_name="Date de l'enquête")
+    region = models.ForeignKey(Region, on_delete=models.CASCADE, related_name='daily_counters', verbose_name="Région (DR)")
+    enqueteur = models.ForeignKey(Enqueteur, on_delete=models.SET_NULL, null=True, blank=True, related_name='daily_counters', verbose_name="Enquêteur")
+    statut_menage = models.IntegerField(choices=Menage.STATUT_MENAGE_CHOICES, verbose_name="Statut du Ménage")
+    count = models.PositiveIntegerField(default=0, verbose_name="Nombre de ménages")
+
+    def __str__(self):
+        return f"{self.date_enquete} / {self.region_id} / {self.enqueteur_id} / {self.get_statut_menage_display()}: {self.count}"
+
+    class Meta:
+        verbose_name = "Compteur journalier"
+        verbose_name_plural = "Compteurs journaliers"
+        constraints = [
+            models.UniqueConstraint(fields=['date_enquete', 'region', 'enqueteur', 'statut_menage'], name='unique_daily_counter'),
+        ]
+        indexes = [
+            models.Index(fields=['date_enquete', 'region'], name='daily_counter_date_idx'),
+        ]
+
+
+class GeoCounter(models.Model):
+    """
+    Nombre de ménages par nœud de la hiérarchie géographique (région,
+    département, commune, grappe), statut et tirage, pour /api/stats/tree/.
+    `parent` est le code du nœud parent : les enfants d'un nœud se lisent par
+    l'index (niveau, parent). Maintenu comme `StatsCounter` (api/counters.py).
+    """
+    NIVEAU_REGION = 'region'
+    NIVEAU_DEPARTEMENT = 'departement'
+    NIVEAU_COMMUNE = 'commune'
+    NIVEAU_GRAPPE = 'grappe'
+    NIVEAU_CHOICES = [
+        (NIVEAU_REGION, "Région (DR)"),
+        (NIVEAU_DEPARTEMENT, "Département"),
+        (NIVEAU_COMMUNE, "Commune"),
+        (NIVEAU_GRAPPE, "Grappe"),
+    ]
+
+    niveau = models.CharField(max_length=12, choices=NIVEAU_CHOICES, verbose_name="Niveau")
+    code = models.CharField(max_length=50, verbose_name="Code du nœud")
+    parent = models.CharField(max_length=50, null=True, blank=True, verbose_name="Code du parent")
+    statut_menage = models.IntegerField(choices=Menage.STATUT_MENAGE_CHOICES, verbose_name="Statut du Ménage")
+    tirage = models.IntegerField(null=True, blank=True, verbose_name="Tirage (1 si attendu)")
+    count = models.PositiveIntegerField(default=0, verbose_name="Nombre de ménages")
+
+    def __str__(self):
+        return f"{self.niveau} {self.code} / {self.get_statut_menage_display()} / tirage={self.tirage}: {self.count}"
+
+    class Meta:
+        verbose_name = "Compteur géographique"
+        verbose_name_plural = "Compteurs géographiques"
+        constraints = [
+            models.UniqueConstraint(fields=['niveau', 'code', 'statut_menage', 'tirage'], name='unique_geo_counter'),
+        ]
+        indexes = [
+            models.Index(fields=['niveau', 'parent'], name='geo_counter_parent_idx'),
+        ]
+
+
+class DataVersion(models.Model):
+    """
+    Version des données servies par l'API (ligne unique), qui versionne les
+    réponses en cache (api/cache.py) quand le backend de cache est propre au
+    processus (locmem) : en base pour être commune à tous les processus
+    (workers web, imports, exécutants) ; changée dans la transaction de
+    l'écriture qui modifie les données. Avec un cache partagé, la version est
+    stockée dans le cache.
+    """
+    PK = 1
+
+    version = models.CharField(max_length=32, verbose_name="Version")
+    modifie_le = models.DateTimeField(verbose_name="Dernière modification")
+
+    def __str__(self):
+        return f"{self.version} ({self.modifie_le})"
+
+    class Meta:
+        verbose_name = "Version des données"
+        verbose_name_plural = "Version des données"
+
+
+class ImportJob(models.Model):
+    """
+    Import de fichiers CSV exécuté en arrière-plan (voir api/imports.py), ou
+    par `manage.py import_data`, avec son avancement. Au plus un import peut
+    être en cours à la fois : la contrainte `un_seul_import_en_cours` sert de
+    verrou, commun à tous les processus.
+    """
+    STATUT_EN_ATTENTE = 'en_attente'
+    STATUT_EN_COURS = 'en_cours'
+    STATUT_TERMINE = 'termine'
+    STATUT_ECHEC = 'echec'
+    STATUT_CHOICES = [
+        (STATUT_EN_ATTENTE, "En attente"),
+        (STATUT_EN_COURS, "En cours"),
+        (STATUT_TERMINE, "Terminé"),
+        (STATUT_ECHEC, "Échec"),
+    ]
+
+    SOURCE_API = 'api'
+    SOURCE_COMMANDE = 'commande'
+    SOURCE_CHOICES = [
+        (SOURCE_API, "Fichiers envoyés à /api/imports/"),
+        (SOURCE_COMMANDE, "manage.py import_data"),
+    ]
+
+    statut = models.CharField(max_length=12, choices=STATUT_CHOICES, default=STATUT_EN_ATTENTE, verbose_name="Statut")
+    source = models.CharField(max_length=10, choices=SOURCE_CHOICES, default=SOURCE_API, verbose_name="Origine")
+    info_gen_path = models.CharField(max_length=500, verbose_name="Fichier INFO_GEN")
+    info_men_record_path = models.CharField(max_length=500, verbose_name="Fichier INFO_MEN_RECORD")
+    incremental = models.BooleanField(default=False, verbose_name="Import incrémental")
+    delete_missing = models.BooleanField(default=False, verbose_name="Suppression des ménages absents")
+    cree_par = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True, related_name='imports',
+        verbose_name="Créé par",
+    )
+
+    cree_le = models.DateTimeField(auto_now_add=True, verbose_name="Créé le")
+    debut = models.DateTimeField(null=True, blank=True, verbose_name="Début")
+    fin = models.DateTimeField(null=True, blank=True, verbose_name="Fin")
+    mis_a_jour = models.DateTimeField(null=True, blank=True, verbose_name="Dernier avancement")
+    hote = models.CharField(max_length=255, blank=True, verbose_name="Machine d'exécution")
+    pid = models.PositiveIntegerField(null=True, blank=True, verbose_name="Processus d'exécution")
+
+    phase = models.CharField(max_length=30, blank=True, verbose_name="Étape en cours")
+    lignes_lues = models.PositiveIntegerField(default=0, verbose_name="Ménages lus")
+    lignes_ecrites = models.PositiveIntegerField(default=0, verbose_name="Ménages écrits")
+    lignes_par_seconde = models.FloatField(default=0, verbose_name="Débit (lignes/s)")
+    erreurs = models.JSONField(default=list, blank=True, verbose_name="Erreurs")
+    resultat = models.JSONField(default=dict, blank=True, verbose_name="Résultat")
+
+    def __str__(self):
+        return f"Import #{self.pk} ({self.get_statut_display()})"
+
+    class Meta:
+        verbose_name = "Import"
+        verbose_name_plural = "Imports"
+        ordering = ['-cree_le', '-pk']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['statut'], condition=models.Q(statut='en_cours'), name='un_seul_import_en_cours',
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['statut', 'cree_le'], name='import_job_statut_idx'),
+        ]
@@ -0,0 +1,225 @@
+# api/pagination.py
+"""
+Pagination par curseur (keyset) pour la liste des ménages, et version
+asynchrone de la pagination par numéro de page (`apaginate_queryset`).
+
+Contrairement à la pagination par numéro de page, aucune page ne fait de
+COUNT(*) ni d'OFFSET : chaque page filtre sur la dernière clé vue
+(`WHERE (date_enquete, idmng) > (...)`), donc la page 10 000 coûte le même
+prix que la page 1.
+"""
+import base64
+import hashlib
+import json
+
+from django.core.paginator import InvalidPage
+from django.db.models import F, Q
+from django.utils.dateparse import parse_date
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from .asgi import gather_queries
+from .cache import get_cache, get_data_version, get_timeout
+from .fieldsets import FIELDS_PARAM, OMIT_PARAM
+
+
+class MenageCursorPagination(BasePagination):
+    """
+    `?pagination=cursor` sur /api/menages/.
+
+    - `ordering=idmng` (défaut) ou `ordering=date_enquete` (puis idmng) ;
+    - `cursor=` : jeton opaque renvoyé dans `next` / `previous` ;
+    - `with_count=1` : ajoute le total, mis en cache jusqu'au prochain
+      changement des données.
+    """
+    page_size = 10
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    cursor_query_param = 'cursor'
+    ordering_query_param = 'ordering'
+    count_query_param = 'with_count'
+
+    ORDERINGS = {
+        'idmng': ('idmng',),
+        'date_enquete': ('date_enquete', 'idmng'),
+    }
+    # Champs pouvant être NULL : triés en dernier (NULLS LAST)
+    NULLABLE_FIELDS = {'date_enquete'}
+    PARSERS = {'date_enquete': parse_date}
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params.get(self.page_size_query_param, self.page_size))
+        except (TypeError, ValueError):
+            return self.page_size
+        return min(max(size, 1), self.max_page_size)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        ordering = request.query_params.get(self.ordering_query_param, 'idmng')
+        if ordering not in self.ORDERINGS:
+            raise ValidationError({self.ordering_query_param: f"Valeurs possibles: {', '.join(self.ORDERINGS)}"})
+        self.fields = self.ORDERINGS[ordering]
+        self.page_size = self.get_page_size(request)
+
+        self.count = None
+        if request.query_params.get(self.count_query_param) in ('1', 'true'):
+            self.count = self.get_cached_count(queryset, request)
+
+        cursor = self.decode_cursor(request)
+        reverse = bool(cursor and cursor['r'])
+        if cursor:
+            queryset = queryset.filter(self.keyset_filter(cursor['v'], reverse))
+        queryset = queryset.order_by(*self.order_by(reverse))
+
+        rows = list(queryset[:self.page_size + 1])
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        if reverse:
+            rows.reverse()
+
+        self.has_next = has_more if not reverse else True
+        self.has_previous = bool(cursor) if not reverse else has_more
+        self.rows = rows
+        return rows
+
+    def get_paginated_response(self, data):
+        payload = {'next': self.get_next_link(), 'previous': self.get_previous_link()}
+        if self.count is not None:
+            payload['count'] = self.count
+        payload['results'] = data
+        return Response(payload)
+
+    # --- Curseur ---
+
+    def get_next_link(self):
+        if not self.has_next or not self.rows:
+            return None
+        return self.build_link(self.rows[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.rows:
+            return remove_query_param(self.request.build_absolute_uri(), self.cursor_query_param)
+        return self.build_link(self.rows[0], reverse=True)
+
+    def build_link(self, row, reverse):
+        values = [self.get_value(row, field) for field in self.fields]
+        payload = json.dumps({'v': [v.isoformat() if hasattr(v, 'isoformat') else v for v in values], 'r': reverse})
+        token = base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii')
+        return replace_query_param(self.request.build_absolute_uri(), self.cursor_query_param, token)
+
+    def decode_cursor(self, request):
+        token = request.query_params.get(self.cursor_query_param)
+        if not token:
+            return None
+        try:
+            cursor = json.loads(base64.urlsafe_b64decode(token.encode('ascii')).decode('utf-8'))
+            values = cursor['v']
+            if len(values) != len(self.fields):
+                raise ValueError
+            cursor['v'] = [
+                self.PARSERS[field](value) if value is not None and field in self.PARSERS else value
+                for field, value in zip(self.fields, values)
+            ]
+            cursor['r'] = bool(cursor.get('r'))
+            return cursor
+        except (TypeError, ValueError, KeyError, UnicodeError):
+            raise NotFound("Curseur invalide.")
+
+    @staticmethod
+    def get_value(row, field):
+        return row[field] if isinstance(row, dict) else getattr(row, field)
+
+    # --- Conditions SQL ---
+
+    def order_by(self, reverse):
+        expressions = []
+        for field in self.fields:
+            if field in self.NULLABLE_FIELDS:
+                expressions.append(F(field).desc(nulls_first=True) if reverse else F(field).asc(nulls_last=True))
+            else:
+                expressions.append(F(field).desc() if reverse else F(field).asc())
+        return expressions
+
+    def keyset_filter(self, values, reverse):
+        """Condition lexicographique "(champs) > (valeurs)" (ou "<" en sens inverse)."""
+        condition = None
+        for i in reversed(range(len(self.fields))):
+            field, value = self.fields[i], values[i]
+            step = self.before(field, value) if reverse else self.after(field, value)
+            condition = step if condition is None else step | (self.equal(field, value) & condition)
+        return condition
+
+    def after(self, field, value):
+        nullable = field in self.NULLABLE_FIELDS
+        if value is None:
+            # NULLS LAST : rien n'est après NULL
+            return Q(pk__in=[])
+        condition = Q(**{f"{field}__gt": value})
+        return (condition | Q(**{f"{field}__isnull": True})) if nullable else condition
+
+    def before(self, field, value):
+        nullable = field in self.NULLABLE_FIELDS
+        if value is None:
+            return Q(**{f"{field}__isnull": False}) if nullable else Q(pk__in=[])
+        return Q(**{f"{field}__lt": value})
+
+    @staticmethod
+    def equal(field, value):
+        return Q(**{f"{field}__isnull": True}) if value is None else Q(**{field: value})
+
+    # --- Total ---
+
+    def get_cached_count(self, queryset, request):
+        """COUNT(*) mis en cache par version des données et par jeu de filtres."""
+        params = sorted(
+            (key, value) for key, value in request.query_params.lists()
+            if key not in (
+                self.cursor_query_param, self.page_size_query_param, self.ordering_query_param,
+                FIELDS_PARAM, OMIT_PARAM,
+            )
+        )
+        version, _ = get_data_version()
+        signature = hashlib.md5(json.dumps(params).encode('utf-8')).hexdigest()
+        cache = get_cache()
+        key = f"api:count:{version}:{signature}"
+        count = cache.get(key)
+        if count is None:
+            count = queryset.count()
+            cache.set(key, count, get_timeout())
+        return count
+
+
+async def apaginate_queryset(pagination, queryset, request):
+    """
+    Équivalent asynchrone de `PageNumberPagination.paginate_queryset` (même
+    réponse ensuite via `pagination.get_paginated_response`). Pour un numéro de
+    page explicite, le COUNT(*) et la lecture de la page partent en même temps ;
+    `page=last` ou un numéro invalide attendent le total.
+    """
+    pagination.request = request
+    page_size = pagination.get_page_size(request)
+    if not page_size:
+        return None
+    paginator = pagination.django_paginator_class(queryset, page_size)
+    page_number = request.query_params.get(pagination.page_query_param) or 1
+    rows = None
+    if str(page_number).isdigit() and int(page_number) >= 1:
+        offset = (int(page_number) - 1) * page_size
+        paginator.count, rows = await gather_queries(queryset.count, lambda: list(queryset[offset:offset + page_size]))
+    else:
+        paginator.count = await queryset.acount()
+        page_number = pagination.get_page_number(request, paginator)
+    try:
+        page = paginator.page(page_number)
+    except InvalidPage as exc:
+        raise NotFound(pagination.invalid_page_message.format(page_number=page_number, message=str(exc)))
+    if rows is None:
+        rows = [row async for row in page.object_list]
+    page.object_list = rows
+    pagination.page = page
+    return rows
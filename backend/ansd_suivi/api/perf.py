@@ -0,0 +1,294 @@
+# api/perf.py
+"""
+Instrumentation des requêtes HTTP (activée par API_PERF_ENABLED=True).
+
+Pour chaque requête, le middleware mesure le temps total, le nombre et la
+durée des requêtes SQL, le temps de sérialisation (serializers DRF) et de
+rendu, puis :
+- ajoute un en-tête `Server-Timing` (visible dans l'onglet Réseau du navigateur) ;
+- écrit une ligne JSON sur le logger `api.perf` ;
+- conserve la mesure dans un tampon circulaire en mémoire, résumé par
+  l'endpoint admin `/api/_perf/` (endpoints et requêtes SQL les plus lents).
+
+Une même requête SQL (aux paramètres près) exécutée au moins
+API_PERF_DUPLICATE_THRESHOLD fois dans une requête HTTP est signalée comme
+un probable N+1.
+
+Désactivé, le middleware se retire de la chaîne (MiddlewareNotUsed), les
+serializers DRF ne sont pas chronométrés et `perf_section` ne coûte qu'une
+lecture de variable de contexte. Le middleware fonctionne en mode synchrone
+et asynchrone : sous ASGI, il ne fait pas passer les vues asynchrones par un
+thread.
+"""
+import json
+import logging
+import math
+import re
+import threading
+import time
+from collections import Counter, defaultdict, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+logger = logging.getLogger('api.perf')
+
+_current = ContextVar('api_perf_record', default=None)
+_buffer_lock = threading.Lock()
+_buffer = deque(maxlen=getattr(settings, 'API_PERF_BUFFER_SIZE', 500))
+
+# "IN (%s, %s, %s)" -> "IN (%s, ...)" pour regrouper les requêtes de même forme
+_IN_LIST = re.compile(r'\((?:%s, )+%s\)')
+SLOWEST_QUERIES_PER_REQUEST = 5
+
+
+def normalize_sql(sql):
+    return _IN_LIST.sub('(%s, ...)', sql)
+
+
+@contextmanager
+def perf_section(name):
+    """Ajoute la durée du bloc à la section `name` de la requête en cours (si instrumentée)."""
+    record = _current.get()
+    if record is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record.sections[name] += time.perf_counter() - start
+
+
+def install_serializer_timing():
+    """
+    Chronomètre `.data` de tous les serializers DRF dans la section "serializer".
+    Installé par PerfMiddleware, donc seulement avec API_PERF_ENABLED=True.
+    """
+    from rest_framework.serializers import BaseSerializer
+
+    untimed = BaseSerializer.data
+    if hasattr(untimed.fget, 'untimed'):
+        return
+
+    def data(self):
+        with perf_section('serializer'):
+            return untimed.fget(self)
+    data.untimed = untimed
+    BaseSerializer.data = property(data)
+
+
+def record_query(execute, sql, params, many, context):
+    # Enveloppe connection.execute_wrapper : mesure la requête SQL si une requête HTTP est instrumentée
+    record = _current.get()
+    if record is None:
+        return execute(sql, params, many, context)
+    return record(execute, sql, params, many, context)
+
+
+def wrap_connection(connection, **kwargs):
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+def wrap_connections():
+    """Installe `record_query` sur les connexions du thread (ou contexte asynchrone) courant."""
+    for connection in connections.all():
+        wrap_connection(connection)
+
+
+def install_query_recording():
+    """
+    Les connexions Django sont propres à chaque thread : sous ASGI, l'ORM appelé via
+    sync_to_async utilise celles de son thread. `record_query` est donc posé sur toute
+    nouvelle connexion (`connection_created`) et lit la requête HTTP en cours dans la
+    variable de contexte, que sync_to_async propage.
+    """
+    wrap_connections()
+    connection_created.connect(wrap_connection, dispatch_uid='api.perf.record_query')
+
+
+def percentile(sorted_values, p):
+    """Percentile `p` (0-100) par interpolation linéaire sur une liste triée."""
+    if not sorted_values:
+        return None
+    rank = (len(sorted_values) - 1) * p / 100
+    low, high = math.floor(rank), math.ceil(rank)
+    return sorted_values[low] + (sorted_values[high] - sorted_values[low]) * (rank - low)
+
+
+class RequestRecord:
+    """Mesures d'une requête HTTP en cours."""
+
+    def __init__(self):
+        self.queries = []  # (sql normalisé, durée en s)
+        self.sections = defaultdict(float)
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append((normalize_sql(sql), time.perf_counter() - start))
+
+    @property
+    def db_time(self):
+        return sum(duration for _, duration in self.queries)
+
+    def duplicates(self, threshold):
+        counts = Counter(sql for sql, _ in self.queries)
+        return {sql: count for sql, count in counts.items() if count >= threshold}
+
+
+def get_buffer():
+    with _buffer_lock:
+        return list(_buffer)
+
+
+def clear_buffer():
+    with _buffer_lock:
+        _buffer.clear()
+
+
+def server_timing(entry):
+    parts = [f'db;dur={entry["db_ms"]};desc="{entry["queries"]} SQL"']
+    for name, duration in entry['sections'].items():
+        parts.append(f'{name};dur={duration}')
+    parts.append(f'total;dur={entry["total_ms"]}')
+    return ', '.join(parts)
+
+
+class PerfMiddleware:
+    """Mesure chaque requête (voir la docstring du module)."""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'API_PERF_ENABLED', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.threshold = getattr(settings, 'API_PERF_DUPLICATE_THRESHOLD', 5)
+        self.prefixes = tuple(getattr(settings, 'API_PERF_PATH_PREFIXES', ['/api/']))
+        install_serializer_timing()
+        install_query_recording()
+        self.thread_connections_wrapped = False
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not self.is_measured(request):
+            return self.get_response(request)
+        start = time.perf_counter()
+        with self.recording() as record:
+            response = self.get_response(request)
+        return self.finish(request, response, record, time.perf_counter() - start)
+
+    async def __acall__(self, request):
+        if not self.is_measured(request):
+            return await self.get_response(request)
+        if not self.thread_connections_wrapped:
+            # Connexions déjà ouvertes du thread de sync_to_async (les suivantes passent par connection_created)
+            await sync_to_async(wrap_connections)()
+            self.thread_connections_wrapped = True
+        start = time.perf_counter()
+        with self.recording() as record:
+            response = await self.get_response(request)
+        return self.finish(request, response, record, time.perf_counter() - start)
+
+    def is_measured(self, request):
+        return request.path.startswith(self.prefixes) and not request.path.startswith('/api/_perf/')
+
+    @contextmanager
+    def recording(self):
+        record = RequestRecord()
+        token = _current.set(record)
+        try:
+            wrap_connections()
+            yield record
+        finally:
+            _current.reset(token)
+
+    def finish(self, request, response, record, total):
+        entry = self.build_entry(request, response, record, total)
+        response['Server-Timing'] = server_timing(entry)
+        logger.info(json.dumps(entry, ensure_ascii=False))
+        with _buffer_lock:
+            _buffer.append(entry)
+        return response
+
+    def process_template_response(self, request, response):
+        # Les réponses DRF sont rendues après la vue : on chronomètre le rendu
+        record = _current.get()
+        if record is not None:
+            start = time.perf_counter()
+
+            def rendered(response):
+                record.sections['render'] += time.perf_counter() - start
+            response.add_post_render_callback(rendered)
+        return response
+
+    def build_entry(self, request, response, record, total):
+        match = getattr(request, 'resolver_match', None)
+        slowest = sorted(record.queries, key=lambda q: q[1], reverse=True)[:SLOWEST_QUERIES_PER_REQUEST]
+        return {
+            'method': request.method,
+            'path': request.get_full_path(),
+            'route': match.view_name if match and match.view_name else request.path,
+            'status': response.status_code,
+            'total_ms': round(total * 1000, 2),
+            'db_ms': round(record.db_time * 1000, 2),
+            'queries': len(record.queries),
+            'sections': {name: round(duration * 1000, 2) for name, duration in record.sections.items()},
+            'duplicates': record.duplicates(self.threshold),
+            'slowest_queries': [{'sql': sql, 'ms': round(duration * 1000, 2)} for sql, duration in slowest],
+        }
+
+
+def summarize_buffer(entries, limit=20):
+    """Résumé du tampon : endpoints par p95 décroissant, requêtes SQL les plus lentes, N+1 récents."""
+    by_route = defaultdict(list)
+    for entry in entries:
+        by_route[(entry['method'], entry['route'])].append(entry)
+
+    endpoints = []
+    for (method, route), items in by_route.items():
+        totals = sorted(item['total_ms'] for item in items)
+        endpoints.append({
+            'method': method,
+            'route': route,
+            'count': len(items),
+            'p50_ms': round(percentile(totals, 50), 2),
+            'p95_ms': round(percentile(totals, 95), 2),
+            'max_ms': totals[-1],
+            'avg_queries': round(sum(item['queries'] for item in items) / len(items), 1),
+            'avg_db_ms': round(sum(item['db_ms'] for item in items) / len(items), 2),
+        })
+    endpoints.sort(key=lambda e: e['p95_ms'], reverse=True)
+
+    queries = {}
+    for entry in entries:
+        for query in entry['slowest_queries']:
+            stats = queries.setdefault(query['sql'], {'sql': query['sql'], 'count': 0, 'max_ms': 0, 'total_ms': 0})
+            stats['count'] += 1
+            stats['max_ms'] = max(stats['max_ms'], query['ms'])
+            stats['total_ms'] = round(stats['total_ms'] + query['ms'], 2)
+    slow_queries = sorted(queries.values(), key=lambda q: q['max_ms'], reverse=True)[:limit]
+
+    n_plus_one = [
+        {'path': entry['path'], 'duplicates': entry['duplicates']}
+        for entry in reversed(entries) if entry['duplicates']
+    ][:limit]
+
+    return {
+        'requests': len(entries),
+        'endpoints': endpoints[:limit],
+        'slow_queries': slow_queries,
+        'n_plus_one': n_plus_one,
+    }
@@ -0,0 +1,78 @@
+# api/renderers.py
+"""
+Formats de réponse compacts, au choix du client (`?format=` ou en-tête Accept),
+en plus du JSON habituel :
+
+- `columnar` (application/vnd.ansd.columnar+json) : toute liste d'objets ayant
+  les mêmes clés devient {"colonnes": {"champ": [valeurs...], ...}} ; les
+  noms de champs ne sont plus répétés à chaque ligne ;
+- `msgpack` (application/msgpack) : MessagePack, si le paquet `msgpack` est
+  installé (facultatif, `pip install msgpack`).
+
+Voir `benchmark_payloads` (api/benchmark.py) pour la taille et le temps
+d'encodage de chaque format.
+"""
+from django.core.serializers.json import DjangoJSONEncoder
+from rest_framework import renderers
+
+try:
+    import msgpack
+except ImportError:  # format MessagePack facultatif
+    msgpack = None
+
+COLUMNS_KEY = 'colonnes'
+
+
+def to_columns(data):
+    """Convertit récursivement les listes d'objets homogènes en colonnes."""
+    if isinstance(data, dict):
+        return {key: to_columns(value) for key, value in data.items()}
+    if isinstance(data, (list, tuple)):
+        if data and isinstance(data[0], dict) and data[0]:
+            keys = data[0].keys()
+            if all(isinstance(item, dict) and item.keys() == keys for item in data):
+                return {COLUMNS_KEY: {key: to_columns([item[key] for item in data]) for key in keys}}
+        if any(isinstance(item, (dict, list, tuple)) for item in data):
+            return [to_columns(item) for item in data]
+    return data
+
+
+def from_columns(data):
+    """Inverse de `to_columns` (pour les clients Python et les tests)."""
+    if isinstance(data, dict):
+        if data.keys() == {COLUMNS_KEY}:
+            columns = {key: from_columns(values) for key, values in data[COLUMNS_KEY].items()}
+            return [dict(zip(columns, row)) for row in zip(*columns.values())]
+        return {key: from_columns(value) for key, value in data.items()}
+    if isinstance(data, list):
+        return [from_columns(item) for item in data]
+    return data
+
+
+class ColumnarJSONRenderer(renderers.JSONRenderer):
+    media_type = 'application/vnd.ansd.columnar+json'
+    format = 'columnar'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return super().render(to_columns(data), accepted_media_type, renderer_context)
+
+
+def msgpack_default(value):
+    """Dates, décimaux, UUID... encodés comme dans les réponses JSON."""
+    return DjangoJSONEncoder().default(value)
+
+
+def packb(data):
+    return msgpack.packb(data, default=msgpack_default, use_bin_type=True)
+
+
+class MessagePackRenderer(renderers.BaseRenderer):
+    media_type = 'application/msgpack'
+    format = 'msgpack'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return packb(data)
@@ -0,0 +1,180 @@
+# api/search.py
+"""
+Index de recherche plein texte des ménages (`?search=` sur /api/menages/).
+
+Chaque ménage a un document normalisé (minuscules, sans accents) regroupant
+idmng, nom du chef de ménage, adresse, téléphone et nom de l'enquêteur :
+- SQLite : table virtuelle FTS5 `api_menage_fts` (index inversé, recherche
+  par préfixe de mots), dont le rowid est l'identifiant entier du ménage dans
+  `api_menage_fts_ids` : les documents sont retirés par rowid, sans parcourir
+  l'index (une colonne UNINDEXED n'est pas indexée) ;
+- PostgreSQL : table `api_menage_search` avec un index GIN trigrammes
+  (pg_trgm), qui accélère les `LIKE '%terme%'` ;
+- autres bases : même table, sans index.
+
+Les tables sont créées par les migrations 0006 et 0010. L'index est tenu à jour par les
+signaux (écritures unitaires) et, lot par lot, par `import_data` (voir
+`index_menages` ; `rebuild_search_index` reconstruit tout l'index).
+"""
+import re
+import threading
+import unicodedata
+from contextlib import contextmanager
+
+from django.db import connection, transaction
+from django.db.models.expressions import RawSQL
+from rest_framework.filters import BaseFilterBackend
+
+from .models import Menage
+
+FTS_TABLE = 'api_menage_fts'
+FTS_IDS_TABLE = 'api_menage_fts_ids'
+TRIGRAM_TABLE = 'api_menage_search'
+INDEX_BATCH_SIZE = 2000
+MIN_TRIGRAM_TERM = 3
+
+_state = threading.local()
+_WORD = re.compile(r'\w+')
+
+
+def normalize(text):
+    """Minuscules sans accents : "Ndèye" -> "ndeye"."""
+    decomposed = unicodedata.normalize('NFKD', text or '')
+    return ''.join(c for c in decomposed if not unicodedata.combining(c)).lower()
+
+
+def build_document(idmng, nom_cm, adresse, telephone, nom_enqueteur):
+    """Texte indexé d'un ménage ; le téléphone est aussi indexé sans séparateurs."""
+    telephone = telephone or ''
+    parts = [idmng, nom_cm, adresse, telephone, re.sub(r'\D', '', telephone), nom_enqueteur]
+    return normalize(' '.join(part for part in parts if part))
+
+
+def search_terms(query):
+    return _WORD.findall(normalize(query))
+
+
+def uses_fts():
+    return connection.vendor == 'sqlite'
+
+
+def table_name():
+    return FTS_TABLE if uses_fts() else TRIGRAM_TABLE
+
+
+def indexing_enabled():
+    return not getattr(_state, 'suspended', False)
+
+
+@contextmanager
+def indexing_suspended():
+    """Suspend la mise à jour unitaire de l'index (import en masse, qui réindexe à la fin)."""
+    previous = getattr(_state, 'suspended', False)
+    _state.suspended = True
+    try:
+        yield
+    finally:
+        _state.suspended = previous
+
+
+def search_filter(query):
+    """
+    Expression utilisable dans `.filter(pk__in=...)` : identifiants des ménages
+    contenant tous les mots de `query` (préfixes de mots avec FTS5, sous-chaînes
+    avec les trigrammes). Retourne None si la recherche est vide.
+    """
+    terms = search_terms(query)
+    if not terms:
+        return None
+    if uses_fts():
+        match = ' '.join(f'"{term}"*' for term in terms)
+        return RawSQL(f'SELECT idmng FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s', [match])
+    # Les termes trop courts ne profitent pas de l'index trigrammes : on les ignore
+    # s'il existe un terme plus long.
+    long_terms = [term for term in terms if len(term) >= MIN_TRIGRAM_TERM] or terms
+    conditions = ' AND '.join(['document LIKE %s'] * len(long_terms))
+    return RawSQL(
+        f'SELECT idmng FROM {TRIGRAM_TABLE} WHERE {conditions}',
+        [f'%{term}%' for term in long_terms],
+    )
+
+
+def filter_search(queryset, query):
+    expression = search_filter(query)
+    return queryset if expression is None else queryset.filter(pk__in=expression)
+
+
+class MenageSearchFilter(BaseFilterBackend):
+    """`?search=` : recherche plein texte dans l'index (nom, adresse, téléphone, enquêteur)."""
+    search_param = 'search'
+
+    def filter_queryset(self, request, queryset, view):
+        return filter_search(queryset, request.query_params.get(self.search_param, ''))
+
+
+def _documents(queryset):
+    rows = queryset.values_list('idmng', 'nom_cm', 'adresse', 'telephone1', 'enqueteur__nom_enqueteur')
+    for row in rows.order_by().iterator(chunk_size=INDEX_BATCH_SIZE):
+        yield row[0], build_document(*row)
+
+
+def _write(rows):
+    if not rows:
+        return
+    with connection.cursor() as cursor:
+        if not uses_fts():
+            cursor.executemany(f'INSERT INTO {TRIGRAM_TABLE} (idmng, document) VALUES (%s, %s)', rows)
+            return
+        cursor.executemany(f'INSERT OR IGNORE INTO {FTS_IDS_TABLE} (idmng) VALUES (%s)', [(idmng,) for idmng, _ in rows])
+        cursor.executemany(
+            f'INSERT INTO {FTS_TABLE} (rowid, idmng, document) SELECT id, idmng, %s FROM {FTS_IDS_TABLE} WHERE idmng = %s',
+            [(document, idmng) for idmng, document in rows],
+        )
+
+
+def delete_sql(count):
+    """Suppression des documents de `count` ménages (paramètres : leurs idmng)."""
+    placeholders = ', '.join(['%s'] * count)
+    if uses_fts():
+        return f'DELETE FROM {FTS_TABLE} WHERE rowid IN (SELECT id FROM {FTS_IDS_TABLE} WHERE idmng IN ({placeholders}))'
+    return f'DELETE FROM {TRIGRAM_TABLE} WHERE idmng IN ({placeholders})'
+
+
+def remove_from_index(idmngs):
+    idmngs = list(idmngs)
+    for start in range(0, len(idmngs), INDEX_BATCH_SIZE):
+        chunk = idmngs[start:start + INDEX_BATCH_SIZE]
+        with connection.cursor() as cursor:
+            cursor.execute(delete_sql(len(chunk)), chunk)
+            if uses_fts():
+                cursor.execute(f'DELETE FROM {FTS_IDS_TABLE} WHERE idmng IN ({", ".join(["%s"] * len(chunk))})', chunk)
+
+
+def index_menages(idmngs):
+    """(Ré)indexe les ménages `idmngs` (les identifiants absents de la base sont retirés de l'index)."""
+    idmngs = list(idmngs)
+    for start in range(0, len(idmngs), INDEX_BATCH_SIZE):
+        chunk = idmngs[start:start + INDEX_BATCH_SIZE]
+        with transaction.atomic():
+            remove_from_index(chunk)
+            _write(list(_documents(Menage.objects.filter(idmng__in=chunk))))
+
+
+def rebuild_search_index():
+    """Reconstruit entièrement l'index ; retourne le nombre de ménages indexés."""
+    count = 0
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {table_name()}')
+            if uses_fts():
+                cursor.execute(f'DELETE FROM {FTS_IDS_TABLE}')
+        batch = []
+        for row in _documents(Menage.objects.all()):
+            batch.append(row)
+            if len(batch) >= INDEX_BATCH_SIZE:
+                _write(batch)
+                count += len(batch)
+                batch = []
+        _write(batch)
+        count += len(batch)
+    return count
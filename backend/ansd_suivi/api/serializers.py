@@ -1,6 +1,9 @@
 # api/serializers.py
 from rest_framework import serializers
-from .models import Region, Superviseur, Enqueteur, Menage
+from .models import Region, Superviseur, Enqueteur, Menage, ImportJob, STATUT_MENAGE_LABELS
+from .bulk import BULK_MAX_ROWS, BULK_UPDATE_FIELDS
+from .perf import perf_section
+
 
 class RegionSerializer(serializers.ModelSerializer):
     class Meta:
@@ -19,7 +22,66 @@ class EnqueteurSerializer(serializers.ModelSerializer):
         model = Enqueteur
         fields = ['login_enq', 'nom_enqueteur', 'superviseur_id']
 
+# --- Projection des champs des ménages (?fields= / ?omit=, voir api/fieldsets.py) ---
+# Champ de sortie -> (chemin ORM pour .values() / .only(), conversion éventuelle),
+# pour tous les champs lisibles de MenageSerializer, dans son ordre. Les sorties
+# construites à partir de cette table sont identiques à `.data`.
+
+def _isoformat(value):
+    return value.isoformat() if value is not None else None
+
+
+def _statut_label(value):
+    return STATUT_MENAGE_LABELS.get(value, str(value))
+
+
+MENAGE_VALUE_FIELDS = {
+    'idmng': ('idmng', None),
+    'region_nom': ('region__nom_region', None),
+    'superviseur_code': ('superviseur_code', None),
+    'enqueteur_nom': ('enqueteur__nom_enqueteur', None),
+    'hh_trimestre': ('hh_trimestre', None),
+    'cons_code': ('cons_code', None),
+    'num_men_csv': ('num_men_csv', None),
+    'nom_cc': ('nom_cc', None),
+    'nom_cm': ('nom_cm', None),
+    'statut_menage': ('statut_menage', None),
+    'statut_menage_display': ('statut_menage', _statut_label),
+    'tirage': ('tirage', None),
+    'adresse': ('adresse', None),
+    'telephone1': ('telephone1', None),
+    'taille_men': ('taille_men', None),
+    'nbr_eligible': ('nbr_eligible', None),
+    'date_enquete': ('date_enquete', _isoformat),
+    'heure_debut_enquete': ('heure_debut_enquete', _isoformat),
+    'heure_fin_enquete': ('heure_fin_enquete', _isoformat),
+    'observations': ('observations', None),
+    'is_rural': ('is_rural', None),
+}
+MENAGE_DETAIL_FIELDS = list(MENAGE_VALUE_FIELDS)
+
+# Colonnes toujours lues par la liste : clés de tri de la pagination par curseur
+MENAGE_VALUE_KEYS = ('idmng', 'date_enquete')
+
+
+def menage_values_queryset(queryset, fields):
+    """`.values()` limité aux colonnes (et jointures) nécessaires à `fields`."""
+    paths = dict.fromkeys(MENAGE_VALUE_KEYS + tuple(MENAGE_VALUE_FIELDS[name][0] for name in fields))
+    return queryset.values(*paths)
+
+
+def serialize_menage_values(rows, fields):
+    """Dicts de sortie (champs `fields`) pour des lignes de menage_values_queryset()."""
+    columns = [(name, *MENAGE_VALUE_FIELDS[name]) for name in fields]
+    with perf_section('serializer'):
+        return [
+            {name: convert(row[path]) if convert else row[path] for name, path, convert in columns}
+            for row in rows
+        ]
+
+
 class MenageSerializer(serializers.ModelSerializer):
+    """`fields=[...]` (facultatif) limite les champs lisibles renvoyés."""
     region_nom = serializers.CharField(source='region.nom_region', read_only=True)
     enqueteur_nom = serializers.CharField(source='enqueteur.nom_enqueteur', read_only=True, allow_null=True)
     statut_menage_display = serializers.CharField(source='get_statut_menage_display', read_only=True)
@@ -39,6 +101,20 @@ class MenageSerializer(serializers.ModelSerializer):
             'region': {'write_only': True}, 
             'enqueteur': {'write_only': True, 'required': False, 'allow_null': True},
         }
+
+    def __init__(self, *args, fields=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for name in [name for name, field in self.fields.items() if not field.write_only and name not in fields]:
+                self.fields.pop(name)
+
+    @staticmethod
+    def narrow_queryset(queryset, fields):
+        """`.only()` des colonnes nécessaires à `fields`, jointures limitées à celles utilisées."""
+        paths = [MENAGE_VALUE_FIELDS[name][0] for name in fields]
+        related = [fk for fk in ('region', 'enqueteur') if any(path.startswith(fk + '__') for path in paths)]
+        return queryset.select_related(None).select_related(*related).only('idmng', *related, *paths)
+
         
 class MenageListSerializer(serializers.ModelSerializer):
     """Serializer simplifié pour les listes"""
@@ -48,4 +124,77 @@ class MenageListSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Menage
-        fields = ['idmng', 'nom_cm', 'region_nom', 'statut_menage_display', 'enqueteur_nom', 'date_enquete']
\ No newline at end of file
+        fields = ['idmng', 'nom_cm', 'region_nom', 'statut_menage_display', 'enqueteur_nom', 'date_enquete']
+
+    # --- Lecture rapide ---
+    # La liste n'a besoin que de six colonnes : on les lit par .values() (jointures
+    # comprises) et on construit les dicts directement, sans instancier de Menage
+    # ni passer par les champs DRF. Le résultat est identique à `.data`.
+    # `fields` remplace les six champs par défaut (tout champ de MENAGE_VALUE_FIELDS).
+
+    @classmethod
+    def values_queryset(cls, queryset, fields=None):
+        return menage_values_queryset(queryset, fields or cls.Meta.fields)
+
+    @classmethod
+    def serialize_values(cls, rows, fields=None):
+        """Équivalent de `MenageListSerializer(..., many=True).data` pour des lignes de values_queryset()."""
+        return serialize_menage_values(rows, fields or cls.Meta.fields)
+
+
+class MenageBulkChangesSerializer(serializers.ModelSerializer):
+    """Modifications appliquées à tous les ménages d'une mise à jour en masse."""
+    class Meta:
+        model = Menage
+        fields = list(BULK_UPDATE_FIELDS)
+        extra_kwargs = {field: {'required': False} for field in BULK_UPDATE_FIELDS}
+
+    def to_internal_value(self, data):
+        inconnus = set(data) - set(BULK_UPDATE_FIELDS) if isinstance(data, dict) else set()
+        if inconnus:
+            raise serializers.ValidationError(f"Champs non modifiables en masse: {', '.join(sorted(inconnus))}.")
+        return super().to_internal_value(data)
+
+    def validate(self, attrs):
+        if not attrs:
+            raise serializers.ValidationError(f"Au moins un champ parmi: {', '.join(BULK_UPDATE_FIELDS)}.")
+        return attrs
+
+
+class MenageBulkUpdateSerializer(serializers.Serializer):
+    """Corps de POST /api/menages/bulk/ : `idmng` (liste) ou `filter` (mêmes filtres que la liste), et `changes`."""
+    idmng = serializers.ListField(
+        child=serializers.CharField(max_length=50), required=False, allow_empty=False, max_length=BULK_MAX_ROWS,
+    )
+    filter = serializers.DictField(required=False, allow_empty=False)
+    changes = MenageBulkChangesSerializer()
+
+    def validate(self, attrs):
+        if ('idmng' in attrs) == ('filter' in attrs):
+            raise serializers.ValidationError("Fournir soit `idmng`, soit `filter`.")
+        return attrs
+
+
+class ImportJobSerializer(serializers.ModelSerializer):
+    """Import en arrière-plan (voir api/imports.py) : état et avancement."""
+    class Meta:
+        model = ImportJob
+        fields = [
+            'id', 'statut', 'source', 'phase', 'incremental', 'delete_missing',
+            'cree_le', 'debut', 'fin', 'mis_a_jour',
+            'lignes_lues', 'lignes_ecrites', 'lignes_par_seconde', 'erreurs', 'resultat',
+        ]
+        read_only_fields = fields
+
+
+class ImportJobCreateSerializer(serializers.Serializer):
+    """Corps multipart de POST /api/imports/ : les deux fichiers CSV et les options d'import_data."""
+    info_gen = serializers.FileField()
+    info_men_record = serializers.FileField()
+    incremental = serializers.BooleanField(default=False)
+    delete_missing = serializers.BooleanField(default=False)
+
+    def validate(self, attrs):
+        if attrs['delete_missing'] and not attrs['incremental']:
+            raise serializers.ValidationError("`delete_missing` n'a de sens qu'avec `incremental`.")
+        return attrs
@@ -0,0 +1,126 @@
+# api/signals.py
+"""
+Signaux qui maintiennent les compteurs (`StatsCounter`, `DailyCounter`) et
+l'index de recherche à jour lors des écritures unitaires sur `Menage` (API,
+admin, shell), préviennent le flux /api/stats/stream/, et invalident le
+cache des réponses API à chaque écriture sur les données de suivi.
+"""
+from django.db import transaction
+from django.db.models import Q
+from django.db.models.signals import pre_save, post_save, pre_delete, post_delete
+from django.dispatch import receiver
+
+from .cache import bump_data_version
+from .counters import DAILY_COUNTERS, ROLLUP_FIELDS, CounterDeltas, counters_enabled
+from .models import Region, Superviseur, Enqueteur, Menage
+from .search import index_menages, indexing_enabled, remove_from_index
+from .stream import notify_stats_changed
+
+
+@receiver(pre_save, sender=Menage)
+def menage_pre_save(sender, instance, raw=False, **kwargs):
+    instance._counter_values_before = None
+    if raw or not counters_enabled() or instance.pk is None:
+        return
+    instance._counter_values_before = Menage.objects.filter(pk=instance.pk).values(*ROLLUP_FIELDS).first()
+
+
+@receiver(post_save, sender=Menage)
+def menage_post_save(sender, instance, created=False, raw=False, **kwargs):
+    if raw or not counters_enabled():
+        return
+    deltas = CounterDeltas()
+    before = getattr(instance, '_counter_values_before', None)
+    if before is not None:
+        deltas.add(before, -1)
+    deltas.add(instance, 1)
+    deltas.apply()
+    notify_stats_changed()
+
+
+@receiver(post_delete, sender=Menage)
+def menage_post_delete(sender, instance, **kwargs):
+    if not counters_enabled():
+        return
+    deltas = CounterDeltas()
+    deltas.add(instance, -1)
+    deltas.apply()
+    notify_stats_changed()
+
+
+@receiver(post_delete, sender=Enqueteur)
+def enqueteur_post_delete(sender, instance, **kwargs):
+    # Les ménages (et compteurs journaliers) de l'enquêteur passent à NULL :
+    # les lignes "sans enquêteur" sont recalculées pour fusionner les doublons.
+    if not counters_enabled():
+        return
+    DAILY_COUNTERS.rebuild(Q(enqueteur_id=None))
+
+
+@receiver(post_save, sender=Menage)
+def menage_post_save_search(sender, instance, raw=False, **kwargs):
+    if raw or not indexing_enabled():
+        return
+    index_menages([instance.pk])
+
+
+@receiver(post_delete, sender=Menage)
+def menage_post_delete_search(sender, instance, **kwargs):
+    if not indexing_enabled():
+        return
+    remove_from_index([instance.pk])
+
+
+def renames_enqueteur(update_fields):
+    return update_fields is None or 'nom_enqueteur' in update_fields
+
+
+@receiver(pre_save, sender=Enqueteur)
+def enqueteur_pre_save_search(sender, instance, raw=False, update_fields=None, **kwargs):
+    instance._nom_before = None
+    if raw or instance._state.adding or not indexing_enabled() or not renames_enqueteur(update_fields):
+        return
+    instance._nom_before = Enqueteur.objects.filter(pk=instance.pk).values_list('nom_enqueteur', flat=True).first()
+
+
+@receiver(post_save, sender=Enqueteur)
+def enqueteur_post_save_search(sender, instance, created=False, raw=False, update_fields=None, **kwargs):
+    # Le nom de l'enquêteur fait partie du document indexé de ses ménages :
+    # réindexés seulement s'il change, une fois l'écriture validée
+    if raw or created or not indexing_enabled() or not renames_enqueteur(update_fields):
+        return
+    if getattr(instance, '_nom_before', None) == instance.nom_enqueteur:
+        return
+    login_enq = instance.pk
+    transaction.on_commit(lambda: index_menages(
+        Menage.objects.filter(enqueteur_id=login_enq).values_list('idmng', flat=True)
+    ))
+
+
+@receiver(pre_delete, sender=Enqueteur)
+def enqueteur_pre_delete_search(sender, instance, **kwargs):
+    # Ménages à réindexer une fois leur enquêteur passé à NULL
+    if not indexing_enabled():
+        return
+    instance._menages_to_reindex = list(instance.menages_collectes.values_list('idmng', flat=True))
+
+
+@receiver(post_delete, sender=Enqueteur)
+def enqueteur_post_delete_search(sender, instance, **kwargs):
+    if not indexing_enabled():
+        return
+    index_menages(getattr(instance, '_menages_to_reindex', []))
+
+
+@receiver(post_save, sender=Region)
+@receiver(post_save, sender=Superviseur)
+@receiver(post_save, sender=Enqueteur)
+@receiver(post_save, sender=Menage)
+@receiver(post_delete, sender=Region)
+@receiver(post_delete, sender=Superviseur)
+@receiver(post_delete, sender=Enqueteur)
+@receiver(post_delete, sender=Menage)
+def invalidate_api_cache(sender, raw=False, **kwargs):
+    if raw:
+        return
+    bump_data_version()
@@ -0,0 +1,563 @@
+# api/stats.py
+"""
+Service de calcul des statistiques de collecte, partagé par les vues API.
+
+Toutes les fonctions calculent leurs compteurs en une seule requête SQL
+(agrégation conditionnelle) au lieu d'un COUNT par indicateur. Sans filtre,
+les statistiques sont lues dans la table matérialisée `StatsCounter`
+(quelques dizaines de lignes) plutôt que dans `Menage`.
+"""
+import datetime
+import math
+from collections import deque
+
+from django.db.models import Avg, Count, DurationField, ExpressionWrapper, F, Q, Sum
+
+from .asgi import gather_queries
+from .geo import GEO_LEVELS, child_level
+from .models import Region, Menage, StatsCounter, DailyCounter, GeoCounter
+
+# Statuts considérés comme "collectés"
+STATUTS_COLLECTES = (Menage.STATUT_PARTIEL, Menage.STATUT_COMPLET)
+
+Q_ATTENDU = Q(tirage=1)
+Q_COLLECTE = Q(statut_menage__in=STATUTS_COLLECTES)
+
+
+def statut_key(code):
+    return f"statut_{code}"
+
+
+def get_aggregations():
+    """
+    Expressions d'agrégation conditionnelle : attendus / collectés (total et
+    rural) et un compteur par statut, évaluées en un seul passage sur la table.
+    """
+    aggregations = {
+        'attendus': Count('idmng', filter=Q_ATTENDU),
+        'attendus_rural': Count('idmng', filter=Q_ATTENDU & Q(is_rural=True)),
+        'collectes': Count('idmng', filter=Q_COLLECTE),
+        'collectes_rural': Count('idmng', filter=Q_COLLECTE & Q(is_rural=True)),
+    }
+    for code, _ in Menage.STATUT_MENAGE_CHOICES:
+        aggregations[statut_key(code)] = Count('idmng', filter=Q(statut_menage=code))
+    return aggregations
+
+
+def taux(numerateur, denominateur):
+    return round((numerateur / denominateur) * 100, 2) if denominateur > 0 else 0
+
+
+def build_repartition_statuts(counts_map):
+    """Liste ordonnée de tous les statuts possibles, avec 0 si absent."""
+    return [
+        {"statut_code": code, "statut_nom": nom, "count": counts_map.get(code, 0)}
+        for code, nom in sorted(Menage.STATUT_MENAGE_CHOICES)
+    ]
+
+
+def build_global_payload(counts):
+    """Construit la réponse de /stats/global/ à partir des compteurs agrégés."""
+    attendus = counts['attendus'] or 0
+    attendus_rural = counts['attendus_rural'] or 0
+    attendus_urbain = attendus - attendus_rural
+    collectes = counts['collectes'] or 0
+    collectes_rural = counts['collectes_rural'] or 0
+    collectes_urbain = collectes - collectes_rural
+
+    counts_map = {
+        code: counts.get(statut_key(code)) or 0
+        for code, _ in Menage.STATUT_MENAGE_CHOICES
+    }
+
+    return {
+        "menages_attendus": {
+            "total": attendus,
+            "rural": attendus_rural,
+            "urbain": attendus_urbain,
+        },
+        "menages_collectes": {
+            "total": collectes,
+            "rural": collectes_rural,
+            "urbain": collectes_urbain,
+        },
+        "taux_de_couverture": {
+            "global": taux(collectes, attendus),
+            "rural": taux(collectes_rural, attendus_rural),
+            "urbain": taux(collectes_urbain, attendus_urbain),
+        },
+        "repartition_statuts": build_repartition_statuts(counts_map),
+    }
+
+
+def get_counter_rows():
+    """Lignes non nulles de la table `StatsCounter`."""
+    return StatsCounter.objects.filter(count__gt=0).values(
+        'region_id', 'statut_menage', 'is_rural', 'tirage', 'count'
+    )
+
+
+def sum_counter_rows(rows):
+    """Agrège en Python des lignes de compteurs, avec les mêmes clés que `get_aggregations()`."""
+    counts = dict.fromkeys(get_aggregations(), 0)
+    for row in rows:
+        n = row['count']
+        if row['tirage'] == 1:
+            counts['attendus'] += n
+            if row['is_rural']:
+                counts['attendus_rural'] += n
+        if row['statut_menage'] in STATUTS_COLLECTES:
+            counts['collectes'] += n
+            if row['is_rural']:
+                counts['collectes_rural'] += n
+        key = statut_key(row['statut_menage'])
+        if key in counts:
+            counts[key] += n
+    return counts
+
+
+def compute_global_stats(queryset=None):
+    """
+    Statistiques globales (attendus, collectés, taux de couverture, répartition
+    par statut) en une seule requête : sur les compteurs matérialisés par
+    défaut, ou sur `queryset` (agrégation conditionnelle) s'il est fourni.
+    """
+    if queryset is None:
+        counts = sum_counter_rows(get_counter_rows())
+    else:
+        counts = queryset.aggregate(**get_aggregations())
+    return build_global_payload(counts)
+
+
+async def acompute_global_stats(queryset=None):
+    """Version asynchrone de `compute_global_stats` (ORM asynchrone)."""
+    if queryset is None:
+        counts = sum_counter_rows([row async for row in get_counter_rows()])
+    else:
+        counts = await queryset.aaggregate(**get_aggregations())
+    return build_global_payload(counts)
+
+
+# group_by -> (champ de regroupement, champ libellé, clé code, clé libellé)
+GROUP_BY_FIELDS = {
+    'region': ('region_id', 'region__nom_region', 'code_dr', 'nom_region'),
+    'superviseur': ('superviseur_code', None, 'id_superviseur', None),
+    'enqueteur': ('enqueteur_id', 'enqueteur__nom_enqueteur', 'login_enq', 'nom_enqueteur'),
+    'cons_code': ('cons_code', None, 'cons_code', None),
+}
+
+
+def build_group_entry(group_by, code, nom, attendus, counts_map):
+    _, _, code_key, nom_key = GROUP_BY_FIELDS[group_by]
+    collectes = sum(counts_map.get(statut, 0) for statut in STATUTS_COLLECTES)
+    entry = {code_key: code}
+    if nom_key:
+        entry[nom_key] = nom
+    entry.update({
+        "menages_attendus": attendus,
+        "menages_collectes": collectes,
+        "taux_de_couverture": taux(collectes, attendus),
+        "repartition_statuts": build_repartition_statuts(counts_map),
+    })
+    return entry
+
+
+def get_grouped_rows(group_by, queryset=None):
+    """Agrégation groupée par (groupe, statut_menage), avec les attendus de chaque couple."""
+    key_field, nom_field, _, _ = GROUP_BY_FIELDS[group_by]
+    if queryset is None:
+        queryset = Menage.objects.all()
+    values_fields = [key_field, 'statut_menage'] + ([nom_field] if nom_field else [])
+    return (
+        queryset.values(*values_fields)
+        .annotate(count=Count('idmng'), attendus=Count('idmng', filter=Q_ATTENDU))
+        .order_by()
+    )
+
+
+def get_region_names():
+    return Region.objects.order_by('code_dr').values_list('code_dr', 'nom_region')
+
+
+def pivot_counter_rows(rows):
+    """Lignes de `StatsCounter` regroupées par DR : {code: {'nom', 'attendus', 'statuts'}}."""
+    groups = {}
+    for row in rows:
+        group = groups.setdefault(row['region_id'], {'nom': None, 'attendus': 0, 'statuts': {}})
+        if row['tirage'] == 1:
+            group['attendus'] += row['count']
+        statuts = group['statuts']
+        statuts[row['statut_menage']] = statuts.get(row['statut_menage'], 0) + row['count']
+    return groups
+
+
+def pivot_grouped_rows(group_by, rows):
+    """Lignes de `get_grouped_rows` regroupées par code : {code: {'nom', 'attendus', 'statuts'}}."""
+    key_field, nom_field, _, _ = GROUP_BY_FIELDS[group_by]
+    groups = {}
+    for row in rows:
+        code = row[key_field]
+        group = groups.setdefault(code, {'nom': row.get(nom_field), 'attendus': 0, 'statuts': {}})
+        group['attendus'] += row['attendus']
+        group['statuts'][row['statut_menage']] = row['count']
+    return groups
+
+
+def build_grouped_payload(group_by, groups, region_names=None):
+    """
+    Réponse de /stats/regions/ ; `region_names` (code, nom) ajoute les DR sans
+    ménage, avec des compteurs à 0.
+    """
+    for code, nom in region_names or ():
+        group = groups.setdefault(code, {'nom': None, 'attendus': 0, 'statuts': {}})
+        group['nom'] = nom
+    return [
+        build_group_entry(group_by, code, group['nom'], group['attendus'], group['statuts'])
+        for code, group in sorted(groups.items(), key=lambda item: (item[0] is None, item[0] or ''))
+    ]
+
+
+def compute_grouped_stats(group_by='region', queryset=None):
+    """
+    Statistiques par groupe (région, superviseur, enquêteur ou code CONS).
+
+    Une seule agrégation groupée par (groupe, statut_menage) est exécutée puis
+    pivotée en Python : le nombre de requêtes ne dépend pas du nombre de groupes.
+    Pour les régions, la liste de référence est lue en plus afin que les DR
+    sans ménage apparaissent avec des compteurs à 0, et les comptes viennent
+    des compteurs matérialisés lorsqu'aucun `queryset` n'est fourni.
+    """
+    if group_by not in GROUP_BY_FIELDS:
+        raise ValueError(f"group_by invalide: {group_by}")
+    if group_by == 'region' and queryset is None:
+        groups = pivot_counter_rows(get_counter_rows())
+    else:
+        groups = pivot_grouped_rows(group_by, get_grouped_rows(group_by, queryset))
+    region_names = get_region_names() if group_by == 'region' else None
+    return build_grouped_payload(group_by, groups, region_names)
+
+
+async def acompute_grouped_stats(group_by='region', queryset=None):
+    """
+    Version asynchrone de `compute_grouped_stats` : pour les régions, les
+    compteurs et la liste des DR sont lus en même temps (`gather_queries`).
+    """
+    if group_by not in GROUP_BY_FIELDS:
+        raise ValueError(f"group_by invalide: {group_by}")
+    if group_by != 'region':
+        rows = [row async for row in get_grouped_rows(group_by, queryset)]
+        return build_grouped_payload(group_by, pivot_grouped_rows(group_by, rows))
+    if queryset is None:
+        rows, region_names = await gather_queries(
+            lambda: list(get_counter_rows()), lambda: list(get_region_names()),
+        )
+        groups = pivot_counter_rows(rows)
+    else:
+        rows, region_names = await gather_queries(
+            lambda: list(get_grouped_rows(group_by, queryset)), lambda: list(get_region_names()),
+        )
+        groups = pivot_grouped_rows(group_by, rows)
+    return build_grouped_payload(group_by, groups, region_names)
+
+
+# --- Séries temporelles (table DailyCounter) ---
+
+TIMELINE_GROUP_BY = {
+    # group_by -> (champ de regroupement, champ libellé, clé code, clé libellé)
+    'total': (None, None, None, None),
+    'region': ('region_id', 'region__nom_region', 'code_dr', 'nom_region'),
+    'enqueteur': ('enqueteur_id', 'enqueteur__nom_enqueteur', 'login_enq', 'nom_enqueteur'),
+}
+TIMELINE_MAX_DAYS = 731
+
+
+def get_attendus_by_region():
+    """Ménages attendus par DR, lus dans les compteurs matérialisés."""
+    rows = (
+        StatsCounter.objects.filter(tirage=1).values('region_id')
+        .annotate(total=Sum('count')).order_by()
+    )
+    return {row['region_id']: row['total'] for row in rows}
+
+
+def build_projection(attendus, collectes, rythme, date_fin_serie):
+    """Date de fin projetée au rythme `rythme` (ménages collectés par jour)."""
+    reste = max(attendus - collectes, 0)
+    date_fin = None
+    if reste == 0:
+        date_fin = date_fin_serie
+    elif rythme > 0:
+        date_fin = date_fin_serie + datetime.timedelta(days=math.ceil(reste / rythme))
+    return {
+        "menages_attendus": attendus,
+        "menages_collectes": collectes,
+        "reste": reste,
+        "rythme_journalier": round(rythme, 2),
+        "date_fin_projetee": date_fin.isoformat() if date_fin else None,
+    }
+
+
+def compute_timeline(group_by='region', date_from=None, date_to=None, window=7):
+    """
+    Ménages collectés (complets + partiels) par jour, lus dans `DailyCounter` :
+    série journalière continue, cumul (depuis le début de la collecte),
+    moyenne mobile sur `window` jours et, par DR ou au total, date de fin
+    projetée au rythme de la moyenne mobile du dernier jour.
+
+    Le coût dépend du nombre de jours et de groupes, pas du nombre de ménages.
+    """
+    if group_by not in TIMELINE_GROUP_BY:
+        raise ValueError(f"group_by invalide: {group_by}")
+    key_field, nom_field, code_key, nom_key = TIMELINE_GROUP_BY[group_by]
+    group_fields = [f for f in (key_field, nom_field) if f]
+
+    collectes = DailyCounter.objects.filter(statut_menage__in=STATUTS_COLLECTES)
+    in_range = collectes
+    if date_from:
+        in_range = in_range.filter(date_enquete__gte=date_from)
+    if date_to:
+        in_range = in_range.filter(date_enquete__lte=date_to)
+
+    groups = {}
+    rows = (
+        in_range.values(*group_fields, 'date_enquete', 'statut_menage')
+        .annotate(total=Sum('count')).order_by()
+    )
+    for row in rows:
+        group = groups.setdefault(row.get(key_field), {'nom': row.get(nom_field), 'jours': {}, 'avant': 0})
+        jour = group['jours'].setdefault(row['date_enquete'], {'complets': 0, 'partiels': 0})
+        jour['complets' if row['statut_menage'] == Menage.STATUT_COMPLET else 'partiels'] += row['total']
+
+    if date_from:
+        # Collectés avant la période : point de départ des cumuls
+        avant = collectes.filter(date_enquete__lt=date_from)
+        if group_fields:
+            rows = avant.values(*group_fields).annotate(total=Sum('count')).order_by()
+        else:
+            rows = [avant.aggregate(total=Sum('count'))]
+        for row in rows:
+            if row['total']:
+                group = groups.setdefault(row.get(key_field), {'nom': row.get(nom_field), 'jours': {}, 'avant': 0})
+                group['avant'] = row['total']
+
+    jours = [jour for group in groups.values() for jour in group['jours']]
+    date_from = date_from or (min(jours) if jours else None)
+    date_to = date_to or (max(jours) if jours else None)
+    dates = []
+    if date_from and date_to:
+        dates = [date_from + datetime.timedelta(days=i) for i in range((date_to - date_from).days + 1)]
+
+    attendus = None
+    if group_by == 'region':
+        attendus = get_attendus_by_region()
+    elif group_by == 'total':
+        attendus = {None: sum(get_attendus_by_region().values())}
+
+    series = []
+    for code, group in sorted(groups.items(), key=lambda item: (item[0] is None, item[0] or '')):
+        points = []
+        cumul = group['avant']
+        fenetre = deque(maxlen=window)
+        for date in dates:
+            jour = group['jours'].get(date, {'complets': 0, 'partiels': 0})
+            total = jour['complets'] + jour['partiels']
+            cumul += total
+            fenetre.append(total)
+            points.append({
+                "date": date.isoformat(),
+                "complets": jour['complets'],
+                "partiels": jour['partiels'],
+                "collectes": total,
+                "cumul": cumul,
+                "moyenne_mobile": round(sum(fenetre) / len(fenetre), 2),
+            })
+        entry = {}
+        if code_key:
+            entry[code_key] = code
+        if nom_key:
+            entry[nom_key] = group['nom']
+        entry["points"] = points
+        if attendus is not None and dates:
+            entry["projection"] = build_projection(
+                attendus.get(code, 0), cumul, points[-1]["moyenne_mobile"], date_to,
+            )
+        series.append(entry)
+
+    return {
+        "group_by": group_by,
+        "from": date_from.isoformat() if date_from else None,
+        "to": date_to.isoformat() if date_to else None,
+        "window": window,
+        "series": series,
+    }
+
+
+# --- Classements enquêteurs / superviseurs ---
+
+# group_by -> {champ de regroupement ou libellé: clé de sortie} (le premier est l'identifiant)
+LEADERBOARD_GROUP_BY = {
+    'enqueteur': {
+        'enqueteur_id': 'login_enq',
+        'enqueteur__nom_enqueteur': 'nom_enqueteur',
+        'enqueteur__superviseur_id': 'id_superviseur',
+    },
+    'superviseur': {
+        'superviseur_code': 'id_superviseur',
+    },
+}
+LEADERBOARD_ORDERING = (
+    'menages_attendus', 'menages_collectes', 'complets', 'partiels', 'refus',
+    'taux_de_couverture', 'duree_moyenne_minutes',
+)
+
+
+def compute_leaderboard(group_by):
+    """
+    Indicateurs de productivité par enquêteur ou par superviseur, en une seule
+    agrégation groupée : attendus, collectés (complets, partiels), refus, taux
+    de couverture et durée moyenne d'entretien des ménages collectés (heures
+    de début et de fin renseignées, fin après début).
+    """
+    if group_by not in LEADERBOARD_GROUP_BY:
+        raise ValueError(f"group_by invalide: {group_by}")
+    fields = LEADERBOARD_GROUP_BY[group_by]
+    key_field = next(iter(fields))
+
+    duree = ExpressionWrapper(F('heure_fin_enquete') - F('heure_debut_enquete'), output_field=DurationField())
+    rows = (
+        Menage.objects.filter(**{f"{key_field}__isnull": False})
+        .values(*fields)
+        .annotate(
+            attendus=Count('idmng', filter=Q_ATTENDU),
+            complets=Count('idmng', filter=Q(statut_menage=Menage.STATUT_COMPLET)),
+            partiels=Count('idmng', filter=Q(statut_menage=Menage.STATUT_PARTIEL)),
+            refus=Count('idmng', filter=Q(statut_menage=Menage.STATUT_REFUS)),
+            duree_moyenne=Avg(duree, filter=Q_COLLECTE & Q(heure_fin_enquete__gt=F('heure_debut_enquete'))),
+        )
+        .order_by()
+    )
+    entries = []
+    for row in rows:
+        entry = {output: row[field] for field, output in fields.items()}
+        collectes = row['complets'] + row['partiels']
+        entry.update({
+            "menages_attendus": row['attendus'],
+            "menages_collectes": collectes,
+            "complets": row['complets'],
+            "partiels": row['partiels'],
+            "refus": row['refus'],
+            "taux_de_couverture": taux(collectes, row['attendus']),
+            "duree_moyenne_minutes": (
+                round(row['duree_moyenne'].total_seconds() / 60, 1) if row['duree_moyenne'] is not None else None
+            ),
+        })
+        entries.append(entry)
+    return entries
+
+
+def sort_leaderboard(entries, ordering):
+    """Trie les entrées selon `ordering` (ex: "-taux_de_couverture") ; les valeurs absentes en dernier."""
+    field = ordering.lstrip('-')
+    descending = ordering.startswith('-')
+    with_value = [entry for entry in entries if entry[field] is not None]
+    without_value = [entry for entry in entries if entry[field] is None]
+    # Tri stable : à valeur égale, ordre par identifiant
+    with_value.sort(key=lambda entry: str(next(iter(entry.values()))))
+    with_value.sort(key=lambda entry: entry[field], reverse=descending)
+    return with_value + without_value
+
+
+# --- Arborescence géographique (table GeoCounter) ---
+
+def build_tree_entry(code, nom, attendus, counts_map):
+    collectes = sum(counts_map.get(statut, 0) for statut in STATUTS_COLLECTES)
+    return {
+        "code": code,
+        "nom": nom,
+        "menages_attendus": attendus,
+        "menages_collectes": collectes,
+        "taux_de_couverture": taux(collectes, attendus),
+        "repartition_statuts": build_repartition_statuts(counts_map),
+    }
+
+
+def sum_geo_rows(rows):
+    """{code: (attendus, {statut: count})} à partir de lignes GeoCounter."""
+    totals = {}
+    for code, statut, tirage, count in rows:
+        entry = totals.setdefault(code, [0, {}])
+        if tirage == 1:
+            entry[0] += count
+        entry[1][statut] = entry[1].get(statut, 0) + count
+    return totals
+
+
+def get_geo_path(niveau, code):
+    """
+    Nœuds de la racine jusqu'au nœud (niveau, code) inclus :
+    [{"niveau", "code", "nom"}, ...], lus en une requête. LookupError si inconnu.
+    """
+    # Chemin de jointure vers la région, ex: grappe -> "commune__departement__region"
+    fks, level = [], niveau
+    while GEO_LEVELS[level][3]:
+        fks.append(GEO_LEVELS[level][3])
+        level = GEO_LEVELS[level][2]
+    model = GEO_LEVELS[niveau][0]
+    queryset = model.objects.filter(pk=code)
+    if fks:
+        queryset = queryset.select_related('__'.join(fks))
+    node = queryset.first()
+    if node is None:
+        raise LookupError(code)
+
+    path, level = [], niveau
+    while node is not None:
+        _, nom_field, parent_level, parent_fk = GEO_LEVELS[level]
+        path.insert(0, {"niveau": level, "code": node.pk, "nom": getattr(node, nom_field) if nom_field else None})
+        node = getattr(node, parent_fk) if parent_fk else None
+        level = parent_level
+    return path
+
+
+def compute_tree(niveau=None, code=None):
+    """
+    Couverture d'un nœud de la hiérarchie (national si `niveau` est None) et de
+    ses enfants directs, lue dans les compteurs géographiques : chaque lecture
+    passe par l'index (niveau, code) ou (niveau, parent). Les enfants sans
+    ménage figurent avec des compteurs à 0.
+    """
+    enfant = child_level(niveau)
+    counters = GeoCounter.objects.values_list('code', 'statut_menage', 'tirage', 'count')
+    if niveau is None:
+        path = []
+        noeud = {"niveau": "national", "code": None, "nom": None}
+        enfants_rows = sum_geo_rows(counters.filter(niveau=enfant, count__gt=0))
+        totals = [0, {}]
+        for attendus, statuts in enfants_rows.values():
+            totals[0] += attendus
+            for statut, count in statuts.items():
+                totals[1][statut] = totals[1].get(statut, 0) + count
+    else:
+        path = get_geo_path(niveau, code)
+        noeud = path.pop()
+        totals = sum_geo_rows(counters.filter(niveau=niveau, code=code, count__gt=0)).get(code, [0, {}])
+        enfants_rows = sum_geo_rows(counters.filter(niveau=enfant, parent=code, count__gt=0)) if enfant else {}
+
+    enfants = []
+    if enfant:
+        model, nom_field, _, parent_fk = GEO_LEVELS[enfant]
+        queryset = model.objects.order_by()
+        if parent_fk:
+            queryset = queryset.filter(**{f"{parent_fk}_id": code})
+        if nom_field:
+            noms = dict(queryset.values_list('pk', nom_field))
+        else:
+            noms = dict.fromkeys(queryset.values_list('pk', flat=True))
+        for child_code in sorted(set(noms) | set(enfants_rows)):
+            attendus, statuts = enfants_rows.get(child_code, (0, {}))
+            enfants.append(build_tree_entry(child_code, noms.get(child_code), attendus, statuts))
+
+    payload = {"niveau": noeud["niveau"], "chemin": path}
+    payload.update(build_tree_entry(noeud["code"], noeud["nom"], *totals))
+    payload.update({"niveau_enfants": enfant, "enfants": enfants})
+    return payload
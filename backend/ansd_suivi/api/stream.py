@@ -0,0 +1,203 @@
+# api/stream.py
+"""
+Flux Server-Sent Events des variations de compteurs (/api/stats/stream/).
+
+Un seul `StatsBroadcaster` par processus (servi via ansd_suivi/asgi.py) lit
+les compteurs `StatsCounter` regroupés, calcule l'écart avec la lecture
+précédente et envoie le même message à tous les tableaux de bord connectés :
+une lecture par changement, quel que soit le nombre de clients.
+
+Un changement est détecté :
+- immédiatement, lorsque les signaux ou un import du même processus appellent
+  `notify_stats_changed()` ;
+- sinon au plus tard après `STATS_STREAM_POLL_INTERVAL` secondes (écritures
+  faites par un autre processus, ex: `manage.py import_data`).
+
+Messages envoyés (`data` en JSON) :
+- `snapshot` à la connexion : [[code_dr, statut, is_rural, tirage, count], ...]
+- `deltas` ensuite : [[code_dr, statut, is_rural, tirage, +/-count], ...]
+"""
+import asyncio
+import json
+import threading
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Sum
+from django.http import HttpResponse, StreamingHttpResponse
+
+from .models import StatsCounter
+
+SSE_QUEUE_SIZE = 100
+# Délai de reconnexion indiqué au client EventSource (ms)
+SSE_RETRY_MS = 5000
+
+
+def get_poll_interval():
+    return getattr(settings, 'STATS_STREAM_POLL_INTERVAL', 2.0)
+
+
+def get_heartbeat_interval():
+    return getattr(settings, 'STATS_STREAM_HEARTBEAT', 15.0)
+
+
+def read_counters():
+    """Compteurs non nuls : {(code_dr, statut, is_rural, tirage): count}."""
+    rows = (
+        StatsCounter.objects.filter(count__gt=0)
+        .values_list('region_id', 'statut_menage', 'is_rural', 'tirage')
+        .annotate(total=Sum('count')).order_by()
+    )
+    return {row[:4]: row[4] for row in rows}
+
+
+def compute_deltas(before, after):
+    """Écarts entre deux lectures, triés : [[code_dr, statut, is_rural, tirage, delta], ...]."""
+    deltas = []
+    for key in sorted(set(before) | set(after), key=str):
+        delta = after.get(key, 0) - before.get(key, 0)
+        if delta:
+            deltas.append([*key, delta])
+    return deltas
+
+
+def format_event(event, data, event_id=None):
+    lines = [f'event: {event}']
+    if event_id is not None:
+        lines.append(f'id: {event_id}')
+    lines.append('data: ' + json.dumps(data, separators=(',', ':')))
+    return '\n'.join(lines) + '\n\n'
+
+
+def snapshot_event(counters, event_id=None):
+    rows = [[*key, count] for key, count in sorted(counters.items(), key=str)]
+    return f'retry: {SSE_RETRY_MS}\n' + format_event('snapshot', rows, event_id)
+
+
+class StatsBroadcaster:
+    """
+    Diffuse les écarts de compteurs à des files asyncio (une par client).
+
+    La tâche de surveillance tourne dans la boucle d'événements du serveur
+    ASGI tant qu'au moins un client est abonné. `notify()` peut être appelé
+    depuis n'importe quel thread.
+    """
+
+    def __init__(self):
+        self.subscribers = set()
+        self.counters = None
+        self.event_id = 0
+        self._loop = None
+        self._wake = None
+        self._task = None
+        self._lock = threading.Lock()
+
+    def notify(self):
+        """Demande une relecture des compteurs (sans effet si aucun client n'est connecté)."""
+        with self._lock:
+            loop, wake = self._loop, self._wake
+        if loop is None or loop.is_closed():
+            return
+        try:
+            loop.call_soon_threadsafe(wake.set)
+        except RuntimeError:  # boucle fermée entre-temps
+            pass
+
+    async def subscribe(self):
+        """Nouvelle file client ; retourne (file, snapshot courant)."""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if self._loop is not loop:
+                # Première connexion (ou nouvelle boucle) : état repris de zéro
+                self._loop, self._wake, self._task = loop, asyncio.Event(), None
+                self.subscribers = set()
+        if not self.subscribers:
+            # Sans client, les compteurs n'étaient plus suivis : relecture
+            self.counters = await sync_to_async(read_counters)()
+        queue = asyncio.Queue(maxsize=SSE_QUEUE_SIZE)
+        self.subscribers.add(queue)
+        if self._task is None or self._task.done():
+            self._task = loop.create_task(self._watch())
+        return queue, self.counters
+
+    def unsubscribe(self, queue):
+        self.subscribers.discard(queue)
+        if not self.subscribers and self._wake is not None:
+            self._wake.set()  # laisse la tâche de surveillance se terminer
+
+    async def refresh(self):
+        """Relit les compteurs et diffuse l'écart ; retourne la liste des deltas."""
+        counters = await sync_to_async(read_counters)()
+        deltas = compute_deltas(self.counters or {}, counters)
+        self.counters = counters
+        if deltas:
+            self.event_id += 1
+            message = format_event('deltas', deltas, self.event_id)
+            for queue in list(self.subscribers):
+                try:
+                    queue.put_nowait(message)
+                except asyncio.QueueFull:
+                    # Client trop lent : déconnecté, il se reconnectera et recevra un snapshot
+                    self.subscribers.discard(queue)
+                    while not queue.empty():
+                        queue.get_nowait()
+                    queue.put_nowait(None)
+        return deltas
+
+    async def _watch(self):
+        while self.subscribers:
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=get_poll_interval())
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            if self.subscribers:
+                await self.refresh()
+
+
+broadcaster = StatsBroadcaster()
+
+
+def notify_stats_changed():
+    """À appeler après une écriture sur les ménages : relecture une fois la transaction validée."""
+    transaction.on_commit(broadcaster.notify)
+
+
+async def iter_events(queue, snapshot):
+    """Snapshot initial, puis deltas et commentaires de maintien de connexion."""
+    try:
+        yield snapshot
+        while True:
+            try:
+                message = await asyncio.wait_for(queue.get(), timeout=get_heartbeat_interval())
+            except asyncio.TimeoutError:
+                yield ': ping\n\n'
+                continue
+            if message is None:
+                return
+            yield message
+    finally:
+        broadcaster.unsubscribe(queue)
+
+
+def _no_cache(response):
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # pas de mise en tampon par nginx
+    return response
+
+
+async def stats_stream_response():
+    """Flux continu (serveur ASGI) : snapshot puis deltas diffusés par `broadcaster`."""
+    queue, counters = await broadcaster.subscribe()
+    return _no_cache(StreamingHttpResponse(
+        iter_events(queue, snapshot_event(counters, broadcaster.event_id)), content_type='text/event-stream',
+    ))
+
+
+def stats_snapshot_response():
+    """
+    Hors ASGI (runserver, gunicorn WSGI), un flux sans fin bloquerait un worker :
+    seul le snapshot est envoyé et EventSource se reconnecte après SSE_RETRY_MS.
+    """
+    return _no_cache(HttpResponse(snapshot_event(read_counters()), content_type='text/event-stream'))
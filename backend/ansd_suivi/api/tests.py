@@ -1,3 +1,1529 @@
-from django.test import TestCase
+import asyncio
+import csv
+import datetime
+import gzip
+import json
+import os
+import socket
+import sys
+import tempfile
+import threading
+from io import BytesIO, StringIO
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.db.models import Count, QuerySet
+from django.http import HttpResponse
+from asgiref.sync import async_to_sync, iscoroutinefunction, sync_to_async
+from django.test import AsyncClient, TestCase, TransactionTestCase, override_settings
+from unittest import mock, skipUnless
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.serializers import BaseSerializer
+from rest_framework.test import APIClient
+from rest_framework.throttling import BaseThrottle
+
+from .benchmark import benchmark_server_modes, percentile, summarize
+from .asgi import gather_queries, get_query_executor
+from .async_views import AsyncAPIView, AsyncGlobalStatsView, AsyncMenageListView, AsyncRegionStatsView
+from .cache import bump_data_version, get_cache
+from .compression import choose_encoding
+from .csv_join import external_sort, iter_missing, merge_join
+from .geo import ensure_geo_nodes
+from .imports import ImportAlreadyRunning, ImportProgress, recover_stale_jobs, run_next_job, start_job
+from .counters import DAILY_COUNTERS, STATS_COUNTERS, current_counters, diff_counters, recount, rebuild_counters
+from .models import Region, Departement, Commune, Grappe, Enqueteur, Menage, StatsCounter, DailyCounter, ImportJob
+from .perf import PerfMiddleware, RequestRecord, clear_buffer, get_buffer
+from .renderers import from_columns, msgpack, to_columns
+from .search import build_document, delete_sql, rebuild_search_index, remove_from_index, search_filter
+from .serializers import MENAGE_DETAIL_FIELDS, MenageListSerializer, MenageSerializer
+from .stats import acompute_global_stats
+from .stream import broadcaster, compute_deltas
+from .views import GlobalStatsAPIView, MenageViewSet
+
+
+class StatsTestMixin:
+    """Données de base communes aux tests des statistiques."""
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.dakar = Region.objects.create(code_dr='01', nom_region='DAKAR')
+        self.kolda = Region.objects.create(code_dr='10', nom_region='KOLDA')
+        self._seq = 0
+
+    def create_menages(self, n, region, statut, tirage=1, **extra):
+        menages = []
+        for _ in range(n):
+            self._seq += 1
+            menages.append(Menage(
+                idmng=f"M{self._seq:06d}", region=region, statut_menage=statut,
+                tirage=tirage, is_rural=region.nom_region not in ("DAKAR", "THIES"), **extra
+            ))
+        Menage.objects.bulk_create(menages)
+        # bulk_create ne déclenche pas les signaux, comme un import en masse
+        rebuild_counters()
+        bump_data_version()
+
+
+class GlobalStatsTests(StatsTestMixin, TestCase):
+
+    def test_global_stats_values(self):
+        self.create_menages(4, self.dakar, Menage.STATUT_COMPLET)
+        self.create_menages(2, self.dakar, Menage.STATUT_AFFECTE)
+        self.create_menages(3, self.kolda, Menage.STATUT_PARTIEL)
+        self.create_menages(1, self.kolda, Menage.STATUT_REFUS)
+        self.create_menages(2, self.kolda, Menage.STATUT_COMPLET, tirage=0)
+
+        data = self.client.get(reverse('global-stats')).json()
+
+        self.assertEqual(data['menages_attendus'], {'total': 10, 'rural': 4, 'urbain': 6})
+        self.assertEqual(data['menages_collectes'], {'total': 9, 'rural': 5, 'urbain': 4})
+        self.assertEqual(data['taux_de_couverture']['global'], 90.0)
+        counts = {s['statut_code']: s['count'] for s in data['repartition_statuts']}
+        self.assertEqual(len(counts), len(Menage.STATUT_MENAGE_CHOICES))
+        self.assertEqual(counts[Menage.STATUT_COMPLET], 6)
+        self.assertEqual(counts[Menage.STATUT_NON_AFFECTE], 0)
+
+    def test_global_stats_single_query(self):
+        for n in (1, 10, 100):
+            self.create_menages(n, self.dakar, Menage.STATUT_COMPLET)
+            self.create_menages(n, self.kolda, Menage.STATUT_REFUS)
+            # Compteurs + version des données (api/cache.py)
+            with self.assertNumQueries(2):
+                response = self.client.get(reverse('global-stats'))
+            self.assertEqual(response.status_code, 200)
+
+
+class StatsStreamTests(StatsTestMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.create_menages(2, self.dakar, Menage.STATUT_AFFECTE)
+
+    def parse_events(self, content):
+        events = []
+        for block in content.strip().split('\n\n'):
+            fields = dict(line.split(': ', 1) for line in block.splitlines() if ': ' in line and not line.startswith(':'))
+            events.append((fields['event'], json.loads(fields['data'])))
+        return events
+
+    def test_compute_deltas(self):
+        before = {('01', 2, False, 1): 2, ('10', 4, True, 1): 1}
+        after = {('01', 2, False, 1): 1, ('01', 4, False, 1): 1, ('10', 4, True, 1): 1}
+        self.assertEqual(compute_deltas(before, after), [['01', 2, False, 1, -1], ['01', 4, False, 1, 1]])
+
+    def test_wsgi_returns_snapshot_only(self):
+        response = self.client.get(reverse('stats-stream'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        self.assertEqual(response['Cache-Control'], 'no-cache')
+        content = response.content.decode('utf-8')
+        self.assertTrue(content.startswith('retry: '))
+        self.assertEqual(self.parse_events(content), [('snapshot', [['01', 2, False, 1, 2]])])
+
+    def save_menage(self, idmng, statut):
+        with self.captureOnCommitCallbacks(execute=True):
+            menage = Menage.objects.filter(idmng=idmng).first() or Menage(idmng=idmng, region=self.kolda, tirage=1, is_rural=True)
+            menage.statut_menage = statut
+            menage.save()
+
+    async def test_asgi_stream_pushes_deltas_to_all_clients(self):
+        client = AsyncClient()
+        responses = [await client.get(reverse('stats-stream')) for _ in range(2)]
+        streams = [response.streaming_content.__aiter__() for response in responses]
+        try:
+            for stream in streams:
+                first = (await stream.__anext__()).decode('utf-8')
+                self.assertEqual(self.parse_events(first), [('snapshot', [['01', 2, False, 1, 2]])])
+            self.assertEqual(len(broadcaster.subscribers), 2)
+
+            await sync_to_async(self.save_menage)('M000001', Menage.STATUT_COMPLET)
+            for stream in streams:
+                message = (await asyncio.wait_for(stream.__anext__(), timeout=5)).decode('utf-8')
+                self.assertEqual(self.parse_events(message), [('deltas', [['01', 2, False, 1, -1], ['01', 4, False, 1, 1]])])
+
+            await sync_to_async(self.save_menage)('K000001', Menage.STATUT_PARTIEL)
+            for stream in streams:
+                message = (await asyncio.wait_for(stream.__anext__(), timeout=5)).decode('utf-8')
+                self.assertEqual(self.parse_events(message), [('deltas', [['10', 3, True, 1, 1]])])
+        finally:
+            # Déconnexion client : le serveur ASGI annule la lecture en cours
+            for stream in streams:
+                pending = asyncio.ensure_future(stream.__anext__())
+                await asyncio.sleep(0)
+                pending.cancel()
+                with self.assertRaises(asyncio.CancelledError):
+                    await pending
+        self.assertEqual(broadcaster.subscribers, set())
+
+
+class RegionStatsTests(StatsTestMixin, TestCase):
+
+    def test_region_stats_values(self):
+        self.create_menages(3, self.dakar, Menage.STATUT_COMPLET)
+        self.create_menages(1, self.dakar, Menage.STATUT_REFUS)
+        Region.objects.create(code_dr='13', nom_region='KEDOUGOU')
+
+        data = self.client.get(reverse('region-stats')).json()
+
+        self.assertEqual([r['code_dr'] for r in data], ['01', '10', '13'])
+        dakar = data[0]
+        self.assertEqual(dakar['nom_region'], 'DAKAR')
+        self.assertEqual(dakar['menages_attendus'], 4)
+        self.assertEqual(dakar['menages_collectes'], 3)
+        self.assertEqual(dakar['taux_de_couverture'], 75.0)
+        self.assertEqual(data[2]['menages_attendus'], 0)
+
+    def test_region_stats_constant_queries(self):
+        for code in range(20, 30):
+            region = Region.objects.create(code_dr=str(code), nom_region=f"R{code}")
+            self.create_menages(5, region, Menage.STATUT_PARTIEL)
+        # + 1 : version des données (api/cache.py)
+        with self.assertNumQueries(3):
+            self.client.get(reverse('region-stats'))
+        for group_by in ('superviseur', 'enqueteur', 'cons_code'):
+            with self.assertNumQueries(2):
+                response = self.client.get(reverse('region-stats'), {'group_by': group_by})
+            self.assertEqual(response.status_code, 200)
+
+    def test_region_stats_invalid_group_by(self):
+        response = self.client.get(reverse('region-stats'), {'group_by': 'commune'})
+        self.assertEqual(response.status_code, 400)
+
+
+class StatsCounterTests(StatsTestMixin, TestCase):
+
+    def test_api_writes_update_counters(self):
+        response = self.client.post(reverse('menage-list'), {
+            'idmng': 'NEW001', 'region': '01', 'statut_menage': Menage.STATUT_AFFECTE, 'tirage': 1,
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(current_counters(), recount())
+
+        self.client.patch(reverse('menage-detail', args=['NEW001']), {
+            'statut_menage': Menage.STATUT_COMPLET, 'region': '10',
+        }, format='json')
+        self.assertEqual(current_counters(), {('10', Menage.STATUT_COMPLET, False, 1): 1})
+
+        self.client.delete(reverse('menage-detail', args=['NEW001']))
+        self.assertEqual(current_counters(), {})
+
+    def test_stats_read_counters(self):
+        self.create_menages(5, self.kolda, Menage.STATUT_COMPLET)
+        StatsCounter.objects.update(count=42)
+        data = self.client.get(reverse('global-stats')).json()
+        self.assertEqual(data['menages_collectes']['total'], 42)
+
+    def test_concurrent_first_write_for_key(self):
+        key = ('01', Menage.STATUT_COMPLET, False, 1)
+        update = QuerySet.update
+
+        def racing_update(queryset, **kwargs):
+            # Une autre écriture crée la ligne juste après notre UPDATE sans effet
+            racing_update.calls += 1
+            if racing_update.calls == 1:
+                StatsCounter.objects.bulk_create([StatsCounter(count=1, **STATS_COUNTERS.lookup(key))])
+                return 0
+            return update(queryset, **kwargs)
+        racing_update.calls = 0
+
+        with mock.patch.object(QuerySet, 'update', racing_update):
+            STATS_COUNTERS.apply_delta(key, 1)
+        self.assertEqual(current_counters(), {key: 2})
+
+    def test_apply_deltas_in_bulk(self):
+        existant = ('01', Menage.STATUT_COMPLET, False, 1)
+        nouveau = ('10', Menage.STATUT_REFUS, True, 0)
+        concurrent = ('10', Menage.STATUT_PARTIEL, True, 1)
+        STATS_COUNTERS.apply_delta(existant, 5)
+        # Lecture, mise à jour groupée et insertion groupée (plus les savepoints)
+        with self.assertNumQueries(7):
+            adjusted = STATS_COUNTERS.apply_deltas({existant: -2, nouveau: 3, ('14', 1, False, 1): 0})
+        self.assertEqual(adjusted, 2)
+        self.assertEqual(current_counters(), {existant: 3, nouveau: 3})
+
+        update = QuerySet.update
+
+        def racing_update(queryset, **kwargs):
+            # Une autre écriture crée une des lignes entre la lecture et l'insertion
+            if not StatsCounter.objects.filter(**STATS_COUNTERS.lookup(concurrent)).exists():
+                StatsCounter.objects.bulk_create([StatsCounter(count=1, **STATS_COUNTERS.lookup(concurrent))])
+            return update(queryset, **kwargs)
+
+        with mock.patch.object(QuerySet, 'update', racing_update):
+            STATS_COUNTERS.apply_deltas({existant: 1, concurrent: 1})
+        self.assertEqual(current_counters(), {existant: 4, nouveau: 3, concurrent: 2})
+
+    def test_check_stats_counters_command(self):
+        self.create_menages(3, self.dakar, Menage.STATUT_PARTIEL)
+        call_command('check_stats_counters', stdout=StringIO())
+
+        StatsCounter.objects.update(count=1)
+        with self.assertRaises(CommandError):
+            call_command('check_stats_counters', stdout=StringIO())
+        call_command('check_stats_counters', '--fix', stdout=StringIO())
+        self.assertEqual(current_counters(), recount())
+
+
+class GeoTreeStatsTests(StatsTestMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        dep = Departement.objects.create(code_departement='011', nom_departement='DAKAR', region=self.dakar)
+        Departement.objects.create(code_departement='012', nom_departement='PIKINE', region=self.dakar)
+        self.plateau = Commune.objects.create(code_commune='011101', nom_commune='PLATEAU', departement=dep)
+        self.medina = Commune.objects.create(code_commune='011102', nom_commune='MEDINA', departement=dep)
+        grappe = Grappe.objects.create(code_grappe='011101000001', commune=self.plateau)
+        Grappe.objects.create(code_grappe='011102000002', commune=self.medina)
+        geo = {'departement': dep, 'commune': self.plateau, 'grappe': grappe}
+        self.create_menages(3, self.dakar, Menage.STATUT_COMPLET, **geo)
+        self.create_menages(1, self.dakar, Menage.STATUT_REFUS, **geo)
+        self.create_menages(2, self.kolda, Menage.STATUT_AFFECTE)
+
+    def get_tree(self, **params):
+        return self.client.get(reverse('geo-tree-stats'), params)
+
+    def test_national_lists_regions(self):
+        data = self.get_tree().json()
+        self.assertEqual((data['niveau'], data['menages_attendus'], data['menages_collectes']), ('national', 6, 3))
+        self.assertEqual(data['niveau_enfants'], 'region')
+        self.assertEqual([(e['code'], e['nom'], e['menages_collectes']) for e in data['enfants']],
+                         [('01', 'DAKAR', 3), ('10', 'KOLDA', 0)])
+
+    def test_drill_down_to_grappe(self):
+        data = self.get_tree(niveau='departement', code='011').json()
+        self.assertEqual(data['chemin'], [{'niveau': 'region', 'code': '01', 'nom': 'DAKAR'}])
+        self.assertEqual((data['nom'], data['menages_attendus'], data['taux_de_couverture']), ('DAKAR', 4, 75.0))
+        # Commune sans ménage listée avec des compteurs à 0
+        self.assertEqual([(e['code'], e['menages_attendus']) for e in data['enfants']],
+                         [('011101', 4), ('011102', 0)])
+
+        with self.assertNumQueries(3):
+            data = self.get_tree(niveau='grappe', code='011101000001').json()
+        self.assertEqual([n['code'] for n in data['chemin']], ['01', '011', '011101'])
+        self.assertEqual((data['menages_collectes'], data['niveau_enfants'], data['enfants']), (3, None, []))
+
+    def test_writes_keep_geo_counters_in_sync(self):
+        menage = Menage.objects.filter(statut_menage=Menage.STATUT_COMPLET).first()
+        menage.statut_menage = Menage.STATUT_AFFECTE
+        menage.commune, menage.grappe_id = self.medina, '011102000002'
+        menage.save()
+        self.client.delete(reverse('menage-detail', args=[Menage.objects.filter(statut_menage=Menage.STATUT_REFUS).get().pk]))
+        self.assertEqual(diff_counters(), [])
+        data = self.get_tree(niveau='commune', code='011102').json()
+        self.assertEqual((data['menages_attendus'], data['menages_collectes']), (1, 0))
+
+    def test_invalid_parameters(self):
+        self.assertEqual(self.get_tree(niveau='quartier', code='1').status_code, 400)
+        self.assertEqual(self.get_tree(niveau='region').status_code, 400)
+        self.assertEqual(self.get_tree(niveau='commune', code='999999').status_code, 404)
+
+
+class TimelineStatsTests(StatsTestMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.enqueteur = Enqueteur.objects.create(login_enq='010101', nom_enqueteur='AWA NDIAYE')
+        self.create_menages(2, self.dakar, Menage.STATUT_COMPLET, date_enquete=datetime.date(2025, 3, 1), enqueteur=self.enqueteur)
+        self.create_menages(1, self.dakar, Menage.STATUT_PARTIEL, date_enquete=datetime.date(2025, 3, 3))
+        self.create_menages(1, self.kolda, Menage.STATUT_COMPLET, date_enquete=datetime.date(2025, 3, 2))
+        self.create_menages(4, self.dakar, Menage.STATUT_AFFECTE)
+
+    def test_writes_keep_daily_counters_in_sync(self):
+        self.client.patch(reverse('menage-detail', args=['M000001']), {'date_enquete': '2025-03-05'}, format='json')
+        self.client.delete(reverse('menage-detail', args=['M000004']))
+        self.enqueteur.delete()
+        self.assertEqual(DAILY_COUNTERS.current(), DAILY_COUNTERS.recount())
+        self.assertEqual(diff_counters(), [])
+
+    def test_incremental_import_keeps_daily_counters_in_sync(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            call_command('generate_data', '--menages', '140', '--output-dir', tmpdir, stdout=StringIO())
+            args = ['--info-gen', os.path.join(tmpdir, 'INFO_GEN.CSV'), '--info-men-record', os.path.join(tmpdir, 'INFO_MEN_RECORD.CSV')]
+            call_command('import_data', *args, stdout=StringIO())
+            Menage.objects.filter(statut_menage=Menage.STATUT_COMPLET).update(source_hash='', date_enquete=datetime.date(2020, 1, 1))
+            rebuild_counters()
+            call_command('import_data', '--incremental', *args, stdout=StringIO())
+        self.assertGreater(DailyCounter.objects.count(), 0)
+        self.assertEqual(diff_counters(), [])
+
+    def test_region_timeline(self):
+        with self.assertNumQueries(4):
+            response = self.client.get(reverse('timeline-stats'), {'from': '2025-03-02', 'to': '2025-03-03', 'window': 2})
+        data = response.json()
+        self.assertEqual((data['from'], data['to']), ('2025-03-02', '2025-03-03'))
+        dakar = data['series'][0]
+        self.assertEqual(dakar['code_dr'], '01')
+        self.assertEqual([p['collectes'] for p in dakar['points']], [0, 1])
+        # Le cumul part des 2 ménages collectés avant la période
+        self.assertEqual([p['cumul'] for p in dakar['points']], [2, 3])
+        self.assertEqual(dakar['points'][-1]['moyenne_mobile'], 0.5)
+        self.assertEqual(dakar['projection']['menages_attendus'], 7)
+        self.assertEqual(dakar['projection']['reste'], 4)
+        # 4 ménages restants à 0,5 par jour : 8 jours après le 3 mars
+        self.assertEqual(dakar['projection']['date_fin_projetee'], '2025-03-11')
+
+    def test_total_and_enqueteur_timelines(self):
+        data = self.client.get(reverse('timeline-stats'), {'group_by': 'total'}).json()
+        self.assertEqual((data['from'], data['to']), ('2025-03-01', '2025-03-03'))
+        self.assertEqual([p['collectes'] for p in data['series'][0]['points']], [2, 1, 1])
+        self.assertEqual(data['series'][0]['projection']['menages_attendus'], 8)
+
+        data = self.client.get(reverse('timeline-stats'), {'group_by': 'enqueteur'}).json()
+        self.assertEqual(data['series'][0]['login_enq'], '010101')
+        self.assertNotIn('projection', data['series'][0])
+
+    def test_invalid_parameters(self):
+        for params in ({'group_by': 'commune'}, {'from': '2025-02-30'}, {'from': 'hier'},
+                       {'from': '2025-03-05', 'to': '2025-03-01'}, {'window': '0'}):
+            self.assertEqual(self.client.get(reverse('timeline-stats'), params).status_code, 400, params)
+
+
+class LeaderboardTests(StatsTestMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.awa = Enqueteur.objects.create(login_enq='010101', nom_enqueteur='AWA NDIAYE')
+        self.modou = Enqueteur.objects.create(login_enq='011001', nom_enqueteur='MODOU FALL')
+        debut, fin = datetime.time(9, 0), datetime.time(9, 45)
+        self.create_menages(2, self.dakar, Menage.STATUT_COMPLET, enqueteur=self.awa, superviseur_code='SP01',
+                            heure_debut_enquete=debut, heure_fin_enquete=fin)
+        self.create_menages(1, self.dakar, Menage.STATUT_PARTIEL, enqueteur=self.awa, superviseur_code='SP01',
+                            heure_debut_enquete=debut, heure_fin_enquete=datetime.time(10, 15))
+        self.create_menages(1, self.dakar, Menage.STATUT_REFUS, enqueteur=self.awa, superviseur_code='SP01')
+        self.create_menages(1, self.kolda, Menage.STATUT_COMPLET, enqueteur=self.modou, superviseur_code='SP10')
+        self.create_menages(3, self.kolda, Menage.STATUT_AFFECTE, enqueteur=self.modou, superviseur_code='SP10')
+
+    def test_enqueteur_leaderboard(self):
+        # Agrégation + version des données (cache de la réponse et de l'agrégation)
+        with self.assertNumQueries(3):
+            data = self.client.get(reverse('enqueteur-leaderboard')).json()
+        self.assertEqual(data['count'], 2)
+        awa, modou = data['results']
+        self.assertEqual(awa['login_enq'], '010101')
+        self.assertEqual(
+            (awa['menages_collectes'], awa['complets'], awa['partiels'], awa['refus'], awa['taux_de_couverture']),
+            (3, 2, 1, 1, 75.0),
+        )
+        self.assertEqual(awa['duree_moyenne_minutes'], 55.0)
+        self.assertIsNone(modou['duree_moyenne_minutes'])
+
+    def test_sorting_and_pagination_reuse_cached_aggregation(self):
+        self.client.get(reverse('enqueteur-leaderboard'))
+        with self.assertNumQueries(2):
+            data = self.client.get(reverse('enqueteur-leaderboard'), {'ordering': 'taux_de_couverture', 'page_size': 1}).json()
+        self.assertEqual([entry['login_enq'] for entry in data['results']], ['011001'])
+        self.assertIsNotNone(data['next'])
+
+        data = self.client.get(reverse('enqueteur-leaderboard'), {'ordering': '-duree_moyenne_minutes'}).json()
+        self.assertEqual([entry['login_enq'] for entry in data['results']], ['010101', '011001'])
+
+    def test_superviseur_leaderboard(self):
+        data = self.client.get(reverse('superviseur-leaderboard'), {'ordering': 'id_superviseur'})
+        self.assertEqual(data.status_code, 400)
+        results = self.client.get(reverse('superviseur-leaderboard')).json()['results']
+        self.assertEqual([(e['id_superviseur'], e['menages_attendus']) for e in results], [('SP01', 4), ('SP10', 4)])
+
+
+class ApiCacheTests(StatsTestMixin, TestCase):
+
+    def test_repeated_requests_hit_cache(self):
+        self.create_menages(3, self.dakar, Menage.STATUT_COMPLET)
+        for name in ('global-stats', 'region-stats', 'region-list'):
+            self.client.get(reverse(name))
+            # Seule la version des données est lue
+            with self.assertNumQueries(1):
+                response = self.client.get(reverse(name))
+            self.assertEqual(response.status_code, 200)
+            self.assertIn('ETag', response)
+
+    def test_menage_write_invalidates_cache(self):
+        self.create_menages(3, self.dakar, Menage.STATUT_COMPLET)
+        etag = self.client.get(reverse('global-stats'))['ETag']
+
+        self.client.patch(reverse('menage-detail', args=['M000001']), {'statut_menage': Menage.STATUT_REFUS}, format='json')
+
+        response = self.client.get(reverse('global-stats'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(response.json()['menages_collectes']['total'], 2)
+
+    def test_version_bumped_by_another_process(self):
+        etag = self.client.get(reverse('global-stats'))['ETag']
+        # Autre processus (import_data, autre worker) : son propre cache locmem
+        other_cache = {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'autre-processus'}
+        with override_settings(CACHES={**settings.CACHES, 'autre': other_cache}, API_CACHE_ALIAS='autre'):
+            Menage.objects.bulk_create([Menage(idmng='X000001', region=self.dakar, statut_menage=Menage.STATUT_COMPLET)])
+            rebuild_counters()
+            bump_data_version()
+        response = self.client.get(reverse('global-stats'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['menages_collectes']['total'], 1)
+
+    def test_conditional_request_returns_304(self):
+        response = self.client.get(reverse('region-stats'))
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('region-stats'), HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_shared_cache_holds_version(self):
+        self.create_menages(3, self.dakar, Menage.STATUT_COMPLET)
+        with tempfile.TemporaryDirectory() as location:
+            shared = {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': location}
+            with override_settings(CACHES={**settings.CACHES, 'partage': shared}, API_CACHE_ALIAS='partage'):
+                etag = self.client.get(reverse('global-stats'))['ETag']
+                with self.assertNumQueries(0):
+                    self.assertEqual(self.client.get(reverse('global-stats')).status_code, 200)
+                    response = self.client.get(reverse('global-stats'), HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 304)
+
+                # Nouvelle version publiée à la validation de l'écriture
+                with self.captureOnCommitCallbacks(execute=True):
+                    self.client.patch(reverse('menage-detail', args=['M000001']), {'statut_menage': Menage.STATUT_REFUS}, format='json')
+                response = self.client.get(reverse('global-stats'), HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response.json()['menages_collectes']['total'], 2)
+
+
+class PerfMiddlewareTests(StatsTestMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        clear_buffer()
+        self.addCleanup(clear_buffer)
+
+    @override_settings(API_PERF_ENABLED=True)
+    def test_server_timing_and_buffer(self):
+        self.create_menages(3, self.dakar, Menage.STATUT_COMPLET)
+        with self.assertLogs('api.perf', level='INFO') as logs:
+            response = self.client.get(reverse('menage-list'))
+        self.assertIn('db;dur=', response['Server-Timing'])
+        self.assertIn('serializer;dur=', response['Server-Timing'])
+        self.assertIn('total;dur=', response['Server-Timing'])
+
+        entry = json.loads(logs.records[0].getMessage())
+        self.assertEqual(entry['route'], 'menage-list')
+        self.assertEqual(entry['queries'], 2)
+        self.assertEqual(get_buffer(), [entry])
+
+    @override_settings(API_PERF_ENABLED=True)
+    def test_perf_endpoint_is_admin_only(self):
+        with self.assertLogs('api.perf', level='INFO'):
+            self.client.get(reverse('global-stats'))
+        self.assertEqual(self.client.get(reverse('perf')).status_code, 403)
+
+        admin = get_user_model().objects.create_superuser('admin', 'admin@example.com', 'secret')
+        self.client.force_authenticate(admin)
+        payload = self.client.get(reverse('perf')).json()
+        self.assertEqual(payload['requests'], 1)
+        self.assertEqual(payload['endpoints'][0]['route'], 'global-stats')
+
+    def test_disabled_by_default(self):
+        response = self.client.get(reverse('global-stats'))
+        self.assertNotIn('Server-Timing', response)
+        self.assertEqual(get_buffer(), [])
+
+    def test_serializer_timing_only_when_enabled(self):
+        # Propriété d'origine de DRF, même si un test précédent a installé le chronométrage
+        untimed = getattr(BaseSerializer.data.fget, 'untimed', BaseSerializer.data)
+        with mock.patch.object(BaseSerializer, 'data', untimed):
+            self.client.get(reverse('region-list'))
+            self.assertIs(BaseSerializer.data, untimed)
+            get_cache().clear()
+            with override_settings(API_PERF_ENABLED=True), self.assertLogs('api.perf', level='INFO'):
+                response = APIClient().get(reverse('region-list'))
+            self.assertIsNot(BaseSerializer.data, untimed)
+        self.assertIn('serializer;dur=', response['Server-Timing'])
+
+    @override_settings(API_PERF_ENABLED=True, API_ASYNC_VIEWS=True)
+    async def test_async_views_stay_async(self):
+        await sync_to_async(self.create_menages)(3, self.dakar, Menage.STATUT_COMPLET)
+        with self.assertLogs('api.perf', level='INFO') as logs:
+            response = await AsyncClient().get('/api/stats/global/')
+        self.assertIs(response.resolver_match.func.view_class, AsyncGlobalStatsView)
+        self.assertIn('total;dur=', response['Server-Timing'])
+        self.assertGreater(json.loads(logs.records[0].getMessage())['queries'], 0)
+
+        async def view(request):
+            return HttpResponse()
+        self.assertTrue(iscoroutinefunction(PerfMiddleware(view)))
+
+    def test_repeated_queries_are_flagged(self):
+        record = RequestRecord()
+        with connection.execute_wrapper(record):
+            for code in ('01', '10', '01', '10', '01'):
+                Region.objects.get(code_dr=code)
+            list(Region.objects.filter(code_dr__in=['01', '10']))
+        self.assertEqual(len(record.queries), 6)
+        self.assertEqual(list(record.duplicates(threshold=5).values()), [5])
+
+
+class MenageExportTests(StatsTestMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.create_menages(3, self.dakar, Menage.STATUT_COMPLET, date_enquete=datetime.date(2025, 3, 1))
+        self.create_menages(2, self.kolda, Menage.STATUT_REFUS)
+
+    def export(self, query=''):
+        response = self.client.get(reverse('menage-export') + query)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return response, b''.join(response.streaming_content).decode('utf-8')
+
+    def test_csv_export_with_filters(self):
+        response, content = self.export('?region__code_dr=01')
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        self.assertIn('attachment; filename="menages.csv"', response['Content-Disposition'])
+        rows = list(csv.DictReader(content.lstrip('\ufeff').splitlines()))
+        self.assertEqual([row['idmng'] for row in rows], ['M000001', 'M000002', 'M000003'])
+        self.assertEqual(rows[0]['region_nom'], 'DAKAR')
+        self.assertEqual(rows[0]['statut_menage_display'], 'COMPLET')
+        self.assertEqual(rows[0]['date_enquete'], '2025-03-01')
+
+    def test_ndjson_export(self):
+        response, content = self.export('?format=ndjson&statut_menage=%d' % Menage.STATUT_REFUS)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson; charset=utf-8')
+        rows = [json.loads(line) for line in content.splitlines()]
+        self.assertEqual([row['idmng'] for row in rows], ['M000004', 'M000005'])
+        self.assertEqual(rows[0]['code_dr'], '10')
+        self.assertIsNone(rows[0]['date_enquete'])
+
+    def test_export_runs_a_single_query(self):
+        response = self.client.get(reverse('menage-export'))
+        with self.assertNumQueries(1):
+            content = b''.join(response.streaming_content)
+        self.assertEqual(content.decode('utf-8').count('\n'), 6)
+
+
+class MenageListFastPathTests(StatsTestMixin, TestCase):
+
+    def test_values_path_matches_serializer(self):
+        enqueteur = Enqueteur.objects.create(login_enq='010101', nom_enqueteur='AWA NDIAYE')
+        self.create_menages(2, self.dakar, Menage.STATUT_COMPLET, enqueteur=enqueteur, date_enquete=datetime.date(2025, 3, 1))
+        self.create_menages(2, self.kolda, Menage.STATUT_REFUS, nom_cm='FALL')
+        queryset = Menage.objects.order_by('idmng')
+
+        expected = MenageListSerializer(queryset, many=True).data
+        fast = MenageListSerializer.serialize_values(MenageListSerializer.values_queryset(queryset))
+        self.assertEqual(fast, [dict(row) for row in expected])
+
+    def test_list_page_queries(self):
+        self.create_menages(30, self.dakar, Menage.STATUT_COMPLET)
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('menage-list'), {'page_size': 20})
+        self.assertEqual(len(response.json()['results']), 20)
+        self.assertEqual(response.json()['results'][0]['region_nom'], 'DAKAR')
+
+
+class MenageSparseFieldsTests(StatsTestMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        enqueteur = Enqueteur.objects.create(login_enq='010101', nom_enqueteur='AWA NDIAYE')
+        self.create_menages(
+            2, self.dakar, Menage.STATUT_COMPLET, enqueteur=enqueteur, adresse='PLATEAU', observations='RAS',
+            date_enquete=datetime.date(2025, 3, 1), heure_debut_enquete=datetime.time(9, 30),
+        )
+        self.create_menages(1, self.kolda, Menage.STATUT_REFUS)
+
+    def get(self, name, params, args=()):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse(name, args=args), params)
+        return response, ' '.join(query['sql'] for query in queries.captured_queries)
+
+    def test_values_path_matches_full_serializer(self):
+        queryset = Menage.objects.order_by('idmng')
+        expected = [dict(row) for row in MenageSerializer(queryset, many=True).data]
+        fast = MenageListSerializer.serialize_values(
+            MenageListSerializer.values_queryset(queryset, MENAGE_DETAIL_FIELDS), MENAGE_DETAIL_FIELDS,
+        )
+        self.assertEqual(fast, expected)
+
+    def test_list_fields_narrow_output_and_sql(self):
+        response, sql = self.get('menage-list', {'fields': 'idmng,statut_menage,nom_cm'})
+        self.assertEqual(list(response.json()['results'][0]), ['idmng', 'nom_cm', 'statut_menage'])
+        self.assertNotIn('api_region', sql)
+        self.assertNotIn('adresse', sql)
+
+        response, sql = self.get('menage-list', {'omit': 'region_nom,enqueteur_nom', 'pagination': 'cursor',
+                                                 'ordering': 'date_enquete'})
+        self.assertEqual(list(response.json()['results'][0]), ['idmng', 'nom_cm', 'statut_menage_display', 'date_enquete'])
+        self.assertNotIn('JOIN', sql)
+
+    def test_detail_fields_use_only(self):
+        response, sql = self.get('menage-detail', {'fields': 'idmng,region_nom,heure_debut_enquete'}, ['M000001'])
+        self.assertEqual(response.json(), {'idmng': 'M000001', 'region_nom': 'DAKAR', 'heure_debut_enquete': '09:30:00'})
+        self.assertNotIn('observations', sql)
+        self.assertNotIn('api_enqueteur', sql)
+
+        data = self.client.get(reverse('menage-detail', args=['M000001']), {'omit': 'adresse,observations'}).json()
+        self.assertEqual(len(data), len(MENAGE_DETAIL_FIELDS) - 2)
+        self.assertEqual(data['enqueteur_nom'], 'AWA NDIAYE')
+
+    def test_export_columns(self):
+        response = self.client.get(reverse('menage-export'), {'fields': 'idmng,statut_menage_display'})
+        content = b''.join(response.streaming_content).decode('utf-8').lstrip('\ufeff')
+        self.assertEqual(content.splitlines()[:2], ['idmng,statut_menage_display', 'M000001,COMPLET'])
+
+    def test_invalid_fields(self):
+        for params in ({'fields': 'idmng,inconnu'}, {'fields': 'idmng', 'omit': 'nom_cm'}, {'fields': ','}):
+            self.assertEqual(self.client.get(reverse('menage-list'), params).status_code, 400)
+        self.assertEqual(self.client.get(reverse('menage-export'), {'omit': 'region'}).status_code, 400)
+
+
+class ResponseFormatTests(StatsTestMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.create_menages(40, self.dakar, Menage.STATUT_COMPLET, adresse='PLATEAU', date_enquete=datetime.date(2025, 3, 1))
+        self.create_menages(10, self.kolda, Menage.STATUT_REFUS)
+
+    def test_choose_encoding(self):
+        self.assertEqual(choose_encoding('gzip, deflate'), 'gzip')
+        self.assertEqual(choose_encoding('*'), choose_encoding('br, gzip'))
+        self.assertIsNone(choose_encoding('gzip;q=0, identity'))
+        self.assertIsNone(choose_encoding(''))
+
+    def test_large_json_is_gzipped(self):
+        url = reverse('menage-list')
+        plain = self.client.get(url, {'page_size': 50})
+        response = self.client.get(url, {'page_size': 50}, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', response['Vary'])
+        self.assertLess(len(response.content), len(plain.content))
+        self.assertEqual(json.loads(gzip.decompress(response.content)), plain.json())
+
+        # Petite réponse : envoyée telle quelle
+        response = self.client.get(reverse('region-list'), HTTP_ACCEPT_ENCODING='gzip')
+        self.assertFalse(response.has_header('Content-Encoding'))
+
+    @override_settings(API_COMPRESSION_MIN_SIZE=0)
+    def test_cached_response_keeps_conditional_requests(self):
+        response = self.client.get(reverse('region-stats'), HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertTrue(response['ETag'].startswith('W/"'))
+        response = self.client.get(
+            reverse('region-stats'), HTTP_ACCEPT_ENCODING='gzip', HTTP_IF_NONE_MATCH=response['ETag'],
+        )
+        self.assertEqual(response.status_code, 304)
+
+    def test_export_stream_is_compressed_but_not_sse(self):
+        response = self.client.get(reverse('menage-export'), HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        content = gzip.decompress(b''.join(response.streaming_content)).decode('utf-8')
+        self.assertEqual(content.lstrip('\ufeff').count('\n'), 51)
+
+        response = self.client.get(reverse('stats-stream'), HTTP_ACCEPT_ENCODING='gzip')
+        self.assertFalse(response.has_header('Content-Encoding'))
+
+    def test_columnar_round_trip(self):
+        data = [{'a': 1, 'b': [{'x': 1}, {'x': 2}]}, {'a': 2, 'b': []}]
+        self.assertEqual(to_columns(data), {'colonnes': {'a': [1, 2], 'b': [{'colonnes': {'x': [1, 2]}}, []]}})
+        self.assertEqual(from_columns(to_columns(data)), data)
+
+        for url, params in [(reverse('menage-list'), {'page_size': 50}), (reverse('region-stats'), {})]:
+            expected = self.client.get(url, params).json()
+            response = self.client.get(url, {**params, 'format': 'columnar'})
+            self.assertEqual(response['Content-Type'], 'application/vnd.ansd.columnar+json')
+            self.assertEqual(from_columns(response.json()), expected)
+            self.assertLess(len(response.content), len(json.dumps(expected, separators=(',', ':'))))
+
+    @skipUnless(msgpack, "paquet msgpack non installé")
+    def test_msgpack_list_and_export(self):
+        expected = self.client.get(reverse('menage-list')).json()
+        response = self.client.get(reverse('menage-list'), {'format': 'msgpack'})
+        self.assertEqual(msgpack.unpackb(response.content), expected)
+
+        response = self.client.get(reverse('menage-export'), {'format': 'msgpack', 'fields': 'idmng,date_enquete'})
+        rows = list(msgpack.Unpacker(BytesIO(b''.join(response.streaming_content))))
+        self.assertEqual(rows[:2], [['idmng', 'date_enquete'], ['M000001', '2025-03-01']])
+
+
+@override_settings(API_ASYNC_VIEWS=True)
+class AsyncViewsTests(StatsTestMixin, TestCase):
+    """Vues asynchrones servies sous ASGI (AsyncClient) : mêmes réponses que les vues DRF en WSGI."""
+
+    def setUp(self):
+        super().setUp()
+        self.create_menages(3, self.dakar, Menage.STATUT_COMPLET, nom_cm='DIOP')
+        self.create_menages(2, self.kolda, Menage.STATUT_REFUS, tirage=0)
+        self.create_menages(12, self.kolda, Menage.STATUT_AFFECTE)
+        self.async_client = AsyncClient()
+
+    async def compare(self, url, **headers):
+        """Réponse ASGI, après vérification qu'elle est identique à la réponse WSGI."""
+        expected = await sync_to_async(self.client.get)(url, headers=headers)
+        response = await self.async_client.get(url, headers=headers)
+        self.assertEqual(
+            (response.status_code, response['Content-Type'], response.content),
+            (expected.status_code, expected['Content-Type'], expected.content),
+        )
+        return response
+
+    def test_get_data_required(self):
+        class IncompleteView(AsyncAPIView):
+            cached = True
+        with self.assertRaises(TypeError):
+            IncompleteView()
+
+    async def test_stats_served_asynchronously(self):
+        for url, view_class in [
+            ('/api/stats/global/', AsyncGlobalStatsView),
+            ('/api/stats/regions/', AsyncRegionStatsView),
+            ('/api/stats/regions/?group_by=enqueteur', AsyncRegionStatsView),
+            ('/api/stats/regions/?group_by=inconnu', AsyncRegionStatsView),
+            ('/api/stats/global/?format=columnar', AsyncGlobalStatsView),
+        ]:
+            response = await self.compare(url)
+            self.assertIs(response.resolver_match.func.view_class, view_class)
+
+    async def test_cache_entries_shared_with_wsgi(self):
+        url = reverse('global-stats')
+        etag = (await sync_to_async(self.client.get)(url))['ETag']
+        response = await self.async_client.get(url, headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 304)
+        await sync_to_async(self.create_menages)(1, self.dakar, Menage.STATUT_PARTIEL)
+        response = await self.async_client.get(url, headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.content)['menages_collectes']['total'], 4)
+
+    async def test_menage_list_matches_sync_view(self):
+        for url in [
+            '/api/menages/',
+            '/api/menages/?page=2&page_size=5',
+            '/api/menages/?page=last',
+            '/api/menages/?page=99',
+            '/api/menages/?page=abc',
+            '/api/menages/?region__code_dr=10&statut_menage=2&fields=idmng,statut_menage',
+            '/api/menages/?search=diop&omit=region_nom',
+            '/api/menages/?fields=inconnu',
+            '/api/menages/?format=columnar',
+        ]:
+            response = await self.compare(url)
+            self.assertIs(response.resolver_match.func.view_class, AsyncMenageListView)
+
+    async def test_responses_compressed(self):
+        url = '/api/menages/?page_size=50'
+        expected = await sync_to_async(self.client.get)(url)
+        response = await self.async_client.get(url, headers={'Accept-Encoding': 'gzip'})
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(response.content), expected.content)
+        response = await self.async_client.get('/api/stats/global/', headers={'Accept-Encoding': 'gzip'})
+        self.assertFalse(response.has_header('Content-Encoding'))
+
+    async def test_other_requests_delegated_to_drf(self):
+        # Curseur, HTML navigable et écritures : vue DRF
+        await self.compare('/api/menages/?pagination=cursor&ordering=date_enquete')
+        response = await self.async_client.get('/api/stats/global/', headers={'Accept': 'text/html'})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/html'))
+        response = await self.async_client.post('/api/menages/', {}, content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('idmng', json.loads(response.content))
+
+    async def test_access_policy_of_drf_view_applied(self):
+        class Refus(BaseThrottle):
+            def allow_request(self, request, view):
+                return False
+
+            def wait(self):
+                return 60
+
+        # Mêmes refus que la vue DRF : utilisateur anonyme, puis débit dépassé
+        with mock.patch.object(GlobalStatsAPIView, 'permission_classes', [IsAuthenticated]):
+            response = await self.compare('/api/stats/global/')
+        self.assertEqual(response.status_code, 403)
+        with mock.patch.object(MenageViewSet, 'throttle_classes', [Refus]):
+            response = await self.compare('/api/menages/')
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '60')
+        self.assertIs(response.resolver_match.func.view_class, AsyncMenageListView)
+
+    async def test_gather_queries_in_transaction(self):
+        # Dans la transaction du test, les lectures restent sur la connexion courante
+        counts = await gather_queries(Region.objects.count, Menage.objects.filter(region=self.kolda).count)
+        self.assertEqual(counts, [2, 14])
+
+
+class GatherQueriesTests(TransactionTestCase):
+
+    def test_queries_run_on_pool_threads(self):
+        Region.objects.create(code_dr='01', nom_region='DAKAR')
+        # async_to_sync : les appels sync_to_async reviennent sur ce thread
+        thread_id, count = async_to_sync(gather_queries)(threading.get_ident, Region.objects.count)
+        self.assertEqual(thread_id, threading.get_ident())
+        self.assertEqual(count, 1)
+        self.assertNotEqual(async_to_sync(gather_queries)(threading.get_ident, threading.get_ident)[1], thread_id)
+
+    def test_busy_pool_runs_queries_in_order(self):
+        _, slots = get_query_executor()
+        taken = 0
+        while slots.acquire(blocking=False):
+            taken += 1
+        try:
+            thread_ids = async_to_sync(gather_queries)(threading.get_ident, threading.get_ident, threading.get_ident)
+        finally:
+            for _ in range(taken):
+                slots.release()
+        self.assertEqual(thread_ids, [threading.get_ident()] * 3)
+
+
+class ServerModesBenchmarkTests(TransactionTestCase):
+    """Test de charge WSGI/ASGI (les requêtes passent par d'autres threads : pas de transaction de test)."""
+
+    def test_asgi_leg_uses_async_views(self):
+        bump_data_version()
+        # API_ASYNC_VIEWS est désactivé par défaut : le test de charge l'active pour la partie ASGI
+        with mock.patch('api.async_views.acompute_global_stats', wraps=acompute_global_stats) as spy:
+            results = benchmark_server_modes(scenarios=[('global', '/api/stats/global/')], clients=1, duration=0.05)
+        self.assertTrue(spy.called)
+        self.assertGreater(results['global']['asgi']['requests'], 0)
+
+
+class MenageSearchTests(StatsTestMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.enqueteur = Enqueteur.objects.create(login_enq='010101', nom_enqueteur='Mamadou Diallo')
+        Menage.objects.create(
+            idmng='0100000001', region=self.dakar, statut_menage=Menage.STATUT_COMPLET, enqueteur=self.enqueteur,
+            nom_cm='Ndèye Fatou Sow', adresse='Médina, rue 6', telephone1='77 123 45 67',
+        )
+        Menage.objects.create(
+            idmng='1000000002', region=self.kolda, statut_menage=Menage.STATUT_REFUS,
+            nom_cm='Modou Fall', adresse='Quartier Saré Kémo',
+        )
+
+    def search(self, query, **params):
+        response = self.client.get(reverse('menage-list'), {'search': query, **params})
+        self.assertEqual(response.status_code, 200)
+        return [row['idmng'] for row in response.data['results']]
+
+    def test_document_is_accent_insensitive(self):
+        self.assertEqual(
+            build_document('M1', 'Ndèye SÔW', None, '77-123', 'Aïssatou'),
+            'm1 ndeye sow 77-123 77123 aissatou',
+        )
+
+    def test_search_names_with_and_without_accents(self):
+        self.assertEqual(self.search('Ndeye'), ['0100000001'])
+        self.assertEqual(self.search('NDÈYE sow'), ['0100000001'])
+        self.assertEqual(self.search('kemo'), ['1000000002'])
+        self.assertEqual(self.search('ndeye fall'), [])
+
+    def test_search_phone_enqueteur_and_prefix(self):
+        self.assertEqual(self.search('771234567'), ['0100000001'])
+        self.assertEqual(self.search('diallo'), ['0100000001'])
+        self.assertEqual(self.search('Mod'), ['1000000002'])
+        self.assertEqual(self.search('0100000'), ['0100000001'])
+
+    def test_search_combines_with_filters_and_export(self):
+        self.assertEqual(self.search('mo', region__code_dr='10'), ['1000000002'])
+        response = self.client.get(reverse('menage-export'), {'search': 'ndeye', 'format': 'ndjson'})
+        rows = [json.loads(line) for line in b''.join(response.streaming_content).decode('utf-8').splitlines()]
+        self.assertEqual([row['idmng'] for row in rows], ['0100000001'])
+
+    def test_empty_search_returns_everything(self):
+        self.assertEqual(self.search(' ,; '), ['0100000001', '1000000002'])
+
+    def test_index_follows_writes(self):
+        menage = Menage.objects.get(idmng='1000000002')
+        menage.nom_cm = 'Aïda Ndiaye'
+        menage.save()
+        self.assertEqual(self.search('modou'), [])
+        self.assertEqual(self.search('aida'), ['1000000002'])
+
+        self.enqueteur.nom_enqueteur = 'Binta Ba'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.enqueteur.save()
+        self.assertEqual(self.search('diallo'), [])
+        self.assertEqual(self.search('binta'), ['0100000001'])
+
+        self.enqueteur.delete()
+        self.assertEqual(self.search('binta'), [])
+        Menage.objects.get(idmng='0100000001').delete()
+        self.assertEqual(self.search('ndeye'), [])
+
+    def test_enqueteur_reindexed_only_on_rename(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.enqueteur.save()
+            self.enqueteur.nom_enqueteur = 'Binta Ba'
+            self.enqueteur.save(update_fields=['superviseur'])
+        self.assertEqual(callbacks, [])
+        # Réindexation après la validation seulement
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            self.enqueteur.save(update_fields=['nom_enqueteur'])
+            self.assertEqual(self.search('binta'), [])
+        self.assertEqual(len(callbacks), 1)
+        self.assertEqual(self.search('binta'), ['0100000001'])
+
+    @skipUnless(connection.vendor == 'sqlite', "Plan propre à FTS5")
+    def test_remove_from_index_uses_rowid_lookup(self):
+        with connection.cursor() as cursor:
+            cursor.execute('EXPLAIN QUERY PLAN ' + delete_sql(2), ['0100000001', '1000000002'])
+            plan = ' | '.join(row[-1] for row in cursor.fetchall())
+        # "INDEX 0:=" : recherche par rowid ; "INDEX 0:" seul parcourt toute la table virtuelle
+        self.assertIn('VIRTUAL TABLE INDEX 0:=', plan)
+        remove_from_index(['0100000001'])
+        self.assertEqual(self.search('ndeye'), [])
+        self.assertEqual(self.search('modou'), ['1000000002'])
+
+    def test_rebuild_indexes_bulk_created_rows(self):
+        self.create_menages(2, self.dakar, Menage.STATUT_AFFECTE, nom_cm='Coumba Ndoffène')
+        self.assertEqual(self.search('ndoffene'), [])
+        self.assertEqual(rebuild_search_index(), 4)
+        self.assertEqual(self.search('ndoffene'), ['M000001', 'M000002'])
+
+
+class MenageBulkUpdateTests(StatsTestMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.ancien = Enqueteur.objects.create(login_enq='010101', nom_enqueteur='Awa Ndiaye')
+        self.nouveau = Enqueteur.objects.create(login_enq='010102', nom_enqueteur='Ousmane Diop')
+        self.create_menages(4, self.dakar, Menage.STATUT_AFFECTE, enqueteur=self.ancien)
+        self.create_menages(2, self.kolda, Menage.STATUT_AFFECTE)
+        self.url = reverse('menage-bulk')
+
+    def bulk(self, payload, expected_status=200):
+        response = self.client.post(self.url, payload, format='json')
+        self.assertEqual(response.status_code, expected_status, response.data)
+        return response.data
+
+    def test_update_by_ids_reports_each_row(self):
+        Menage.objects.filter(idmng='M000002').update(statut_menage=Menage.STATUT_REFUS)
+        rebuild_counters()
+        data = self.bulk({'idmng': ['M000001', 'M000002', 'INCONNU'], 'changes': {'statut_menage': Menage.STATUT_REFUS}})
+        self.assertEqual((data['modifies'], data['inchanges'], data['introuvables']), (1, 1, 1))
+        self.assertEqual(data['resultats'], [
+            {'idmng': 'M000001', 'resultat': 'modifie'},
+            {'idmng': 'M000002', 'resultat': 'inchange'},
+            {'idmng': 'INCONNU', 'resultat': 'introuvable'},
+        ])
+        self.assertEqual(Menage.objects.filter(statut_menage=Menage.STATUT_REFUS).count(), 2)
+        self.assertEqual(diff_counters(), [])
+
+    def test_reassign_by_filter_updates_counters_cache_and_search(self):
+        before = self.client.get(reverse('global-stats')).data
+        self.assertEqual(before['menages_collectes']['total'], 0)
+        rebuild_search_index()
+
+        data = self.bulk({
+            'filter': {'enqueteur__login_enq': '010101'},
+            'changes': {'enqueteur': '010102', 'statut_menage': Menage.STATUT_COMPLET, 'date_enquete': '2025-03-02'},
+        })
+        self.assertEqual(data['modifies'], 4)
+        self.assertEqual(Menage.objects.filter(enqueteur=self.nouveau, statut_menage=Menage.STATUT_COMPLET).count(), 4)
+        self.assertEqual(diff_counters(), [])
+        self.assertEqual(self.client.get(reverse('global-stats')).data['menages_collectes']['total'], 4)
+        results = self.client.get(reverse('menage-list'), {'search': 'diop'}).data['results']
+        self.assertEqual(len(results), 4)
+
+    def test_query_count_does_not_depend_on_batch_size(self):
+        def queries(ids):
+            with CaptureQueriesContext(connection) as ctx:
+                self.bulk({'idmng': ids, 'changes': {'statut_menage': Menage.STATUT_PARTIEL}})
+            return len(ctx.captured_queries)
+
+        self.create_menages(40, self.kolda, Menage.STATUT_AFFECTE)
+        small = queries(['M000005', 'M000006'])
+        large = queries([f"M{i:06d}" for i in range(7, 47)])
+        # (le premier lot crée en plus la ligne de compteur du nouveau statut)
+        self.assertLessEqual(large, small)
+
+    def test_validation_errors(self):
+        self.bulk({'changes': {'statut_menage': 9}}, 400)
+        self.bulk({'idmng': ['M000001'], 'filter': {'statut_menage': 2}, 'changes': {'statut_menage': 9}}, 400)
+        self.bulk({'idmng': ['M000001'], 'changes': {}}, 400)
+        self.bulk({'idmng': ['M000001'], 'changes': {'nom_cm': 'X'}}, 400)
+        self.bulk({'idmng': ['M000001'], 'changes': {'statut_menage': 99}}, 400)
+        self.bulk({'idmng': ['M000001'], 'changes': {'enqueteur': 'ABSENT'}}, 400)
+        self.bulk({'filter': {'nom_cm': 'X'}, 'changes': {'statut_menage': 9}}, 400)
+        self.assertFalse(Menage.objects.filter(statut_menage=Menage.STATUT_REFUS).exists())
+
+
+class MenageCursorPaginationTests(StatsTestMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        for i, jour in enumerate([3, None, 1, 2, None, 1, 3, 2, 1, None, 2, 3]):
+            Menage.objects.create(
+                idmng=f"C{i:03d}", region=self.dakar,
+                date_enquete=datetime.date(2025, 3, jour) if jour else None,
+            )
+
+    def walk(self, link_key, params):
+        ids, url, pages = [], reverse('menage-list'), 0
+        response = self.client.get(url, params).json()
+        while True:
+            ids.extend(m['idmng'] for m in response['results'])
+            pages += 1
+            if not response[link_key]:
+                return ids, pages, response
+            with self.assertNumQueries(1):
+                response = self.client.get(response[link_key]).json()
+
+    def test_cursor_walk_by_idmng(self):
+        ids, pages, first = self.walk('next', {'pagination': 'cursor', 'page_size': 5})
+        self.assertEqual(ids, sorted(ids))
+        self.assertEqual(len(ids), 12)
+        self.assertEqual(pages, 3)
+        self.assertNotIn('count', first)
+
+    def test_cursor_walk_by_date_forward_and_back(self):
+        expected = [
+            m.idmng for m in sorted(
+                Menage.objects.all(), key=lambda m: (m.date_enquete is None, m.date_enquete or datetime.date.min, m.idmng)
+            )
+        ]
+        params = {'pagination': 'cursor', 'ordering': 'date_enquete', 'page_size': 5}
+        ids, _, last = self.walk('next', params)
+        self.assertEqual(ids, expected)
+
+        response = self.client.get(last['previous']).json()
+        self.assertEqual([m['idmng'] for m in response['results']], expected[5:10])
+
+    def test_cursor_cached_count_and_invalid_cursor(self):
+        params = {'pagination': 'cursor', 'with_count': '1', 'region__code_dr': '01'}
+        self.assertEqual(self.client.get(reverse('menage-list'), params).json()['count'], 12)
+        # Page + version des données ; total lu dans le cache
+        with self.assertNumQueries(2):
+            self.client.get(reverse('menage-list'), params)
+        response = self.client.get(reverse('menage-list'), {'pagination': 'cursor', 'cursor': 'abc'})
+        self.assertEqual(response.status_code, 404)
+
+
+
+def menage_access_paths():
+    """Requêtes représentatives des filtres de MenageViewSet et des vues de statistiques."""
+    return {
+        'liste_region_statut': Menage.objects.filter(region_id='07', statut_menage=Menage.STATUT_COMPLET).order_by('idmng')[:10],
+        'liste_statut': Menage.objects.filter(statut_menage=Menage.STATUT_REFUS).order_by('idmng')[:10],
+        'liste_superviseur': Menage.objects.filter(superviseur_code='SP0703').order_by('idmng')[:10],
+        'enqueteur_periode': Menage.objects.filter(enqueteur_id='ENQ0042', date_enquete__gte=datetime.date(2025, 3, 15)),
+        'attendus_par_region': Menage.objects.filter(tirage=1).values('region', 'is_rural').annotate(n=Count('idmng')).order_by(),
+        'collectes_par_region': Menage.objects.filter(
+            statut_menage__in=[Menage.STATUT_PARTIEL, Menage.STATUT_COMPLET]
+        ).values('region', 'is_rural').annotate(n=Count('idmng')).order_by(),
+        'liste_par_date': Menage.objects.order_by('date_enquete', 'idmng')[:10],
+    }
+
+
+class MenageIndexPlanTests(TestCase):
+
+    @skipUnless(connection.vendor == 'sqlite', "Plans propres à SQLite")
+    def test_filters_use_indexes(self):
+        plans = {name: qs.explain() for name, qs in menage_access_paths().items()}
+        for name, plan in plans.items():
+            self.assertNotIn('SCAN api_menage\n', plan + '\n', f"{name} parcourt toute la table:\n{plan}")
+        self.assertIn('menage_enq_date_idx', plans['enqueteur_periode'])
+        self.assertIn('menage_sup_code_idx', plans['liste_superviseur'])
+        self.assertIn('menage_date_idmng_idx', plans['liste_par_date'])
+
+
+@skipUnless(os.getenv('BENCHMARK_ROWS'), "Benchmark désactivé : définir BENCHMARK_ROWS (ex: 1000000)")
+class MenageIndexBenchmark(TransactionTestCase):
+    """
+    Compare plans (EXPLAIN QUERY PLAN) et temps des requêtes avec et sans les
+    index de `Menage.Meta.indexes`, sur une base peuplée de BENCHMARK_ROWS ménages.
+        BENCHMARK_ROWS=1000000 python manage.py test api.tests.MenageIndexBenchmark
+    """
+
+    def setUp(self):
+        import random
+        rng = random.Random(42)
+        codes = [f"{i:02d}" for i in range(1, 15)]
+        Region.objects.bulk_create([Region(code_dr=code, nom_region=f"DR{code}") for code in codes])
+        Enqueteur.objects.bulk_create([Enqueteur(login_enq=f"ENQ{i:04d}", nom_enqueteur=f"E{i}") for i in range(700)])
+        statuts = [code for code, _ in Menage.STATUT_MENAGE_CHOICES]
+        total = int(os.getenv('BENCHMARK_ROWS'))
+        for start in range(0, total, 50_000):
+            Menage.objects.bulk_create([
+                Menage(
+                    idmng=f"{i:019d}", region_id=rng.choice(codes), statut_menage=rng.choice(statuts),
+                    tirage=rng.randint(0, 1), is_rural=rng.random() < 0.6,
+                    enqueteur_id=f"ENQ{rng.randrange(700):04d}", superviseur_code=f"SP{rng.randrange(1, 15):02d}{rng.randrange(10):02d}",
+                    date_enquete=datetime.date(2025, 3, rng.randint(1, 31)) if rng.random() < 0.9 else None,
+                )
+                for i in range(start, min(start + 50_000, total))
+            ], batch_size=5000)
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE")
+
+    def measure(self):
+        import time
+        results = {}
+        for name, qs in menage_access_paths().items():
+            timings = []
+            for _ in range(3):
+                start = time.perf_counter()
+                list(qs.all())
+                timings.append(time.perf_counter() - start)
+            results[name] = (min(timings) * 1000, qs.explain())
+        return results
+
+    def test_benchmark_indexes(self):
+        with_indexes = self.measure()
+        indexes = Menage._meta.indexes
+        with connection.schema_editor() as editor:
+            for index in indexes:
+                editor.remove_index(Menage, index)
+        try:
+            without_indexes = self.measure()
+        finally:
+            with connection.schema_editor() as editor:
+                for index in indexes:
+                    editor.add_index(Menage, index)
+
+        lines = [f"\n{'requête':<24}{'sans index (ms)':>18}{'avec index (ms)':>18}"]
+        for name, (ms_after, plan_after) in with_indexes.items():
+            ms_before, plan_before = without_indexes[name]
+            lines.append(f"{name:<24}{ms_before:>18.1f}{ms_after:>18.1f}")
+            lines.append(f"    avant: {' | '.join(plan_before.splitlines())}")
+            lines.append(f"    après: {' | '.join(plan_after.splitlines())}")
+        sys.stderr.write('\n'.join(lines) + '\n')
+
+        if connection.vendor == 'sqlite':
+            for name, (_, plan_after) in with_indexes.items():
+                self.assertNotIn('SCAN api_menage\n', plan_after + '\n', f"{name} parcourt toute la table:\n{plan_after}")
+
+
+@skipUnless(connection.vendor == 'sqlite', "Réglages propres à SQLite")
+class SqliteConnectionSettingsTests(TestCase):
+
+    def test_pragmas_applied_on_connect(self):
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA synchronous')
+            self.assertEqual(cursor.fetchone()[0], 1)  # NORMAL
+            cursor.execute('PRAGMA busy_timeout')
+            self.assertGreaterEqual(cursor.fetchone()[0], 1000)
+        self.assertEqual(connection.transaction_mode, 'IMMEDIATE')
+
+
+class CsvJoinTests(TestCase):
+
+    def test_external_sort_and_merge_join(self):
+        key = lambda row: row['idmng']
+        left = [{'idmng': i} for i in ['c', 'a', 'b', 'a', 'd']]
+        right = [{'idmng': 'a', 'v': 1}, {'idmng': 'c', 'v': 2}, {'idmng': 'a', 'v': 3}, {'idmng': 'e', 'v': 4}]
+        with tempfile.TemporaryDirectory() as tmpdir:
+            joined = list(merge_join(
+                external_sort(iter(left), key, tmpdir, chunk_size=2, prefix='l'),
+                external_sort(iter(right), key, tmpdir, chunk_size=2, prefix='r'),
+            ))
+        self.assertEqual(
+            [(l['idmng'], r.get('v')) for l, r in joined],
+            [('a', 3), ('a', 3), ('b', None), ('c', 2), ('d', None)],
+        )
+
+    def test_iter_missing(self):
+        self.assertEqual(list(iter_missing(['1', '2', '3', '5'], ['0', '2', '5', '9'])), ['1', '3'])
+
+
+INFO_GEN_HEADER = "idmng,cp_trimestre,cp_superviseur,cp_grappe,cp_cons,cp_men,taille_men,nbr_eligible,date_enq_human,nom_de_l_enqueteur,login_enq\n"
+INFO_MEN_RECORD_HEADER = "idmng,hh_trimestre,superviseur,dr,cons,num_men,statut,tirage,ech_adresse\n"
+
+
+class ImportCsvMixin:
+
+    def write_csv(self, name, header, lines):
+        path = os.path.join(self.tmpdir.name, name)
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(header + "".join(line + "\n" for line in lines))
+        return path
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        self.info_gen = self.write_csv('INFO_GEN.CSV', INFO_GEN_HEADER, [
+            "0100000001,2025T1,SP0101,010100000001,00001,01,5,3,2025-03-01,AWA NDIAYE,010101",
+            "1000000002,2025T1,SP0110,100100000002,00002,01,4,2,,MODOU FALL,011001",
+            "1000000002,2025T1,SP0110,100100000002,00002,01,4,2,,MODOU FALL,011001",
+            "9900000003,2025T1,SP0199,990100000003,00003,01,4,2,,INCONNU,019901",
+        ])
+        self.info_men_record = self.write_csv('INFO_MEN_RECORD.CSV', INFO_MEN_RECORD_HEADER, [
+            "0100000001,2025T1,SP0101,010100000001,00001,01,COMPLET,Tiré,DAKAR PLATEAU",
+            "1000000002,2025T1,SP0110,100100000002,00002,01,REFUS,Copté,",
+        ])
+
+
+class ImportDataTests(ImportCsvMixin, TestCase):
+
+    def run_import(self, *args):
+        call_command(
+            'import_data', '--info-gen', self.info_gen, '--info-men-record', self.info_men_record,
+            *args, stdout=StringIO(), stderr=StringIO()
+        )
+
+    def test_import_creates_menages_and_counters(self):
+        self.run_import('--batch-size', '1', '--sort-chunk-size', '1')
+
+        self.assertEqual(Region.objects.count(), 14)
+        self.assertEqual(Menage.objects.count(), 2)
+        dakar = Menage.objects.get(idmng='0100000001')
+        self.assertEqual(dakar.region_id, '01')
+        self.assertEqual(dakar.enqueteur_id, '010101')
+        self.assertEqual(dakar.enqueteur.superviseur_id, 'SP0101')
+        self.assertEqual(dakar.statut_menage, Menage.STATUT_COMPLET)
+        self.assertEqual(dakar.tirage, 1)
+        self.assertFalse(dakar.is_rural)
+        kolda = Menage.objects.get(idmng='1000000002')
+        self.assertEqual((kolda.statut_menage, kolda.tirage, kolda.is_rural), (Menage.STATUT_REFUS, 0, True))
+        self.assertEqual(current_counters(), recount())
+        # Hiérarchie géographique tirée du code grappe long
+        self.assertEqual(
+            (dakar.departement_id, dakar.commune_id, dakar.grappe_id), ('010', '010100', '010100000001')
+        )
+        self.assertEqual(Commune.objects.get(pk='010100').departement.region_id, '01')
+        self.assertEqual(diff_counters(), [])
+
+    def test_parallel_import_matches_serial(self):
+        self.run_import()
+        serial = list(Menage.objects.order_by('idmng').values())
+        self.run_import('--workers', '3', '--batch-size', '1')
+        self.assertEqual(list(Menage.objects.order_by('idmng').values()), serial)
+
+    def test_incremental_import_upserts_changes_only(self):
+        self.run_import()
+        unchanged_hash = Menage.objects.get(idmng='0100000001').source_hash
+        self.assertTrue(unchanged_hash)
+
+        self.write_csv('INFO_GEN.CSV', INFO_GEN_HEADER, [
+            "0100000001,2025T1,SP0101,010100000001,00001,01,5,3,2025-03-01,AWA NDIAYE,010101",
+            "1000000002,2025T1,SP0110,100100000002,00002,01,4,2,,MODOU FALL,011001",
+            "0700000004,2025T1,SP0107,070100000004,00004,01,6,4,,FATOU SARR,010701",
+        ])
+        self.write_csv('INFO_MEN_RECORD.CSV', INFO_MEN_RECORD_HEADER, [
+            "0100000001,2025T1,SP0101,010100000001,00001,01,COMPLET,Tiré,DAKAR PLATEAU",
+            "1000000002,2025T1,SP0110,100100000002,00002,01,PARTIEL,Tiré,",
+        ])
+        Menage.objects.filter(idmng='0100000001').update(nom_cm='MODIFIE')
+        Menage.objects.create(idmng='OLD0001', region_id='01', statut_menage=Menage.STATUT_AFFECTE)
+
+        out = StringIO()
+        call_command(
+            'import_data', '--incremental', '--delete-missing', '--info-gen', self.info_gen,
+            '--info-men-record', self.info_men_record, stdout=out, stderr=StringIO()
+        )
+
+        self.assertIn("1 ménages créés", out.getvalue())
+        self.assertIn("1 ménages modifiés, 1 inchangés, 1 supprimés", out.getvalue())
+        # Ligne inchangée à la source : non réécrite
+        self.assertEqual(Menage.objects.get(idmng='0100000001').nom_cm, 'MODIFIE')
+        kolda = Menage.objects.get(idmng='1000000002')
+        self.assertEqual((kolda.statut_menage, kolda.tirage), (Menage.STATUT_PARTIEL, 1))
+        self.assertTrue(Menage.objects.filter(idmng='0700000004').exists())
+        self.assertFalse(Menage.objects.filter(idmng='OLD0001').exists())
+        self.assertEqual(current_counters(), recount())
+        # Index de recherche tenu à jour lot par lot
+        for query, attendu in [('fatou sarr', ['0700000004']), ('awa', ['0100000001'])]:
+            trouves = Menage.objects.filter(pk__in=search_filter(query)).values_list('idmng', flat=True)
+            self.assertEqual(list(trouves), attendu)
+
+    def test_failed_reload_keeps_existing_rows(self):
+        Region.objects.create(code_dr='01', nom_region='DAKAR')
+        Menage.objects.create(idmng='OLD0001', region_id='01', statut_menage=Menage.STATUT_AFFECTE)
+        stderr = StringIO()
+        appels = []
+
+        def second_batch_fails(rows):
+            appels.append(rows)
+            if len(appels) > 1:
+                raise RuntimeError("panne")
+            ensure_geo_nodes(rows)
+
+        with mock.patch('api.management.commands.import_data.ensure_geo_nodes', side_effect=second_batch_fails):
+            call_command(
+                'import_data', '--info-gen', self.info_gen, '--info-men-record', self.info_men_record,
+                '--batch-size', '1', stdout=StringIO(), stderr=stderr,
+            )
+        self.assertIn("panne", stderr.getvalue())
+        # Premier lot validé ; rien n'est supprimé avant la fin des écritures
+        self.assertEqual(sorted(Menage.objects.values_list('idmng', flat=True)), ['0100000001', 'OLD0001'])
+        self.assertEqual(diff_counters(), [])
+
+    def test_reload_prunes_missing_data(self):
+        old = Enqueteur.objects.create(login_enq='999999', nom_enqueteur='ANCIEN')
+        Region.objects.create(code_dr='07', nom_region='THIES')
+        Menage.objects.create(
+            idmng='OLD0001', region_id='07', statut_menage=Menage.STATUT_COMPLET, enqueteur=old,
+            date_enquete=datetime.date(2025, 1, 2),
+        )
+        rebuild_counters()
+        self.run_import('--batch-size', '1')
+        self.assertEqual(sorted(Menage.objects.values_list('idmng', flat=True)), ['0100000001', '1000000002'])
+        self.assertFalse(Enqueteur.objects.filter(login_enq='999999').exists())
+        self.assertEqual(diff_counters(), [])
+        trouves = Menage.objects.filter(pk__in=search_filter('awa')).values_list('idmng', flat=True)
+        self.assertEqual(list(trouves), ['0100000001'])
+
+    def test_incremental_failure_keeps_counters_of_written_batches(self):
+        Menage.objects.create(idmng='OLD0001', region_id='01', statut_menage=Menage.STATUT_AFFECTE)
+        with mock.patch('api.management.commands.import_data.remove_from_index', side_effect=RuntimeError("panne")):
+            with self.assertRaises(RuntimeError):
+                self.run_import('--incremental', '--delete-missing', '--batch-size', '1')
+        # Lots écrits conservés et comptés ; la suppression en échec est annulée
+        self.assertEqual(Menage.objects.count(), 3)
+        self.assertEqual(diff_counters(), [])
+
+
+class ImportJobTests(ImportCsvMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        upload_dir = os.path.join(self.tmpdir.name, 'uploads')
+        settings_override = override_settings(IMPORT_UPLOAD_DIR=upload_dir, IMPORT_JOBS_IN_PROCESS=False)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.admin = get_user_model().objects.create_superuser('admin', 'admin@example.com', 'secret')
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def upload(self, **data):
+        with open(self.info_gen, 'rb') as info_gen, open(self.info_men_record, 'rb') as info_men_record:
+            return self.client.post(
+                reverse('importjob-list'), {'info_gen': info_gen, 'info_men_record': info_men_record, **data},
+                format='multipart',
+            )
+
+    def test_upload_queues_job_and_worker_reports_progress(self):
+        response = self.upload()
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.data['statut'], ImportJob.STATUT_EN_ATTENTE)
+        job = ImportJob.objects.get(pk=response.data['id'])
+        self.assertEqual(job.cree_par, self.admin)
+        self.assertTrue(os.path.exists(job.info_gen_path))
+
+        self.assertEqual(run_next_job().pk, job.pk)
+        self.assertIsNone(run_next_job())
+
+        data = self.client.get(reverse('importjob-detail', args=[job.pk])).data
+        self.assertEqual(data['statut'], ImportJob.STATUT_TERMINE)
+        self.assertEqual((data['lignes_lues'], data['lignes_ecrites'], data['erreurs']), (2, 2, []))
+        self.assertEqual(data['resultat']['crees'], 2)
+        self.assertIsNotNone(data['fin'])
+        self.assertEqual(Menage.objects.count(), 2)
+        # Fichiers envoyés supprimés après un import réussi
+        self.assertFalse(os.path.exists(os.path.dirname(job.info_gen_path)))
+
+    def test_failed_import_records_errors(self):
+        Region.objects.create(code_dr='01', nom_region='DAKAR')
+        Menage.objects.create(idmng='OLD0001', region_id='01', statut_menage=Menage.STATUT_AFFECTE)
+        job = ImportJob.objects.get(pk=self.upload().data['id'])
+        os.remove(job.info_men_record_path)
+        run_next_job()
+        job.refresh_from_db()
+        self.assertEqual(job.statut, ImportJob.STATUT_ECHEC)
+        self.assertTrue(job.erreurs)
+        # Fichier illisible détecté avant toute suppression : la base est intacte
+        self.assertEqual(list(Menage.objects.values_list('idmng', flat=True)), ['OLD0001'])
+        self.assertEqual(Region.objects.count(), 1)
+        # Fichiers conservés pour analyse
+        self.assertTrue(os.path.exists(job.info_gen_path))
+
+    def test_only_one_import_runs_at_a_time(self):
+        first = ImportJob.objects.get(pk=self.upload().data['id'])
+        second = ImportJob.objects.get(pk=self.upload().data['id'])
+        self.assertTrue(start_job(first))
+        with self.assertRaises(ImportAlreadyRunning):
+            start_job(second)
+        # manage.py import_data prend le même verrou
+        with self.assertRaises(CommandError):
+            call_command(
+                'import_data', '--info-gen', self.info_gen, '--info-men-record', self.info_men_record,
+                stdout=StringIO(), stderr=StringIO(),
+            )
+        self.assertEqual(ImportJob.objects.count(), 2)
+
+    def test_stale_running_import_releases_lock(self):
+        first = ImportJob.objects.get(pk=self.upload().data['id'])
+        start_job(first)
+        self.upload()
+        # Processus disparu (ici : lancé sur une autre machine, invérifiable)
+        ImportJob.objects.filter(pk=first.pk).update(
+            mis_a_jour=timezone.now() - datetime.timedelta(hours=2), hote='autre-machine',
+        )
+        with override_settings(IMPORT_JOBS_STALE_TIMEOUT=60):
+            self.assertEqual(run_next_job().statut, ImportJob.STATUT_TERMINE)
+        first.refresh_from_db()
+        self.assertEqual((first.statut, first.phase), (ImportJob.STATUT_ECHEC, 'interrompu'))
+
+    def test_stale_import_of_live_process_keeps_lock(self):
+        first = ImportJob.objects.get(pk=self.upload().data['id'])
+        start_job(first)
+        self.assertEqual((first.hote, first.pid), (socket.gethostname(), os.getpid()))
+        self.upload()
+        ImportJob.objects.filter(pk=first.pk).update(mis_a_jour=timezone.now() - datetime.timedelta(hours=2))
+        # Import long sans avancement publié, mais processus toujours vivant : pas repris
+        with override_settings(IMPORT_JOBS_STALE_TIMEOUT=60):
+            self.assertEqual(recover_stale_jobs(), 0)
+            with self.assertRaises(ImportAlreadyRunning):
+                run_next_job()
+        first.refresh_from_db()
+        self.assertEqual(first.statut, ImportJob.STATUT_EN_COURS)
+
+    def test_progress_heartbeat_refreshes_job(self):
+        job = ImportJob.objects.get(pk=self.upload().data['id'])
+        start_job(job)
+        ancien = timezone.now() - datetime.timedelta(hours=2)
+        ImportJob.objects.filter(pk=job.pk).update(mis_a_jour=ancien)
+        self.assertEqual(list(ImportProgress(job).beating(range(3))), [0, 1, 2])
+        job.refresh_from_db()
+        self.assertGreater(job.mis_a_jour, ancien)
+
+    def test_command_line_import_is_recorded(self):
+        call_command(
+            'import_data', '--info-gen', self.info_gen, '--info-men-record', self.info_men_record,
+            stdout=StringIO(), stderr=StringIO(),
+        )
+        job = ImportJob.objects.get()
+        self.assertEqual((job.source, job.statut, job.lignes_lues), (ImportJob.SOURCE_COMMANDE, ImportJob.STATUT_TERMINE, 2))
+
+    def test_requires_admin_and_both_files(self):
+        self.assertEqual(self.client.post(reverse('importjob-list'), {}, format='multipart').status_code, 400)
+        user = get_user_model().objects.create_user('agent', password='secret')
+        self.client.force_authenticate(user)
+        self.assertEqual(self.upload().status_code, 403)
+        self.assertEqual(self.client.get(reverse('importjob-list')).status_code, 403)
+
+
+class GenerateDataTests(TestCase):
+
+    def test_generated_csv_round_trips_through_import(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            call_command('generate_data', '--menages', '280', '--output-dir', tmpdir, stdout=StringIO())
+            call_command(
+                'import_data', '--info-gen', os.path.join(tmpdir, 'INFO_GEN.CSV'),
+                '--info-men-record', os.path.join(tmpdir, 'INFO_MEN_RECORD.CSV'), stdout=StringIO(),
+            )
+        self.assertEqual(Menage.objects.count(), 280)
+        self.assertEqual(Menage.objects.values('region').distinct().count(), 14)
+        self.assertEqual(current_counters(), recount())
+
+    def test_database_mode_matches_csv_import(self):
+        call_command('generate_data', '--menages', '140', '--database', '--seed', '7', stdout=StringIO())
+        direct = dict(Menage.objects.values_list('idmng', 'source_hash'))
+        with tempfile.TemporaryDirectory() as tmpdir:
+            call_command('generate_data', '--menages', '140', '--seed', '7', '--output-dir', tmpdir, stdout=StringIO())
+            call_command(
+                'import_data', '--info-gen', os.path.join(tmpdir, 'INFO_GEN.CSV'),
+                '--info-men-record', os.path.join(tmpdir, 'INFO_MEN_RECORD.CSV'), stdout=StringIO(),
+            )
+        self.assertEqual(dict(Menage.objects.values_list('idmng', 'source_hash')), direct)
+
+    def test_invalid_distribution(self):
+        with self.assertRaises(CommandError):
+            call_command('generate_data', '--menages', '10', '--statuts', 'COMPLET', stdout=StringIO())
+
+    def test_percentiles(self):
+        self.assertEqual(percentile([1, 2, 3, 4], 50), 2.5)
+        summary = summarize([0.001, 0.002, 0.003])
+        self.assertEqual((summary['min_ms'], summary['p50_ms'], summary['max_ms']), (1.0, 2.0, 3.0))
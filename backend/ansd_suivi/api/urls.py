@@ -2,18 +2,26 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from .views import (
-    RegionViewSet, EnqueteurViewSet, MenageViewSet,
-    GlobalStatsAPIView, RegionStatsAPIView
+    RegionViewSet, EnqueteurViewSet, MenageViewSet, ImportJobViewSet,
+    GlobalStatsAPIView, RegionStatsAPIView, TimelineStatsAPIView, StatsStreamView, GeoTreeStatsAPIView,
+    EnqueteurLeaderboardAPIView, SuperviseurLeaderboardAPIView, PerfAPIView
 )
 
 router = DefaultRouter()
 router.register(r'regions', RegionViewSet)
 router.register(r'enqueteurs', EnqueteurViewSet)
 router.register(r'menages', MenageViewSet)
+router.register(r'imports', ImportJobViewSet)
 
 urlpatterns = [
     path('', include(router.urls)),
     path('stats/global/', GlobalStatsAPIView.as_view(), name='global-stats'),
     path('stats/regions/', RegionStatsAPIView.as_view(), name='region-stats'),
+    path('stats/stream/', StatsStreamView.as_view(), name='stats-stream'),
+    path('stats/tree/', GeoTreeStatsAPIView.as_view(), name='geo-tree-stats'),
+    path('stats/timeline/', TimelineStatsAPIView.as_view(), name='timeline-stats'),
+    path('stats/enqueteurs/', EnqueteurLeaderboardAPIView.as_view(), name='enqueteur-leaderboard'),
+    path('stats/superviseurs/', SuperviseurLeaderboardAPIView.as_view(), name='superviseur-leaderboard'),
+    path('_perf/', PerfAPIView.as_view(), name='perf'),
     # path('menages-details/', MenagesParStatutRegionAPIView.as_view(), name='menages-par-statut-region'),
 ]
\ No newline at end of file
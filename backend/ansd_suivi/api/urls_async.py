@@ -0,0 +1,16 @@
+# api/urls_async.py
+"""Routes servies par les vues asynchrones sous ASGI (voir api/asgi.py), avec les mêmes noms qu'en WSGI."""
+from django.urls import path
+
+from .async_views import AsyncGlobalStatsView, AsyncMenageListView, AsyncRegionStatsView
+from .views import GlobalStatsAPIView, MenageViewSet, RegionStatsAPIView
+
+urlpatterns = [
+    path('stats/global/', AsyncGlobalStatsView.as_view(fallback=GlobalStatsAPIView.as_view()), name='global-stats'),
+    path('stats/regions/', AsyncRegionStatsView.as_view(fallback=RegionStatsAPIView.as_view()), name='region-stats'),
+    path(
+        'menages/',
+        AsyncMenageListView.as_view(fallback=MenageViewSet.as_view({'get': 'list', 'post': 'create'})),
+        name='menage-list',
+    ),
+]
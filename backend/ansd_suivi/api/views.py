@@ -1,15 +1,40 @@
 # api/views.py
-from django.db.models import Count, Q
-from rest_framework import viewsets, generics
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.utils.dateparse import parse_date
+from django.views import View
+from django_filters.rest_framework import DjangoFilterBackend
+from rest_framework import mixins, viewsets, status
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.pagination import PageNumberPagination
+from rest_framework.parsers import MultiPartParser
+from rest_framework.permissions import IsAdminUser
 
-from .models import Region, Superviseur, Enqueteur, Menage
+from .models import Region, Enqueteur, Menage, ImportJob
+from .bulk import bulk_update_menages, summarize_bulk_results
 from .serializers import (
-    RegionSerializer, SuperviseurSerializer, EnqueteurSerializer,
-    MenageSerializer, MenageListSerializer
+    RegionSerializer, EnqueteurSerializer,
+    MenageSerializer, MenageListSerializer, MenageBulkUpdateSerializer, MENAGE_DETAIL_FIELDS,
+    ImportJobSerializer, ImportJobCreateSerializer,
 )
+from .cache import cache_api_response, cached_for_data_version
+from .export import EXPORT_RENDERER_CLASSES, get_export_columns, stream_export
+from .fieldsets import get_requested_fields
+from .pagination import MenageCursorPagination
+from .search import MenageSearchFilter, filter_search
+from .stream import stats_snapshot_response, stats_stream_response
+from .perf import get_buffer, summarize_buffer
+from .stats import (
+    GROUP_BY_FIELDS, LEADERBOARD_ORDERING, TIMELINE_GROUP_BY, TIMELINE_MAX_DAYS,
+    compute_global_stats, compute_grouped_stats, compute_leaderboard, compute_timeline, compute_tree,
+    sort_leaderboard,
+)
+from .geo import GEO_LEVEL_NAMES
+from .imports import create_job
 
 # pagination
 class StandardResultsSetPagination(PageNumberPagination):
@@ -27,6 +52,10 @@ class RegionViewSet(viewsets.ReadOnlyModelViewSet):
     serializer_class = RegionSerializer
     pagination_class = None  
 
+    @cache_api_response
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
 
 class EnqueteurViewSet(viewsets.ReadOnlyModelViewSet):
     """
@@ -41,7 +70,11 @@ class EnqueteurViewSet(viewsets.ReadOnlyModelViewSet):
 class MenageViewSet(viewsets.ModelViewSet):
     """
     ViewSet pour les opérations CRUD sur les Ménages.
-    La liste est paginée et filtrable.
+    La liste est paginée et filtrable. `?pagination=cursor` active la
+    pagination par curseur (voir api/pagination.py) pour les parcours profonds.
+    `?search=` filtre par recherche plein texte (voir api/search.py).
+    `?fields=` / `?omit=` limitent les champs renvoyés, et les colonnes lues,
+    pour la liste, le détail et l'export (voir api/fieldsets.py).
     """
     queryset = Menage.objects.select_related('region', 'enqueteur__superviseur').order_by('idmng')
     serializer_class = MenageSerializer 
@@ -56,117 +89,276 @@ class MenageViewSet(viewsets.ModelViewSet):
         'is_rural': ['exact'],
         'tirage': ['exact']
     }
+    filter_backends = [DjangoFilterBackend, MenageSearchFilter]
     pagination_class = StandardResultsSetPagination
 
+    @property
+    def paginator(self):
+        if not hasattr(self, '_paginator'):
+            if self.request is not None and self.request.query_params.get('pagination') == 'cursor':
+                self._paginator = MenageCursorPagination()
+            else:
+                self._paginator = self.pagination_class()
+        return self._paginator
+
     def get_serializer_class(self):
         if self.action == 'list':
             return MenageListSerializer
         return super().get_serializer_class()
 
+    def get_sparse_fields(self):
+        """Champs demandés par `?fields=` / `?omit=`, ou None pour la représentation par défaut."""
+        default = MenageListSerializer.Meta.fields if self.action == 'list' else MENAGE_DETAIL_FIELDS
+        return get_requested_fields(self.request.query_params, MENAGE_DETAIL_FIELDS, default)
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action == 'retrieve':
+            fields = self.get_sparse_fields()
+            if fields is not None:
+                queryset = MenageSerializer.narrow_queryset(queryset, fields)
+        return queryset
+
+    def get_serializer(self, *args, **kwargs):
+        if self.action == 'retrieve':
+            kwargs['fields'] = self.get_sparse_fields()
+        return super().get_serializer(*args, **kwargs)
+
+    def list(self, request, *args, **kwargs):
+        # Lecture rapide : .values() + dicts construits directement (voir MenageListSerializer)
+        fields = self.get_sparse_fields()
+        queryset = MenageListSerializer.values_queryset(self.filter_queryset(self.get_queryset()), fields)
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(MenageListSerializer.serialize_values(page, fields))
+        return Response(MenageListSerializer.serialize_values(queryset, fields))
+
+    @action(detail=False, methods=['get'], renderer_classes=EXPORT_RENDERER_CLASSES)
+    def export(self, request, *args, **kwargs):
+        """
+        Export complet (non paginé) des ménages, en flux, avec les mêmes filtres
+        que la liste. Format: `?format=csv` (défaut), `?format=ndjson` ou
+        `?format=msgpack` (si le paquet msgpack est installé).
+        `?fields=` / `?omit=` portent sur les colonnes de l'export.
+        """
+        columns = get_export_columns(request.query_params)
+        queryset = self.filter_queryset(Menage.objects.order_by('idmng'))
+        return stream_export(queryset, request.accepted_renderer.format, columns)
+
+    @action(detail=False, methods=['post'])
+    def bulk(self, request, *args, **kwargs):
+        """
+        Mise à jour en masse (voir api/bulk.py). Corps JSON :
+        `{"idmng": [...], "changes": {...}}` ou `{"filter": {...}, "changes": {...}}`,
+        `filter` acceptant les mêmes paramètres que la liste (dont `search`).
+        Retourne le résultat par ménage : modifie, inchange ou introuvable.
+        """
+        serializer = MenageBulkUpdateSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        if 'idmng' in data:
+            queryset = Menage.objects.filter(idmng__in=data['idmng'])
+        else:
+            queryset = self.filter_from_payload(data['filter'])
+        resultats = bulk_update_menages(queryset, data['changes'], data.get('idmng'))
+        return Response(summarize_bulk_results(resultats))
+
+    def filter_from_payload(self, filters):
+        """Ménages correspondant à un dict de filtres (mêmes clés que les paramètres de la liste)."""
+        filters = dict(filters)
+        search = filters.pop('search', '')
+        filterset_class = DjangoFilterBackend().get_filterset_class(self, Menage.objects.all())
+        inconnus = set(filters) - set(filterset_class.base_filters)
+        if inconnus:
+            raise ValidationError({'filter': f"Filtres inconnus: {', '.join(sorted(inconnus))}."})
+        filterset = filterset_class(data=filters, queryset=Menage.objects.all(), request=self.request)
+        if not filterset.is_valid():
+            raise ValidationError({'filter': filterset.errors})
+        return filter_search(filterset.qs, str(search))
+
+
+class ImportJobViewSet(mixins.CreateModelMixin, viewsets.ReadOnlyModelViewSet):
+    """
+    Imports CSV en arrière-plan (voir api/imports.py), réservés aux administrateurs.
+    POST (multipart : `info_gen`, `info_men_record`, `incremental`,
+    `delete_missing`) met l'import en file et répond 202 ; GET /api/imports/<id>/
+    donne son état et son avancement (lignes lues / écrites, débit, erreurs).
+    """
+    queryset = ImportJob.objects.all()
+    serializer_class = ImportJobSerializer
+    permission_classes = [IsAdminUser]
+    pagination_class = StandardResultsSetPagination
+    parser_classes = [MultiPartParser]
+    filterset_fields = ['statut', 'source']
+
+    def create(self, request, *args, **kwargs):
+        serializer = ImportJobCreateSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        job = create_job(user=request.user, **serializer.validated_data)
+        return Response(ImportJobSerializer(job).data, status=status.HTTP_202_ACCEPTED)
+
 
 # --- Vues API pour les Statistiques ---
 class GlobalStatsAPIView(APIView):
     """
     Vue API pour récupérer les statistiques globales des enquêtes.
+    Tous les compteurs sont calculés en une seule requête (voir api/stats.py).
     """
+    @cache_api_response
     def get(self, request, *args, **kwargs):
-        menages_attendus_qs = Menage.objects.filter(tirage=1)
-        total_menages_attendus = menages_attendus_qs.count()
-        rural_attendus = menages_attendus_qs.filter(is_rural=True).count()
-        urbain_attendus = total_menages_attendus - rural_attendus
-
-        menages_collectes_qs = Menage.objects.filter(
-            Q(statut_menage=Menage.STATUT_COMPLET) | Q(statut_menage=Menage.STATUT_PARTIEL)
-        )
-        total_menages_collectes = menages_collectes_qs.count()
-        rural_collectes = menages_collectes_qs.filter(is_rural=True).count()
-        urbain_collectes = total_menages_collectes - rural_collectes
-
-        taux_couverture_global = ((total_menages_collectes / total_menages_attendus) * 100) if total_menages_attendus > 0 else 0
-        taux_couverture_rural = ((rural_collectes / rural_attendus) * 100) if rural_attendus > 0 else 0
-        taux_couverture_urbain = ((urbain_collectes / urbain_attendus) * 100) if urbain_attendus > 0 else 0
-        
-        # Récupérer tous les statuts possibles 
-        all_statuts_choices = dict(Menage.STATUT_MENAGE_CHOICES)
-        statuts_counts_db = Menage.objects.values('statut_menage').annotate(count=Count('idmng')).order_by('statut_menage')
-
-        # Convertir en un dictionnaire pour un accès facile
-        counts_map = {item['statut_menage']: item['count'] for item in statuts_counts_db}
-
-        readable_statuts_counts = []
-        for code, nom in all_statuts_choices.items():
-            readable_statuts_counts.append({
-                "statut_code": code, #  filtrer par code
-                "statut_nom": nom,
-                "count": counts_map.get(code, 0) # Mettre 0 si le statut n'a pas de ménages
-            })
-        # Trier par code pour un ordre 
-        readable_statuts_counts.sort(key=lambda x: x['statut_code'])
-
-
-        data = {
-            "menages_attendus": {
-                "total": total_menages_attendus,
-                "rural": rural_attendus,
-                "urbain": urbain_attendus,
-            },
-            "menages_collectes": {
-                "total": total_menages_collectes,
-                "rural": rural_collectes,
-                "urbain": urbain_collectes,
-            },
-            "taux_de_couverture": {
-                "global": round(taux_couverture_global, 2),
-                "rural": round(taux_couverture_rural, 2),
-                "urbain": round(taux_couverture_urbain, 2),
-            },
-            "repartition_statuts": readable_statuts_counts,
-        }
-        return Response(data)
+        return Response(compute_global_stats())
+
+
+class StatsStreamView(View):
+    """
+    Flux Server-Sent Events des variations de compteurs (voir api/stream.py),
+    à la place du rafraîchissement périodique de stats/global/ et stats/regions/.
+    Le flux continu nécessite un serveur ASGI (ansd_suivi/asgi.py) ; en WSGI,
+    seul le snapshot est renvoyé et le client se reconnecte périodiquement.
+    """
+    async def get(self, request, *args, **kwargs):
+        if isinstance(request, ASGIRequest):
+            return await stats_stream_response()
+        return await sync_to_async(stats_snapshot_response)()
 
 
 class RegionStatsAPIView(APIView):
     """
     Vue API pour récupérer les statistiques d'enquête par région.
+    Le paramètre optionnel `?group_by=region|superviseur|enqueteur|cons_code`
+    permet de descendre à un autre niveau avec le même nombre de requêtes.
+    """
+    @cache_api_response
+    def get(self, request, *args, **kwargs):
+        group_by = request.query_params.get('group_by', 'region')
+        if group_by not in GROUP_BY_FIELDS:
+            return Response(
+                {"detail": f"group_by doit être parmi: {', '.join(GROUP_BY_FIELDS)}"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        return Response(compute_grouped_stats(group_by))
+
+
+class GeoTreeStatsAPIView(APIView):
     """
+    Exploration de la hiérarchie région → département → commune → grappe :
+    couverture d'un nœud et de ses enfants directs, lue dans les compteurs
+    géographiques précalculés (voir api/counters.py).
+
+    Paramètres: `niveau` (region|departement|commune|grappe) et `code` ;
+    sans paramètre, nœud national et liste des régions.
+    """
+    @cache_api_response
+    def get(self, request, *args, **kwargs):
+        niveau = request.query_params.get('niveau') or None
+        code = request.query_params.get('code') or None
+        if niveau is not None and niveau not in GEO_LEVEL_NAMES:
+            return Response(
+                {"detail": f"niveau doit être parmi: {', '.join(GEO_LEVEL_NAMES)}"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        if (niveau is None) != (code is None):
+            return Response({"detail": "niveau et code vont ensemble."}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            return Response(compute_tree(niveau, code))
+        except LookupError:
+            return Response({"detail": f"{niveau} {code} introuvable."}, status=status.HTTP_404_NOT_FOUND)
+
+
+class TimelineStatsAPIView(APIView):
+    """
+    Ménages collectés par jour (et cumul, moyenne mobile, date de fin
+    projetée), lus dans la table de compteurs journaliers.
+
+    Paramètres: `group_by=region|enqueteur|total` (défaut: region),
+    `from` / `to` (AAAA-MM-JJ, inclus), `window` (jours de la moyenne mobile, défaut 7).
+    """
+    @cache_api_response
+    def get(self, request, *args, **kwargs):
+        params = request.query_params
+        group_by = params.get('group_by', 'region')
+        if group_by not in TIMELINE_GROUP_BY:
+            return self.bad_request(f"group_by doit être parmi: {', '.join(TIMELINE_GROUP_BY)}")
+        try:
+            date_from = self.parse_date_param(params.get('from'))
+            date_to = self.parse_date_param(params.get('to'))
+        except ValueError:
+            return self.bad_request("from / to doivent être des dates au format AAAA-MM-JJ.")
+        if date_from and date_to and not 0 <= (date_to - date_from).days < TIMELINE_MAX_DAYS:
+            return self.bad_request(f"La période doit aller de from à to, sur au plus {TIMELINE_MAX_DAYS} jours.")
+        try:
+            window = int(params.get('window', 7))
+        except ValueError:
+            window = 0
+        if not 1 <= window <= 90:
+            return self.bad_request("window doit être un entier entre 1 et 90.")
+        return Response(compute_timeline(group_by, date_from, date_to, window))
+
+    @staticmethod
+    def parse_date_param(value):
+        """Date AAAA-MM-JJ, ou None si absente ; ValueError si invalide."""
+        if not value:
+            return None
+        date = parse_date(value)
+        if date is None:
+            raise ValueError(value)
+        return date
+
+    @staticmethod
+    def bad_request(detail):
+        return Response({"detail": detail}, status=status.HTTP_400_BAD_REQUEST)
+
+
+class LeaderboardAPIView(APIView):
+    """
+    Classement de productivité (enquêteurs ou superviseurs), paginé et trié
+    côté serveur : `?ordering=-taux_de_couverture`, `?page=`, `?page_size=`.
+
+    Le classement complet est calculé en une agrégation groupée et mis en
+    cache jusqu'au prochain changement des données ; le tri et la pagination
+    se font ensuite en mémoire.
+    """
+    group_by = None
+    default_ordering = '-menages_collectes'
+
+    @cache_api_response
     def get(self, request, *args, **kwargs):
-        regions_data = []
-        all_statuts_choices = dict(Menage.STATUT_MENAGE_CHOICES)
-        regions = Region.objects.all().order_by('code_dr')
-
-        for region in regions:
-            menages_region_qs = Menage.objects.filter(region=region)
-
-            attendus_region = menages_region_qs.filter(tirage=1).count()
-            collectes_region = menages_region_qs.filter(
-                Q(statut_menage=Menage.STATUT_COMPLET) | Q(statut_menage=Menage.STATUT_PARTIEL)
-            ).count()
-
-            taux_couverture_region = ((collectes_region / attendus_region) * 100) if attendus_region > 0 else 0 
-
-            statuts_region_counts_db = menages_region_qs.values('statut_menage').annotate(count=Count('idmng')).order_by('statut_menage')
-            counts_map_region = {item['statut_menage']: item['count'] for item in statuts_region_counts_db}
-            
-            readable_statuts_region_counts = []
-            for code, nom in all_statuts_choices.items():
-                 readable_statuts_region_counts.append({
-                    "statut_code": code,
-                    "statut_nom": nom,
-                    "count": counts_map_region.get(code, 0)
-                })
-            readable_statuts_region_counts.sort(key=lambda x: x['statut_code'])
-            
-            regions_data.append({
-                "code_dr": region.code_dr,
-                "nom_region": region.nom_region,
-                "menages_attendus": attendus_region,
-                "menages_collectes": collectes_region,
-                "taux_de_couverture": round(taux_couverture_region, 2),
-                "repartition_statuts": readable_statuts_region_counts,
-            })
-
-
-        return Response(regions_data)
+        ordering = request.query_params.get('ordering', self.default_ordering)
+        if ordering.lstrip('-') not in LEADERBOARD_ORDERING:
+            return Response(
+                {"detail": f"ordering doit être parmi: {', '.join(LEADERBOARD_ORDERING)} (préfixe - pour décroissant)"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        entries = cached_for_data_version(f"leaderboard:{self.group_by}", lambda: compute_leaderboard(self.group_by))
+        paginator = StandardResultsSetPagination()
+        page = paginator.paginate_queryset(sort_leaderboard(entries, ordering), request, view=self)
+        return paginator.get_paginated_response(page)
+
 
+class EnqueteurLeaderboardAPIView(LeaderboardAPIView):
+    """Classement des enquêteurs (voir LeaderboardAPIView)."""
+    group_by = 'enqueteur'
 
 
+class SuperviseurLeaderboardAPIView(LeaderboardAPIView):
+    """Classement des superviseurs, par code superviseur des ménages (voir LeaderboardAPIView)."""
+    group_by = 'superviseur'
+
+
+# --- Instrumentation ---
+class PerfAPIView(APIView):
+    """
+    Résumé des mesures du middleware PerfMiddleware (voir api/perf.py) pour ce
+    processus : endpoints les plus lents, requêtes SQL les plus lentes et N+1
+    détectés. Réservé aux administrateurs.
+    """
+    permission_classes = [IsAdminUser]
+
+    def get(self, request, *args, **kwargs):
+        try:
+            limit = max(1, int(request.query_params.get('limit', 20)))
+        except ValueError:
+            limit = 20
+        payload = summarize_buffer(get_buffer(), limit=limit)
+        payload['enabled'] = settings.API_PERF_ENABLED
+        return Response(payload)
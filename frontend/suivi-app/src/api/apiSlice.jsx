@@ -90,9 +90,36 @@
 // } = apiSlice;
 // src/api/apiSlice.js
 import { createApi, fetchBaseQuery } from '@reduxjs/toolkit/query/react';
+import { applyGlobalDeltas, applyRegionDeltas, subscribeStatsStream } from './statsStream';
 
 const BASE_URL = process.env.REACT_APP_BASE_URL || 'http://localhost:8000/api/';
 
+// Met à jour en place une requête de statistiques avec les deltas du flux SSE
+// (au lieu de la recharger périodiquement). Un nouveau snapshot (reconnexion)
+// ou un delta inapplicable provoque un rechargement unique.
+const followStatsStream = async (
+    { updateCachedData, cacheDataLoaded, cacheEntryRemoved, dispatch }, tag, applyDeltas,
+) => {
+    try {
+        await cacheDataLoaded;
+    } catch {
+        return;
+    }
+    let connected = false;
+    const unsubscribe = subscribeStatsStream(BASE_URL, (type, rows) => {
+        if (type === 'snapshot') {
+            if (connected) dispatch(apiSlice.util.invalidateTags([tag]));
+            connected = true;
+            return;
+        }
+        let applied = true;
+        updateCachedData((draft) => { applied = applyDeltas(draft, rows); });
+        if (!applied) dispatch(apiSlice.util.invalidateTags([tag]));
+    });
+    await cacheEntryRemoved;
+    unsubscribe();
+};
+
 export const apiSlice = createApi({
     reducerPath: 'api',
     baseQuery: fetchBaseQuery({ baseUrl: BASE_URL }),
@@ -101,10 +128,12 @@ export const apiSlice = createApi({
         getGlobalStats: builder.query({
             query: () => 'stats/global/',
             providesTags: ['GlobalStats'],
+            onCacheEntryAdded: (arg, api) => followStatsStream(api, 'GlobalStats', applyGlobalDeltas),
         }),
         getRegionStats: builder.query({
             query: () => 'stats/regions/',
             providesTags: ['RegionStats'],
+            onCacheEntryAdded: (arg, api) => followStatsStream(api, 'RegionStats', applyRegionDeltas),
         }),
         getMenages: builder.query({
             query: (params) => {
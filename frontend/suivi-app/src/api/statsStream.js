@@ -0,0 +1,74 @@
+// src/api/statsStream.js
+// Abonnement partagé au flux SSE /api/stats/stream/ : une seule connexion
+// EventSource par onglet, quel que soit le nombre de requêtes abonnées.
+// Messages : "snapshot" (à la connexion) puis "deltas",
+// lignes [code_dr, statut, is_rural, tirage, count].
+
+const STATUTS_COLLECTES = [3, 4]; // PARTIEL, COMPLET
+
+let source = null;
+const listeners = new Set();
+
+export const subscribeStatsStream = (baseUrl, listener) => {
+    listeners.add(listener);
+    if (!source) {
+        source = new EventSource(`${baseUrl}stats/stream/`);
+        ['snapshot', 'deltas'].forEach((type) => {
+            source.addEventListener(type, (event) => {
+                const rows = JSON.parse(event.data);
+                listeners.forEach((fn) => fn(type, rows));
+            });
+        });
+    }
+    return () => {
+        listeners.delete(listener);
+        if (listeners.size === 0 && source) {
+            source.close();
+            source = null;
+        }
+    };
+};
+
+const taux = (numerateur, denominateur) =>
+    denominateur > 0 ? Math.round((numerateur / denominateur) * 10000) / 100 : 0;
+
+const addToRepartition = (repartition, statut, delta) => {
+    const entry = repartition.find((r) => r.statut_code === statut);
+    if (entry) entry.count += delta;
+};
+
+// Applique des deltas à la réponse de stats/global/ (brouillon immer) ; retourne true
+export const applyGlobalDeltas = (draft, rows) => {
+    rows.forEach(([, statut, isRural, tirage, delta]) => {
+        const zone = isRural ? 'rural' : 'urbain';
+        if (tirage === 1) {
+            draft.menages_attendus.total += delta;
+            draft.menages_attendus[zone] += delta;
+        }
+        if (STATUTS_COLLECTES.includes(statut)) {
+            draft.menages_collectes.total += delta;
+            draft.menages_collectes[zone] += delta;
+        }
+        addToRepartition(draft.repartition_statuts, statut, delta);
+    });
+    draft.taux_de_couverture = {
+        global: taux(draft.menages_collectes.total, draft.menages_attendus.total),
+        rural: taux(draft.menages_collectes.rural, draft.menages_attendus.rural),
+        urbain: taux(draft.menages_collectes.urbain, draft.menages_attendus.urbain),
+    };
+    return true;
+};
+
+// Applique des deltas à la réponse de stats/regions/ (brouillon immer) ;
+// retourne false si une région inconnue apparaît (rechargement nécessaire)
+export const applyRegionDeltas = (draft, rows) => {
+    for (const [codeDr, statut, , tirage, delta] of rows) {
+        const region = draft.find((r) => r.code_dr === codeDr);
+        if (!region) return false;
+        if (tirage === 1) region.menages_attendus += delta;
+        if (STATUTS_COLLECTES.includes(statut)) region.menages_collectes += delta;
+        addToRepartition(region.repartition_statuts, statut, delta);
+        region.taux_de_couverture = taux(region.menages_collectes, region.menages_attendus);
+    }
+    return true;
+};